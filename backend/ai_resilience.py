@@ -0,0 +1,253 @@
+"""
+Resilience policies for upstream AI calls: per-call deadlines, jittered
+exponential retry, optional hedged requests and a circuit breaker.
+
+When the breaker is open, PecuniaAI methods decorated with `with_fallback`
+return their local `_fallback_*` result without touching the network.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import random
+import sys
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+AI_RETRY_MAX_ATTEMPTS = int(os.environ.get('AI_RETRY_MAX_ATTEMPTS', 3))
+AI_RETRY_BASE_DELAY_SECONDS = float(os.environ.get('AI_RETRY_BASE_DELAY_SECONDS', 0.25))
+AI_RETRY_MAX_DELAY_SECONDS = float(os.environ.get('AI_RETRY_MAX_DELAY_SECONDS', 4))
+
+# Hedge a call once it has run longer than the observed p95 latency
+AI_HEDGING_ENABLED = os.environ.get('AI_HEDGING_ENABLED', '0') == '1'
+AI_HEDGE_QUANTILE = float(os.environ.get('AI_HEDGE_QUANTILE', 0.95))
+AI_HEDGE_MIN_SAMPLES = int(os.environ.get('AI_HEDGE_MIN_SAMPLES', 20))
+
+AI_BREAKER_CONSECUTIVE_FAILURES = int(os.environ.get('AI_BREAKER_CONSECUTIVE_FAILURES', 5))
+AI_BREAKER_WINDOW = int(os.environ.get('AI_BREAKER_WINDOW', 20))
+AI_BREAKER_FAILURE_RATIO = float(os.environ.get('AI_BREAKER_FAILURE_RATIO', 0.5))
+AI_BREAKER_RESET_SECONDS = float(os.environ.get('AI_BREAKER_RESET_SECONDS', 30))
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+BREAKER_STATE_VALUES = {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 1, BREAKER_OPEN: 2}
+
+# PecuniaAI method currently being served, for per-method metrics
+_current_method: ContextVar[str] = ContextVar('ai_method', default='unknown')
+
+
+class AIUnavailableError(Exception):
+    """The upstream AI call failed; callers should serve their fallback"""
+
+
+class CircuitOpenError(AIUnavailableError):
+    """The circuit breaker is open and the call was not attempted"""
+
+
+class AIDeadlineExceeded(AIUnavailableError):
+    """The per-call deadline ran out"""
+
+
+def current_ai_method() -> str:
+    return _current_method.get()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient upstream failures worth another attempt"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # The SDK is imported lazily; until it is loaded no SDK error can occur
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff bounded by a call deadline"""
+
+    def __init__(
+        self,
+        max_attempts: int = AI_RETRY_MAX_ATTEMPTS,
+        base_delay: float = AI_RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = AI_RETRY_MAX_DELAY_SECONDS,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def run(self, attempt: Callable[[float], Awaitable[T]], deadline: float) -> T:
+        """Call `attempt(remaining_seconds)` until it succeeds, fails permanently or the deadline passes"""
+        for attempt_number in range(1, self.max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AIDeadlineExceeded("AI call deadline exceeded")
+            try:
+                return await asyncio.wait_for(attempt(remaining), remaining)
+            except Exception as e:
+                if not is_retryable(e) or attempt_number == self.max_attempts:
+                    raise
+                # Full jitter, but never sooner than the provider asked for
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt_number - 1)))
+                delay = max(delay, _retry_after_seconds(e) or 0)
+                if time.monotonic() + delay >= deadline:
+                    raise
+                metrics.inc("ai_retries_total", reason=type(e).__name__)
+                await asyncio.sleep(delay)
+        raise AIDeadlineExceeded("AI call deadline exceeded")
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+    """Run `call`, starting a duplicate if it is still pending after `hedge_after`
+    seconds; the first success wins and the other is cancelled"""
+    first = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await first
+    try:
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    except asyncio.CancelledError:
+        # asyncio.wait leaves its tasks running when the caller is cancelled (e.g. by wait_for)
+        first.cancel()
+        raise
+    if done:
+        return first.result()
+
+    metrics.inc("ai_hedged_requests_total")
+    tasks = {first, asyncio.ensure_future(call())}
+    error: Optional[BaseException] = None
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        metrics.inc("ai_hedge_wins_total")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class CircuitBreaker:
+    """Opens after sustained upstream failures and lets a single probe through
+    once the reset timeout has passed"""
+
+    def __init__(
+        self,
+        name: str,
+        consecutive_failures: int = AI_BREAKER_CONSECUTIVE_FAILURES,
+        window: int = AI_BREAKER_WINDOW,
+        failure_ratio: float = AI_BREAKER_FAILURE_RATIO,
+        reset_seconds: float = AI_BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.consecutive_failures_threshold = consecutive_failures
+        self.failure_ratio = failure_ratio
+        self.reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.outcomes = deque(maxlen=window)
+        self.probe_in_flight = False
+        self._export()
+
+    def _export(self):
+        metrics.set_gauge("ai_circuit_state", BREAKER_STATE_VALUES[self.state], breaker=self.name)
+
+    def _set_state(self, state: str):
+        self.state = state
+        self._export()
+
+    def is_open(self) -> bool:
+        """True while calls are being short-circuited"""
+        if self.state == BREAKER_OPEN:
+            return time.monotonic() < self.opened_at + self.reset_seconds
+        return self.state == BREAKER_HALF_OPEN and self.probe_in_flight
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() < self.opened_at + self.reset_seconds:
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+            self._set_state(BREAKER_HALF_OPEN)
+        if self.state == BREAKER_HALF_OPEN:
+            if self.probe_in_flight:
+                raise CircuitOpenError(f"Circuit '{self.name}' is half-open with a probe in flight")
+            self.probe_in_flight = True
+
+    def _trip(self):
+        self._set_state(BREAKER_OPEN)
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        metrics.inc("ai_circuit_trips_total", breaker=self.name)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.outcomes.append(True)
+        if self.state == BREAKER_HALF_OPEN:
+            self.probe_in_flight = False
+            self.outcomes.clear()
+            self._set_state(BREAKER_CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.outcomes.append(False)
+        if self.state == BREAKER_HALF_OPEN:
+            self._trip()
+            return
+        failures = self.outcomes.count(False)
+        sustained_ratio = len(self.outcomes) >= self.outcomes.maxlen // 2 and failures / len(self.outcomes) >= self.failure_ratio
+        if self.consecutive_failures >= self.consecutive_failures_threshold or sustained_ratio:
+            self._trip()
+
+    def record_ignored(self):
+        """The call ended without telling us anything about upstream health"""
+        if self.state == BREAKER_HALF_OPEN:
+            self.probe_in_flight = False
+
+
+def with_fallback(fallback: str):
+    """Mark a PecuniaAI method with its `_fallback_*` counterpart.
+
+    The method name is recorded for per-method metrics, and while the circuit
+    breaker is open the fallback is returned without building a prompt.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            token = _current_method.set(method.__name__)
+            try:
+                metrics.inc("ai_method_calls_total", method=method.__name__)
+                if self.breaker.is_open():
+                    metrics.inc("ai_fallbacks_total", method=method.__name__, reason="circuit_open")
+                    result = getattr(self, fallback)(*args, **kwargs)
+                    return await result if inspect.isawaitable(result) else result
+                return await method(self, *args, **kwargs)
+            finally:
+                _current_method.reset(token)
+        return wrapper
+    return decorate
@@ -0,0 +1,221 @@
+"""
+Priority-aware scheduler for upstream AI calls.
+
+Every call into the LLM provider takes a slot from a shared concurrency limit.
+Waiting calls are ordered by priority class (interactive > page_load >
+background); inside a class, users share capacity by weighted fair queuing so
+one user's burst of dashboard pre-loads cannot crowd out everybody else.
+Waiters that sit in a lower class longer than its starvation threshold are
+served ahead of higher classes.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+# Priority classes, highest first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PAGE_LOAD = "page_load"
+PRIORITY_BACKGROUND = "background"
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_PAGE_LOAD, PRIORITY_BACKGROUND)
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get('AI_SCHEDULER_MAX_CONCURRENCY', 64))
+
+# Seconds a waiter may queue before it is served ahead of higher classes
+DEFAULT_STARVATION_THRESHOLDS = {
+    PRIORITY_PAGE_LOAD: float(os.environ.get('AI_SCHEDULER_PAGE_LOAD_MAX_WAIT', 5)),
+    PRIORITY_BACKGROUND: float(os.environ.get('AI_SCHEDULER_BACKGROUND_MAX_WAIT', 20)),
+}
+
+# Request-scoped priority and user, declared by each AI route
+_current_priority: ContextVar[str] = ContextVar('ai_priority', default=PRIORITY_PAGE_LOAD)
+_current_user: ContextVar[str] = ContextVar('ai_user', default='anonymous')
+
+
+class QueueTimeoutError(Exception):
+    """No slot came free before the caller's timeout"""
+
+
+def set_request_context(priority: str, user_id: str):
+    """Declare the priority class and user for AI calls made by this request"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown AI priority class: {priority}")
+    _current_priority.set(priority)
+    _current_user.set(user_id)
+
+
+def get_request_context() -> Tuple[str, str]:
+    """Priority class and user of the current request"""
+    return _current_priority.get(), _current_user.get()
+
+
+class _Waiter:
+    __slots__ = ("priority", "user_id", "future", "enqueued_at", "done")
+
+    def __init__(self, priority: str, user_id: str, future: asyncio.Future):
+        self.priority = priority
+        self.user_id = user_id
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.done = False
+
+
+class AIScheduler:
+    """Concurrency limiter with priority classes and per-user fair queuing"""
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        starvation_thresholds: Optional[Dict[str, float]] = None,
+        user_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.starvation_thresholds = starvation_thresholds or dict(DEFAULT_STARVATION_THRESHOLDS)
+        self.user_weights = user_weights or {}
+        self.active = 0
+        self._seq = itertools.count()
+        # Per class: heap ordered by virtual finish tag, FIFO for starvation checks of classes with a threshold
+        self._heaps: Dict[str, List[Tuple[float, int, _Waiter]]] = {p: [] for p in PRIORITY_CLASSES}
+        self._fifos: Dict[str, deque] = {p: deque() for p in PRIORITY_CLASSES}
+        self._waiting: Dict[str, int] = {p: 0 for p in PRIORITY_CLASSES}
+        self._virtual_time: Dict[str, float] = {p: 0.0 for p in PRIORITY_CLASSES}
+        self._last_finish: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITY_CLASSES}
+
+    def _has_waiters(self) -> bool:
+        return any(self._waiting.values())
+
+    def _enqueue(self, waiter: _Waiter, cost: float):
+        priority = waiter.priority
+        weight = self.user_weights.get(waiter.user_id, 1.0)
+        start = max(self._virtual_time[priority], self._last_finish[priority].get(waiter.user_id, 0.0))
+        finish = start + cost / weight
+        self._last_finish[priority][waiter.user_id] = finish
+        heapq.heappush(self._heaps[priority], (finish, next(self._seq), waiter))
+        # Only classes that can starve are scanned (and pruned) in arrival order
+        if priority in self.starvation_thresholds:
+            self._fifos[priority].append(waiter)
+        self._waiting[priority] += 1
+        metrics.set_gauge("ai_queue_depth", self._waiting[priority], priority=priority)
+
+    def _pop_fair(self, priority: str) -> Optional[_Waiter]:
+        heap = self._heaps[priority]
+        while heap:
+            finish, _, waiter = heapq.heappop(heap)
+            if not waiter.done:
+                self._virtual_time[priority] = max(self._virtual_time[priority], finish)
+                return waiter
+        return None
+
+    def _oldest_starving(self, now: float) -> Optional[_Waiter]:
+        oldest = None
+        for priority, threshold in self.starvation_thresholds.items():
+            fifo = self._fifos[priority]
+            while fifo and fifo[0].done:
+                fifo.popleft()
+            if fifo and now - fifo[0].enqueued_at >= threshold:
+                if oldest is None or fifo[0].enqueued_at < oldest.enqueued_at:
+                    oldest = fifo[0]
+        return oldest
+
+    def _prune_finish_tags(self, priority: str):
+        tags = self._last_finish[priority]
+        if len(tags) > 10000:
+            floor = self._virtual_time[priority]
+            for user_id in [u for u, finish in tags.items() if finish <= floor]:
+                del tags[user_id]
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self.active < self.max_concurrency and self._has_waiters():
+            waiter = self._oldest_starving(now)
+            if waiter is not None:
+                higher = PRIORITY_CLASSES[:PRIORITY_CLASSES.index(waiter.priority)]
+                if any(self._waiting[p] for p in higher):
+                    metrics.inc("ai_starvation_promotions_total", priority=waiter.priority)
+            else:
+                for priority in PRIORITY_CLASSES:
+                    if self._waiting[priority]:
+                        waiter = self._pop_fair(priority)
+                        break
+            if waiter is None:
+                break
+            self._grant(waiter)
+
+    def _grant(self, waiter: _Waiter):
+        waiter.done = True
+        self._waiting[waiter.priority] -= 1
+        self._prune_finish_tags(waiter.priority)
+        metrics.set_gauge("ai_queue_depth", self._waiting[waiter.priority], priority=waiter.priority)
+        if waiter.future.done():
+            # Cancelled or timed out, and not yet back in acquire to leave the queue
+            return
+        self.active += 1
+        waiter.future.set_result(None)
+
+    async def acquire(self, priority: str, user_id: str, cost: float = 1.0, timeout: Optional[float] = None) -> float:
+        """Wait for an upstream slot, returning the time spent queued; QueueTimeoutError after `timeout` seconds"""
+        if self.active < self.max_concurrency and not self._has_waiters():
+            self.active += 1
+            return 0.0
+        if timeout is not None and timeout <= 0:
+            raise QueueTimeoutError("No AI slot free before the deadline")
+
+        waiter = _Waiter(priority, user_id, asyncio.get_running_loop().create_future())
+        self._enqueue(waiter, cost)
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.done and waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just as we gave up; hand it back
+                self.release()
+            elif not waiter.done:
+                waiter.done = True
+                self._waiting[priority] -= 1
+                metrics.set_gauge("ai_queue_depth", self._waiting[priority], priority=priority)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("ai_queue_timeouts_total", priority=priority)
+                raise QueueTimeoutError(f"No AI slot free within {timeout:.2f}s") from None
+            raise
+        return time.monotonic() - waiter.enqueued_at
+
+    def release(self):
+        """Return a slot and wake the next waiter"""
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, user_id: Optional[str] = None, cost: float = 1.0,
+                   timeout: Optional[float] = None):
+        """Hold an upstream slot for the duration of the block, waiting at most `timeout` seconds for it"""
+        context_priority, context_user = get_request_context()
+        priority = priority or context_priority
+        user_id = user_id or context_user
+
+        waited = await self.acquire(priority, user_id, cost, timeout)
+        metrics.observe("ai_queue_wait_seconds", waited, priority=priority)
+        metrics.set_gauge("ai_active_calls", self.active)
+        try:
+            yield
+        finally:
+            self.release()
+            metrics.set_gauge("ai_active_calls", self.active)
+
+    def stats(self) -> Dict[str, object]:
+        """Current occupancy for health and metrics endpoints"""
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "waiting": dict(self._waiting),
+        }
+
+
+# Global scheduler shared by every AI call in this process
+ai_scheduler = AIScheduler()
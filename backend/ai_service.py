@@ -1,24 +1,149 @@
 import os
-import openai
-from typing import Optional, Dict, Any, List
+import httpx
+import importlib.util
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from pathlib import Path
 import asyncio
+import math
+import threading
+import time
+
+from ai_scheduler import (
+    ai_scheduler, get_request_context, QueueTimeoutError, PRIORITY_INTERACTIVE, PRIORITY_PAGE_LOAD, PRIORITY_BACKGROUND
+)
+from ai_resilience import (
+    AI_HEDGING_ENABLED, AI_HEDGE_QUANTILE, AI_HEDGE_MIN_SAMPLES,
+    AIDeadlineExceeded, AIUnavailableError, CircuitBreaker, CircuitOpenError, RetryPolicy,
+    current_ai_method, hedged, is_retryable, with_fallback
+)
+from metrics import metrics
+from anomaly_detector import anomaly_detector
+from budget_solver import budget_solver
+from conversation_store import conversation_store
+from goal_simulator import goal_simulator, monthly_target, months_until
+from model_router import ModelRouter
+from peer_benchmarks import peer_benchmarks
+from portfolio_optimizer import portfolio_optimizer
+from prompt_builder import (
+    PromptBuilder, compact_json, expected_output_tokens, max_tokens_for, record_completion, truncate_tokens
+)
+from response_cache import AI_CACHE_ENABLED, ResponseCache, cache_key
+from rate_governor import RateGovernor, RateLimitShedError, estimate_request_tokens
+from spending_analytics import category_totals, summarize_spending, to_frame
+from subscription_detector import subscription_detector, subscription_recommendation
+
+if TYPE_CHECKING:
+    import openai
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Connection pool shared by every AI call in this process
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 500))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 100))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY_SECONDS', 30))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_CONNECT_TIMEOUT_SECONDS', 5))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_TIMEOUT_SECONDS', 60))
+# HTTP/2 multiplexes calls over few connections; needs the optional h2 package
+OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', '1') == '1' and importlib.util.find_spec('h2') is not None
+
+# OpenAI-compatible endpoint, e.g. the local stub (openai_stub.py) for offline load tests
+PECUNIA_AI_BASE_URL = os.environ.get('PECUNIA_AI_BASE_URL') or None
+
+# End-to-end budget for one AI call, retries and queueing included
+AI_CALL_DEADLINE_SECONDS = {
+    PRIORITY_INTERACTIVE: float(os.environ.get('AI_INTERACTIVE_DEADLINE_SECONDS', 20)),
+    PRIORITY_PAGE_LOAD: float(os.environ.get('AI_PAGE_LOAD_DEADLINE_SECONDS', 45)),
+    PRIORITY_BACKGROUND: float(os.environ.get('AI_BACKGROUND_DEADLINE_SECONDS', 120)),
+}
+
+# Sections of generate_full_plan with the method, response shape and fallback of each
+FULL_PLAN_SECTIONS = ("analysis", "budget", "investment", "competitive")
+FULL_PLAN_METHODS = {
+    "analysis": "get_comprehensive_financial_analysis",
+    "budget": "generate_smart_budget",
+    "investment": "generate_investment_strategy",
+    "competitive": "get_competitive_insights",
+}
+FULL_PLAN_SHAPERS = {
+    "analysis": "_shape_financial_analysis",
+    "budget": "_shape_budget",
+    "investment": "_shape_investment_strategy",
+    "competitive": "_shape_competitive_insights",
+}
+FULL_PLAN_FALLBACKS = {
+    "analysis": "_fallback_financial_analysis",
+    "budget": "_fallback_budget",
+    "investment": "_fallback_investment_strategy",
+    "competitive": "_fallback_competitive_insights",
+}
+
+# Active subscriptions listed in the spending analysis prompt
+SUBSCRIPTION_PROMPT_TOP = 10
+# Settings sent alongside the tickers of a flat {ticker: value} portfolio
+PORTFOLIO_CONTROL_KEYS = ("target_volatility", "risk_tolerance")
+# Recent unusual-spending alerts listed in the chat prompt
+ANOMALY_PROMPT_ALERTS = 5
+# Longest user message sent in a chat prompt; the rest of its budget holds context
+CHAT_MESSAGE_MAX_TOKENS = int(os.environ.get('CHAT_MESSAGE_MAX_TOKENS', 400))
+
+# Seconds before a failed PecuniaAI construction is attempted again
+AI_INIT_RETRY_SECONDS = float(os.environ.get('AI_INIT_RETRY_SECONDS', 30))
+
+SYSTEM_PROMPT = "You are Pecunia AI, a comprehensive financial advisor that provides specific, actionable advice. Always be detailed, specific, and provide exact numbers, percentages, and timelines."
+
 class PecuniaAI:
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or PECUNIA_AI_BASE_URL
         api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key and self.base_url:
+            # Local OpenAI-compatible servers accept any key
+            api_key = "local"
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
-        self.client = openai.OpenAI(api_key=api_key)
-        self.model = "gpt-4"
+        self.api_key = api_key
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.client: Optional["openai.AsyncOpenAI"] = None
+        self.router = ModelRouter()
+        self.model = self.router.default_model
+        self.temperature = 0.7
+        self.retry_policy = RetryPolicy()
+        self.breaker = CircuitBreaker("openai")
+        self.governor = RateGovernor()
+        self.cache = ResponseCache() if AI_CACHE_ENABLED else None
+        self.open()
+
+    def open(self):
+        """Create the shared HTTP connection pool and async OpenAI client"""
+        if self.http_client is not None and not self.http_client.is_closed:
+            return
+        # Deferred: the SDK takes most of this module's import time
+        import openai
+
+        self.http_client = httpx.AsyncClient(
+            http2=OPENAI_HTTP2,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS)
+        )
+        # Retries are handled by RetryPolicy so they respect the call deadline
+        self.client = openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, http_client=self.http_client, max_retries=0
+        )
+
+    async def aclose(self):
+        """Close pooled connections; the next open() starts a fresh pool"""
+        if self.http_client is not None:
+            await self.http_client.aclose()
         
+    @with_fallback("_fallback_financial_analysis")
     async def get_comprehensive_financial_analysis(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Comprehensive AI-powered financial analysis that does the heavy lifting for users
@@ -44,9 +169,9 @@ class PecuniaAI:
             - Age: {age}
             - Risk Tolerance: {risk_tolerance}
             - Location: {location}
-            - Goals: {json.dumps(goals, indent=2)}
-            - Current Investments: {json.dumps(current_investments, indent=2)}
+            """
 
+            market_and_tasks = """
             MARKET CONTEXT (2025):
             - Current inflation rate: ~3.2%
             - Federal funds rate: ~5.25%
@@ -90,87 +215,79 @@ class PecuniaAI:
             Provide specific, actionable recommendations with dollar amounts, percentages, and timelines. Make it comprehensive yet easy to follow.
             """
 
+            prompt = (
+                PromptBuilder()
+                .text(prompt)
+                .field("- Goals", goals, priority=1, summarize=self._summarize_goals)
+                .field("- Current Investments", current_investments, priority=0)
+                .text(market_and_tasks)
+                .build()
+            )
+
             response = await self._get_ai_response(prompt)
             
-            return {
-                "analysis": response,
-                "confidence": 0.95,
-                "last_updated": datetime.now().isoformat(),
-                "recommendations_count": 6,
-                "action_items": self._extract_action_items(response)
-            }
+            return self._shape_financial_analysis(user_data, response)
             
         except Exception as e:
             print(f"AI analysis error: {str(e)}")
             return self._fallback_financial_analysis(user_data)
 
+    @with_fallback("_fallback_budget")
     async def generate_smart_budget(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered smart budget generation that optimizes spending automatically
         """
         try:
-            monthly_income = user_data.get('monthly_income', 0)
-            current_expenses = user_data.get('expenses', {})
+            # Category targets are solved; the AI explains them and adds strategy
+            allocation = budget_solver.allocate(user_data)
             goals = user_data.get('goals', [])
             location = user_data.get('location', 'United States')
             
             prompt = f"""
-            As Pecunia AI, create an optimized monthly budget that maximizes savings and goal achievement.
+            As Pecunia AI, explain this optimized monthly budget and how to stick to it.
+            The category targets below come from a budget solver; do not change the numbers.
 
             CURRENT SITUATION:
-            - Monthly Income: ${monthly_income:,}
-            - Current Expenses: {json.dumps(current_expenses, indent=2)}
-            - Goals: {json.dumps(goals, indent=2)}
+            - Monthly Income: ${allocation["total_income"]:,.0f}
+            - Current Spending: ${allocation["current_spending"]:,.0f} (savings rate {allocation["current_savings_rate"]}%)
+            - Goals: {compact_json(goals)}
             - Location: {location}
 
-            Create a smart budget with:
+            OPTIMIZED BUDGET:
+            - Category Targets (USD, current -> target): {compact_json(self._budget_targets(allocation))}
+            - Savings: ${allocation["savings"]:,.0f}/month ({allocation["savings_rate"]}%, target ${allocation["savings_target"]:,.0f})
+            - Shortfall Against Target: ${allocation["shortfall"]:,.0f}
+
+            Provide:
 
-            1. **OPTIMIZED CATEGORIES** with specific dollar amounts:
-               - Housing (recommend 25-30% of income)
-               - Food & Dining (recommend 10-15%)
-               - Transportation (recommend 10-15%)
-               - Entertainment (recommend 5-10%)
-               - Savings & Investments (recommend 20-30%)
-               - Emergency Fund (recommend 3-6 months expenses)
+            1. **WHY EACH CHANGE**: the reasoning behind every category that moves
 
             2. **COST-CUTTING STRATEGIES**:
                - Specific subscriptions to cancel
                - Better alternatives for current spending
                - Negotiation tactics for bills
 
-            3. **INCOME OPTIMIZATION**:
+            3. **INCOME OPTIMIZATION** (especially if there is a shortfall):
                - Side hustle recommendations
                - Skill development for raises
-               - Investment income strategies
 
             4. **AUTOMATED SAVINGS PLAN**:
                - Exact dates for automatic transfers
                - Goal-based savings allocations
-               - Investment automation setup
+               - Emergency fund (3-6 months of expenses)
 
-            5. **SPENDING ALERTS**:
-               - Category limits with notifications
-               - Overspending triggers
-               - Weekly/monthly check-ins
-
-            Return as a structured JSON with specific dollar amounts and percentages.
+            5. **SPENDING ALERTS**: category limits and weekly/monthly check-ins
             """
 
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
-            return {
-                "budget": response,
-                "total_income": monthly_income,
-                "total_allocated": sum(current_expenses.values()),
-                "savings_rate": ((monthly_income - sum(current_expenses.values())) / monthly_income) * 100,
-                "optimization_score": 85,
-                "last_updated": datetime.now().isoformat()
-            }
+            return self._shape_budget(user_data, response, allocation)
             
         except Exception as e:
             print(f"Budget generation error: {str(e)}")
             return self._fallback_budget(user_data)
 
+    @with_fallback("_fallback_investment_strategy")
     async def generate_investment_strategy(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered investment strategy with specific recommendations
@@ -228,20 +345,15 @@ class PecuniaAI:
             Make it actionable with specific tickers, amounts, and timelines.
             """
 
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
-            return {
-                "strategy": response,
-                "risk_score": self._calculate_risk_score(risk_tolerance),
-                "expected_return": self._calculate_expected_return(risk_tolerance, timeline),
-                "rebalance_frequency": "quarterly",
-                "last_updated": datetime.now().isoformat()
-            }
+            return self._shape_investment_strategy(user_data, response)
             
         except Exception as e:
             print(f"Investment strategy error: {str(e)}")
             return self._fallback_investment_strategy(user_data)
 
+    @with_fallback("_fallback_travel_plan")
     async def generate_travel_plan(self, travel_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered comprehensive travel planning that handles everything
@@ -303,7 +415,7 @@ class PecuniaAI:
             Make it detailed enough to book and execute immediately.
             """
 
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
             return {
                 "plan": response,
@@ -318,6 +430,7 @@ class PecuniaAI:
             print(f"Travel planning error: {str(e)}")
             return self._fallback_travel_plan(travel_data)
 
+    @with_fallback("_fallback_goal_strategy")
     async def generate_goal_strategy(self, goal_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered goal achievement strategy with step-by-step plan
@@ -328,6 +441,7 @@ class PecuniaAI:
             current_amount = goal_data.get('current', 0)
             deadline = goal_data.get('deadline', '')
             monthly_income = goal_data.get('monthly_income', 0)
+            simulation = goal_simulator.simulate(goal_data)
             
             prompt = f"""
             As Pecunia AI, create a detailed strategy to achieve this financial goal.
@@ -336,8 +450,9 @@ class PecuniaAI:
             - Goal: {goal_title}
             - Target Amount: ${target_amount:,}
             - Current Amount: ${current_amount:,}
-            - Deadline: {deadline}
+            - Deadline: {deadline} ({simulation['months']} monthly contributions left)
             - Monthly Income: ${monthly_income:,}
+            - Simulated chance of success saving ${simulation['monthly_contribution']:,.0f}/month: {simulation['probability']:.0%}
 
             Create a comprehensive achievement strategy:
 
@@ -374,12 +489,13 @@ class PecuniaAI:
             Provide specific, actionable steps with dollar amounts and timelines.
             """
 
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
             return {
                 "strategy": response,
-                "monthly_target": (target_amount - current_amount) / max(1, self._months_until_deadline(deadline)),
-                "probability_of_success": self._calculate_success_probability(goal_data),
+                "monthly_target": monthly_target(goal_data),
+                "probability_of_success": simulation["probability"],
+                "projected_balance": simulation["projected_balance"],
                 "optimization_suggestions": self._generate_optimization_suggestions(goal_data),
                 "last_updated": datetime.now().isoformat()
             }
@@ -388,6 +504,7 @@ class PecuniaAI:
             print(f"Goal strategy error: {str(e)}")
             return self._fallback_goal_strategy(goal_data)
 
+    @with_fallback("_fallback_competitive_insights")
     async def get_competitive_insights(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered competitive analysis to help users outperform peers
@@ -410,10 +527,10 @@ class PecuniaAI:
             - Location: {location}
 
             PEER BENCHMARKS (Age {age}):
-            - Median net worth: ${self._get_median_net_worth(age):,}
-            - Median income: ${self._get_median_income(age):,}
-            - Top 10% net worth: ${self._get_top_10_net_worth(age):,}
-            - Average savings rate: {self._get_average_savings_rate(age)}%
+            - Median net worth: ${self._get_median_net_worth(age, location):,}
+            - Median income: ${self._get_median_income(age, location):,}
+            - Top 10% net worth: ${self._get_top_10_net_worth(age, location):,}
+            - Median savings rate: {self._get_average_savings_rate(age, location)}%
 
             Provide competitive strategy:
 
@@ -450,37 +567,251 @@ class PecuniaAI:
             Make it actionable and competitive.
             """
 
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
-            return {
-                "insights": response,
-                "percentile_ranking": self._calculate_percentile_ranking(user_data),
-                "improvement_potential": self._calculate_improvement_potential(user_data),
-                "competitive_score": self._calculate_competitive_score(user_data),
-                "last_updated": datetime.now().isoformat()
-            }
+            return self._shape_competitive_insights(user_data, response)
             
         except Exception as e:
             print(f"Competitive insights error: {str(e)}")
             return self._fallback_competitive_insights(user_data)
 
-    async def _get_ai_response(self, prompt: str) -> str:
-        """Get response from OpenAI API"""
+    @with_fallback("_fallback_full_plan")
+    async def generate_full_plan(self, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analysis, budget, investment strategy and competitive insights from a single AI call.
+        `plan_data` holds the request body of each section's endpoint; the answer is split
+        into the same shapes those endpoints return.
+        """
         try:
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are Pecunia AI, a comprehensive financial advisor that provides specific, actionable advice. Always be detailed, specific, and provide exact numbers, percentages, and timelines."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
+            # The sections share most of the profile, so it is sent once
+            profile = {}
+            for section in reversed(FULL_PLAN_SECTIONS):
+                profile.update(plan_data.get(section) or {})
+            age = profile.get('age', 30)
+            location = profile.get('location')
+
+            prompt = (
+                PromptBuilder()
+                .text("As Pecunia AI, create a complete automated financial plan for this user in one response.")
+                .field("USER PROFILE", profile, priority=1, summarize=self._summarize_plan_profile)
+                .field("PEER BENCHMARKS", {
+                    "median_net_worth": self._get_median_net_worth(age, location),
+                    "median_income": self._get_median_income(age, location),
+                    "top_10_net_worth": self._get_top_10_net_worth(age, location),
+                    "median_savings_rate_pct": self._get_average_savings_rate(age, location)
+                }, priority=2)
+                .text("""
+                MARKET CONTEXT (2025): inflation ~3.2%, federal funds rate ~5.25%, bull market with tech leadership,
+                cooling but elevated real estate, attractive bond yields.
+
+                Respond with ONLY a JSON object whose values are markdown strings, with these keys:
+                "analysis": immediate actions (next 30 days), investment strategy, budget optimization,
+                  competitive advantage, automated plan and risk management.
+                "budget": optimized monthly categories with dollar amounts and percentages, cost-cutting
+                  strategies, income optimization, automated savings plan and spending alerts.
+                "investment": allocation percentages with ticker symbols and dollar amounts, stock picks,
+                  timing strategy, risk management and income generation.
+                "competitive": percentile ranking vs peers, competitive advantages, wealth acceleration,
+                  peer comparison metrics, market opportunities and a Pecunia Score improvement plan.
+                Be specific: exact dollar amounts, percentages and timelines.
+                """)
+                .build()
             )
-            return response.choices[0].message.content
+
+            response = await self._get_ai_response(prompt)
+            plan = {
+                section: getattr(self, FULL_PLAN_SHAPERS[section])(plan_data.get(section) or {}, text)
+                for section, text in self._parse_plan_sections(response).items()
+            }
+
+        except Exception as e:
+            # Per-section calls would hit the same failure four times over
+            print(f"Full plan error: {str(e)}")
+            return self._fallback_full_plan(plan_data)
+
+        missing = [section for section in FULL_PLAN_SECTIONS if section not in plan]
+        if missing:
+            metrics.inc("ai_full_plan_section_fallbacks_total", len(missing))
+            plan.update(await self._plan_sections_separately(plan_data, missing))
+        plan["combined"] = not missing
+        return plan
+
+    async def _plan_sections_separately(self, plan_data: Dict[str, Any], sections: List[str]) -> Dict[str, Any]:
+        """Per-section calls, for sections the combined answer did not cover"""
+        results = await asyncio.gather(*[
+            getattr(self, FULL_PLAN_METHODS[section])(plan_data.get(section) or {}) for section in sections
+        ])
+        return dict(zip(sections, results))
+
+    def _parse_plan_sections(self, response: str) -> Dict[str, str]:
+        """Sections of a combined plan answer; invalid or empty sections are left out"""
+        start, end = response.find("{"), response.rfind("}")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            data = json.loads(response[start:end + 1])
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {
+            section: value if isinstance(value, str) else compact_json(value)
+            for section, value in data.items()
+            if section in FULL_PLAN_SECTIONS and value
+        }
+
+    def _summarize_plan_profile(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Profile with goals reduced for prompts over budget"""
+        return {**profile, "goals": self._summarize_goals(profile.get('goals') or [])}
+
+    def _shape_financial_analysis(self, user_data: Dict[str, Any], response: str) -> Dict[str, Any]:
+        return {
+            "analysis": response,
+            "confidence": 0.95,
+            "last_updated": datetime.now().isoformat(),
+            "recommendations_count": 6,
+            "action_items": self._extract_action_items(response)
+        }
+
+    def _shape_budget(self, user_data: Dict[str, Any], response: str, allocation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        allocation = allocation or budget_solver.allocate(user_data)
+        return {
+            "budget": response,
+            "total_income": allocation["total_income"],
+            "total_allocated": allocation["total_allocated"],
+            "savings_rate": allocation["savings_rate"],
+            "optimization_score": allocation["optimization_score"],
+            "allocation": allocation,
+            "last_updated": datetime.now().isoformat()
+        }
+
+    def _budget_targets(self, allocation: Dict[str, Any]) -> Dict[str, str]:
+        """Category targets for prompts, e.g. {"Dining": "900 -> 650"}"""
+        return {
+            name: f"{category['current']:,.0f} -> {category['target']:,.0f}"
+            for name, category in allocation["categories"].items()
+        }
+
+    def _shape_investment_strategy(self, user_data: Dict[str, Any], response: str) -> Dict[str, Any]:
+        risk_tolerance = user_data.get('risk_tolerance', 'medium')
+        timeline = user_data.get('timeline', '10+ years')
+        return {
+            "strategy": response,
+            "risk_score": self._calculate_risk_score(risk_tolerance),
+            "expected_return": self._calculate_expected_return(risk_tolerance, timeline),
+            "rebalance_frequency": "quarterly",
+            "last_updated": datetime.now().isoformat()
+        }
+
+    def _shape_competitive_insights(self, user_data: Dict[str, Any], response: str) -> Dict[str, Any]:
+        return {
+            "insights": response,
+            "percentile_ranking": self._calculate_percentile_ranking(user_data),
+            "improvement_potential": self._calculate_improvement_potential(user_data),
+            "competitive_score": self._calculate_competitive_score(user_data),
+            "last_updated": datetime.now().isoformat()
+        }
+
+    async def _get_ai_response(self, prompt: str) -> str:
+        """
+        Get response from OpenAI API. Transient failures are retried within the
+        call deadline; anything else raises AIUnavailableError so the caller
+        serves its fallback.
+        """
+        method = current_ai_method()
+        priority, _ = get_request_context()
+        deadline = time.monotonic() + AI_CALL_DEADLINE_SECONDS[priority]
+        model = self.router.choose(method, priority, expected_output_tokens(method))
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        # Identical requests are answered from the persistent cache
+        key = cache_key(model, self.temperature, SYSTEM_PROMPT, prompt)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key, method)
+            if cached is not None:
+                return cached
+        attempts = 0
+
+        def attempt(remaining: float):
+            nonlocal attempts
+            attempts += 1
+            return hedged(lambda: self._create_completion(messages, remaining, model), hedge_after)
+
+        try:
+            self.breaker.before_call()
+            # Queue behind higher-priority calls, for no longer than the deadline; the route declares the class
+            async with ai_scheduler.slot(timeout=deadline - time.monotonic()):
+                hedge_after = self._hedge_delay(model)
+                content = await self.retry_policy.run(attempt, deadline)
         except Exception as e:
+            if isinstance(e, CircuitOpenError):
+                reason = "circuit_open"
+            elif isinstance(e, QueueTimeoutError) or (isinstance(e, AIDeadlineExceeded) and not attempts):
+                # Local congestion says nothing about the provider's health
+                reason = "queue_timeout"
+                self.breaker.record_ignored()
+            elif isinstance(e, RateLimitShedError):
+                reason = "rate_limited"
+                self.breaker.record_ignored()
+            elif is_retryable(e) or isinstance(e, AIUnavailableError):
+                reason = "upstream"
+                self.breaker.record_failure()
+            else:
+                reason = "error"
+                self.breaker.record_ignored()
+            metrics.inc("ai_fallbacks_total", method=method, reason=reason)
             print(f"OpenAI API error: {str(e)}")
-            return "I apologize, but I'm having trouble accessing the latest market data. Please try again in a moment."
+            raise AIUnavailableError(str(e)) from e
+        except asyncio.CancelledError:
+            self.breaker.record_ignored()
+            raise
+        self.breaker.record_success()
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set, key, content)
+        return content
+
+    async def _create_completion(self, messages: List[Dict[str, str]], timeout: float, model: str) -> str:
+        """One upstream attempt: waits for rate budget, then is timed for the hedging threshold"""
+        priority, _ = get_request_context()
+        method = current_ai_method()
+        max_tokens = max_tokens_for(method)
+        estimated_tokens = estimate_request_tokens(messages, max_tokens)
+        attempt_deadline = time.monotonic() + timeout
+        await self.governor.acquire(estimated_tokens, priority, attempt_deadline)
+
+        import openai
+
+        started = time.monotonic()
+        try:
+            raw = await self.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                timeout=max(0.001, attempt_deadline - started)
+            )
+        except openai.APIStatusError as e:
+            await self.governor.observe_headers(e.response.headers, rate_limited=e.status_code == 429)
+            raise
+        elapsed = time.monotonic() - started
+        metrics.observe("ai_upstream_latency_seconds", elapsed, model=model)
+        self.router.record(model, method, elapsed)
+        await self.governor.observe_headers(raw.headers)
+        response = raw.parse()
+        await self.governor.settle(estimated_tokens, response.usage.total_tokens if response.usage else None)
+        if response.usage:
+            record_completion(method, response.usage.completion_tokens, max_tokens, response.choices[0].finish_reason == "length")
+        return response.choices[0].message.content
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds before a duplicate request is sent, None when hedging is off"""
+        if not AI_HEDGING_ENABLED:
+            return None
+        if metrics.sample_count("ai_upstream_latency_seconds", model=model) < AI_HEDGE_MIN_SAMPLES:
+            return None
+        return metrics.quantile("ai_upstream_latency_seconds", AI_HEDGE_QUANTILE, model=model)
 
     def _extract_action_items(self, response: str) -> List[str]:
         """Extract actionable items from AI response"""
@@ -504,17 +835,11 @@ class PecuniaAI:
 
     def _months_until_deadline(self, deadline: str) -> int:
         """Calculate months until deadline"""
-        try:
-            deadline_date = datetime.strptime(deadline, "%Y-%m-%d")
-            now = datetime.now()
-            return max(1, (deadline_date - now).days // 30)
-        except:
-            return 12  # Default to 12 months
+        return months_until(deadline)
 
     def _calculate_success_probability(self, goal_data: Dict[str, Any]) -> float:
-        """Calculate probability of achieving goal"""
-        # This would use machine learning or statistical analysis
-        return 0.75  # 75% success probability
+        """Calculate probability of achieving goal (Monte Carlo, see goal_simulator.py)"""
+        return goal_simulator.simulate(goal_data)["probability"]
 
     def _generate_optimization_suggestions(self, goal_data: Dict[str, Any]) -> List[str]:
         """Generate optimization suggestions"""
@@ -525,33 +850,39 @@ class PecuniaAI:
             "Review and cut unnecessary expenses"
         ]
 
-    def _get_median_net_worth(self, age: int) -> int:
+    def _get_median_net_worth(self, age: int, location: Optional[str] = None) -> int:
         """Get median net worth for age group"""
-        # This would use real data from financial surveys
-        age_brackets = {
-            25: 10000, 30: 30000, 35: 65000, 40: 120000, 45: 185000, 50: 250000
-        }
-        return age_brackets.get(age, 50000)
+        return int(round(peer_benchmarks.quantile("net_worth", 50, age, location), -3))
 
-    def _get_median_income(self, age: int) -> int:
+    def _get_median_income(self, age: int, location: Optional[str] = None) -> int:
         """Get median income for age group"""
-        age_brackets = {
-            25: 45000, 30: 55000, 35: 65000, 40: 75000, 45: 80000, 50: 85000
-        }
-        return age_brackets.get(age, 60000)
+        return int(round(peer_benchmarks.quantile("income", 50, age, location), -3))
 
-    def _get_top_10_net_worth(self, age: int) -> int:
+    def _get_top_10_net_worth(self, age: int, location: Optional[str] = None) -> int:
         """Get top 10% net worth for age group"""
-        return self._get_median_net_worth(age) * 5
+        return int(round(peer_benchmarks.quantile("net_worth", 90, age, location), -3))
 
-    def _get_average_savings_rate(self, age: int) -> int:
-        """Get average savings rate for age group"""
-        return 15  # 15% average savings rate
+    def _get_average_savings_rate(self, age: int, location: Optional[str] = None) -> int:
+        """Get median savings rate for age group"""
+        return round(peer_benchmarks.quantile("savings_rate", 50, age, location))
 
     def _calculate_percentile_ranking(self, user_data: Dict[str, Any]) -> int:
-        """Calculate user's percentile ranking"""
-        # This would use real benchmarking data
-        return 65  # 65th percentile
+        """Calculate user's percentile ranking: mean of net worth, income and savings rate percentiles among peers"""
+        income = user_data.get('income') or user_data.get('monthly_income', 0) * 12
+        savings_rate = user_data.get('savings_rate')
+        if savings_rate is None and user_data.get('monthly_income') and 'monthly_expenses' in user_data:
+            savings_rate = (1 - user_data['monthly_expenses'] / user_data['monthly_income']) * 100
+        ranking = peer_benchmarks.rank(
+            {
+                "net_worth": user_data.get('net_worth', float('nan')),
+                "income": income or float('nan'),
+                "savings_rate": float('nan') if savings_rate is None else savings_rate,
+            },
+            user_data.get('age') or 30,
+            user_data.get('location')
+        )[0]
+        # No usable metrics: assume the middle of the pack
+        return 50 if math.isnan(ranking) else int(round(ranking))
 
     def _calculate_improvement_potential(self, user_data: Dict[str, Any]) -> float:
         """Calculate improvement potential score"""
@@ -589,14 +920,40 @@ class PecuniaAI:
             "action_items": ["Build emergency fund", "Diversify investments", "Review budget monthly"]
         }
 
+    def _fallback_full_plan(self, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback full plan: each section's fallback, without further AI calls"""
+        plan = {
+            section: getattr(self, FULL_PLAN_FALLBACKS[section])(plan_data.get(section) or {})
+            for section in FULL_PLAN_SECTIONS
+        }
+        plan["combined"] = False
+        return plan
+
     def _fallback_budget(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fallback budget"""
+        """Fallback budget: the solver's category targets without the AI explanation"""
         income = user_data.get('monthly_income', 0)
+        try:
+            allocation = budget_solver.allocate(user_data)
+        except Exception as e:
+            print(f"Budget solver error: {str(e)}")
+            return {
+                "budget": f"Recommended budget: 50% needs, 30% wants, 20% savings from ${income:,} income",
+                "total_income": income,
+                "savings_rate": 20,
+                "optimization_score": 70
+            }
+        changes = [
+            f"{name}: ${category['current']:,.0f} -> ${category['target']:,.0f}"
+            for name, category in allocation["categories"].items() if category["change"]
+        ]
         return {
-            "budget": f"Recommended budget: 50% needs, 30% wants, 20% savings from ${income:,} income",
-            "total_income": income,
-            "savings_rate": 20,
-            "optimization_score": 70
+            "budget": "Recommended monthly targets: " + ("; ".join(changes) if changes else "keep current spending")
+                      + f". Save ${allocation['savings']:,.0f} ({allocation['savings_rate']}% of income).",
+            "total_income": allocation["total_income"],
+            "total_allocated": allocation["total_allocated"],
+            "savings_rate": allocation["savings_rate"],
+            "optimization_score": allocation["optimization_score"],
+            "allocation": allocation
         }
 
     def _fallback_investment_strategy(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -622,8 +979,8 @@ class PecuniaAI:
         """Fallback goal strategy"""
         return {
             "strategy": "Set up automatic savings, track progress monthly, adjust as needed",
-            "monthly_target": 500,
-            "probability_of_success": 0.7,
+            "monthly_target": monthly_target(goal_data),
+            "probability_of_success": self._calculate_success_probability(goal_data),
             "optimization_suggestions": ["Automate savings", "Track progress", "Review monthly"]
         }
 
@@ -649,21 +1006,31 @@ class PecuniaAI:
         """Backward compatibility wrapper"""
         return await self.generate_travel_plan(travel_data)
 
-    async def chat_with_ai(self, message: str, user_context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Enhanced chat with contextual AI"""
+    @with_fallback("_fallback_chat")
+    async def chat_with_ai(self, message: str, user_context: Dict[str, Any] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Enhanced chat with contextual AI; signed-in users (`user_id`) get conversation memory and spending alerts"""
         try:
             context = user_context or {}
+            history = conversation_store.history(user_id) if user_id else {"summary": [], "recent_turns": []}
+            alerts = (await asyncio.to_thread(anomaly_detector.alerts, user_id, limit=ANOMALY_PROMPT_ALERTS)
+                      if user_id else [])
             
-            prompt = f"""
-            As Pecunia AI, respond to this user message with helpful financial advice.
-            
-            User Context: {json.dumps(context, indent=2)}
-            User Message: {message}
-            
-            Provide specific, actionable financial advice based on their situation.
-            """
+            prompt = (
+                PromptBuilder()
+                .text("As Pecunia AI, respond to this user message with helpful financial advice.")
+                .field("User Context", context, priority=0)
+                .field("Unusual Spending Alerts", [alert["message"] for alert in alerts] or None, priority=1)
+                .field("Earlier Conversation", history["summary"] or None, priority=1)
+                .field("Recent Turns", history["recent_turns"] or None, priority=2, summarize=lambda turns: turns[-2:])
+                # Fields shrink to fit the budget; the message has to fit on its own
+                .text(f"User Message: {truncate_tokens(message, CHAT_MESSAGE_MAX_TOKENS)}")
+                .text("Provide specific, actionable financial advice based on their situation and the conversation so far.")
+                .build()
+            )
             
             response = await self._get_ai_response(prompt)
+            if user_id:
+                conversation_store.record(user_id, message, response)
             
             return {
                 "response": response,
@@ -671,110 +1038,288 @@ class PecuniaAI:
                 "context_used": bool(context)
             }
         except Exception as e:
-            return {
-                "response": "I'm here to help with your financial questions. Please try again in a moment.",
-                "timestamp": datetime.now().isoformat(),
-                "context_used": False
-            }
+            return self._fallback_chat(message, user_context, user_id)
 
-    async def analyze_spending_patterns(self, spending_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze spending patterns and provide insights"""
+    def _fallback_chat(self, message: str, user_context: Dict[str, Any] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Fallback chat response"""
+        return {
+            "response": "I'm here to help with your financial questions. Please try again in a moment.",
+            "timestamp": datetime.now().isoformat(),
+            "context_used": False
+        }
+
+    @with_fallback("_fallback_spending_analysis")
+    async def analyze_spending_patterns(
+        self, spending_data: List[Dict[str, Any]], subscriptions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Analyze spending patterns and provide insights; `subscriptions` is a precomputed detection"""
         try:
-            prompt = f"""
-            As Pecunia AI, analyze these spending patterns and provide insights.
-            
-            Spending Data: {json.dumps(spending_data, indent=2)}
-            
-            Provide analysis on:
-            1. Spending trends and patterns
-            2. Areas of concern or opportunity
-            3. Specific recommendations for optimization
-            4. Comparison to recommended budgets
-            5. Actionable next steps
-            """
+            # Aggregates are computed over the columnar data; only the summary reaches the prompt
+            frame = await asyncio.to_thread(to_frame, spending_data)
+            summary = await asyncio.to_thread(summarize_spending, frame)
+            if subscriptions is None:
+                subscriptions = await asyncio.to_thread(subscription_detector.detect_frame, frame)
+            prompt = (
+                PromptBuilder()
+                .text("As Pecunia AI, analyze these spending patterns and provide insights.")
+                .field("Spending Summary", summary, summarize=self._summarize_spending)
+                .field("Active Subscriptions", self._summarize_subscriptions(subscriptions), priority=1)
+                .text("""
+                Provide analysis on:
+                1. Spending trends and patterns
+                2. Areas of concern or opportunity
+                3. Specific recommendations for optimization
+                4. Comparison to recommended budgets
+                5. Actionable next steps
+                """)
+                .build()
+            )
             
             response = await self._get_ai_response(prompt)
             
             return {
                 "analysis": response,
-                "total_spending": sum(item.get('amount', 0) for item in spending_data),
-                "category_breakdown": self._analyze_categories(spending_data),
-                "recommendations": self._generate_spending_recommendations(spending_data),
+                "total_spending": summary["total_spending"],
+                "category_breakdown": category_totals(frame),
+                "recommendations": self._generate_spending_recommendations(summary, subscriptions),
+                "trends": summary["top_movers"],
+                "summary": summary,
+                "subscriptions": subscriptions,
                 "last_updated": datetime.now().isoformat()
             }
         except Exception as e:
-            return {
-                "analysis": "Spending analysis temporarily unavailable. Focus on tracking essential vs non-essential expenses.",
-                "recommendations": ["Track all expenses", "Categorize spending", "Set monthly limits"]
-            }
+            return self._fallback_spending_analysis(spending_data, subscriptions)
 
-    def _analyze_categories(self, spending_data: List[Dict[str, Any]]) -> Dict[str, float]:
-        """Analyze spending by category"""
-        categories = {}
-        for item in spending_data:
-            category = item.get('category', 'Other')
-            amount = item.get('amount', 0)
-            categories[category] = categories.get(category, 0) + amount
-        return categories
-
-    def _generate_spending_recommendations(self, spending_data: List[Dict[str, Any]]) -> List[str]:
-        """Generate spending recommendations"""
-        return [
-            "Review subscription services for unused items",
-            "Set up spending alerts for high-spend categories",
-            "Consider switching to cash for discretionary spending",
-            "Automate savings before spending"
+    def _fallback_spending_analysis(
+        self, spending_data: List[Dict[str, Any]], subscriptions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Fallback spending analysis"""
+        return {
+            "analysis": "Spending analysis temporarily unavailable. Focus on tracking essential vs non-essential expenses.",
+            "recommendations": ["Track all expenses", "Categorize spending", "Set monthly limits"]
+        }
+
+    def _summarize_spending(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Spending summary without the monthly series and merchant detail, for prompts over budget"""
+        return {
+            "transactions": summary["transactions"],
+            "total_spending": summary["total_spending"],
+            "monthly_average": summary["monthly_average"],
+            "category_totals": {category: entry["total"] for category, entry in summary["categories"].items()},
+            "top_movers": summary["top_movers"][:3]
+        }
+
+    def _summarize_goals(self, goals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Goals reduced to the fields that drive the plan"""
+        keep = ('title', 'target', 'current', 'deadline')
+        return [{k: goal[k] for k in keep if k in goal} if isinstance(goal, dict) else goal for goal in goals]
+
+    def _summarize_subscriptions(self, subscriptions: Dict[str, Any]) -> Dict[str, Any]:
+        """Active recurring charges with the fields the analysis talks about"""
+        keep = ('merchant', 'period', 'amount', 'monthly_cost', 'next_expected')
+        active = [entry for entry in subscriptions["subscriptions"] if entry["active"]]
+        return {
+            "monthly_total": subscriptions["monthly_total"],
+            "subscriptions": [{k: entry[k] for k in keep} for entry in active[:SUBSCRIPTION_PROMPT_TOP]]
+        }
+
+    def _generate_spending_recommendations(
+        self, summary: Dict[str, Any], subscriptions: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Generate spending recommendations from the summary's movers, largest categories and subscriptions"""
+        recommendations = [
+            f"{mover['category']} spending rose ${mover['change']:,.0f} last month against its recent average; set an alert for it"
+            for mover in summary["top_movers"][:2] if mover["change"] > 0
         ]
+        for category, entry in list(summary["categories"].items())[:1]:
+            if entry["share"] >= 30 and not category.startswith("("):
+                recommendations.append(f"{category} is {entry['share']:.0f}% of spending; review it first for savings")
+        recommendations.append(subscription_recommendation(subscriptions))
+        return recommendations + ["Automate savings before spending"]
 
+    @with_fallback("_fallback_portfolio_optimization")
     async def optimize_portfolio(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
         """Optimize investment portfolio"""
         try:
+            # The allocation and trades are computed; the AI explains them
+            model = self._optimize_holdings(portfolio_data)
             prompt = f"""
-            As Pecunia AI, optimize this investment portfolio for 2025 market conditions.
+            As Pecunia AI, explain this portfolio rebalancing plan for 2025 market conditions.
+            The target allocation and trades below come from a mean-variance optimizer; do not change the numbers.
             
-            Current Portfolio: {json.dumps(portfolio_data, indent=2)}
+            Current Portfolio: {compact_json(model["current"])}
+            Target Volatility: {model["target_volatility"]:.0%}
+            Target Portfolio: {compact_json(model["target"])}
+            Trades (USD): {compact_json(model["trades"])}
             
-            Provide optimization recommendations:
-            1. Asset allocation adjustments
-            2. Specific buy/sell recommendations
-            3. Risk management strategies
-            4. Tax optimization opportunities
-            5. Rebalancing schedule
-            6. Performance improvement strategies
+            Provide:
+            1. Why each trade moves the portfolio toward its target risk
+            2. Risk management strategies
+            3. Tax optimization opportunities for the sells
+            4. Rebalancing schedule
             """
             
-            response = await self._get_ai_response(prompt)
+            response = await self._get_ai_response(PromptBuilder().text(prompt).build())
             
             return {
                 "optimization": response,
                 "current_allocation": portfolio_data,
-                "recommended_changes": self._generate_portfolio_changes(portfolio_data),
-                "risk_assessment": self._assess_portfolio_risk(portfolio_data),
+                "recommended_changes": self._generate_portfolio_changes(model),
+                "risk_assessment": self._assess_portfolio_risk(model),
+                "optimization_model": model,
                 "last_updated": datetime.now().isoformat()
             }
         except Exception as e:
+            print(f"Portfolio optimization error: {str(e)}")
+            return self._fallback_portfolio_optimization(portfolio_data)
+
+    def _fallback_portfolio_optimization(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback portfolio optimization: the optimizer's plan without the AI explanation"""
+        try:
+            model = self._optimize_holdings(portfolio_data)
+        except Exception as e:
+            print(f"Portfolio optimizer error: {str(e)}")
             return {
                 "optimization": "Portfolio optimization temporarily unavailable. Focus on diversification and cost minimization.",
                 "recommended_changes": ["Diversify holdings", "Minimize fees", "Rebalance quarterly"]
             }
+        return {
+            "optimization": "Rebalance toward the target allocation below to match your risk tolerance.",
+            "current_allocation": portfolio_data,
+            "recommended_changes": self._generate_portfolio_changes(model),
+            "risk_assessment": self._assess_portfolio_risk(model),
+            "optimization_model": model
+        }
 
-    def _generate_portfolio_changes(self, portfolio_data: Dict[str, Any]) -> List[str]:
-        """Generate portfolio change recommendations"""
-        return [
-            "Increase international exposure to 20%",
-            "Add emerging markets allocation",
-            "Reduce cash position below 5%",
-            "Consider adding REITs for inflation protection"
-        ]
-
-    def _assess_portfolio_risk(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _optimize_holdings(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the portfolio optimizer on request data ({ticker: value} or {"holdings": {...}})"""
+        holdings = portfolio_data.get('holdings')
+        if holdings is None:
+            holdings = {k: v for k, v in portfolio_data.items() if k not in PORTFOLIO_CONTROL_KEYS}
+        return portfolio_optimizer.optimize(
+            holdings,
+            target_volatility=portfolio_data.get('target_volatility'),
+            risk_tolerance=portfolio_data.get('risk_tolerance', 'medium')
+        )
+
+    def _generate_portfolio_changes(self, model: Dict[str, Any]) -> List[str]:
+        """Generate portfolio change recommendations from the optimizer's trades"""
+        names = portfolio_optimizer.names
+        target = model["target"]["weights"]
+        changes = []
+        for ticker, amount in sorted(model["trades"].items(), key=lambda item: -abs(item[1])):
+            action = "Buy" if amount > 0 else "Sell"
+            changes.append(f"{action} ${abs(amount):,.0f} of {ticker} ({names[ticker]}) to reach {target.get(ticker, 0):.0%}")
+        return changes or ["Portfolio is within its rebalancing band; no trades needed"]
+
+    def _assess_portfolio_risk(self, model: Dict[str, Any]) -> Dict[str, Any]:
         """Assess portfolio risk metrics"""
+        current = model["current"]
+        volatility = current["volatility"]
+        target = model["target_volatility"]
+        recommendations = []
+        if not model["target_reachable"]:
+            closest = model["target"]["volatility"]
+            recommendations.append(
+                f"The {target:.0%} volatility target cannot be reached while holding your individual stocks; "
+                f"the closest plan has {closest:.0%}. Trim stocks to get nearer"
+            )
+        elif volatility > target * 1.15:
+            recommendations.append(f"Reduce risk: volatility is {volatility:.0%} against a {target:.0%} target")
+        elif volatility < target * 0.85:
+            recommendations.append(f"Portfolio is more conservative than your {target:.0%} volatility target")
+        stock_share = current["weights"].get("STOCK", 0)
+        if stock_share > 0.1:
+            recommendations.append(f"Individual stocks are {stock_share:.0%} of the portfolio; consider capping them at 10%")
+        if current["diversification_ratio"] < 1.15:
+            recommendations.append("Spread risk across more asset classes")
         return {
-            "risk_score": 65,
-            "volatility": "moderate",
-            "diversification_score": 78,
-            "recommendations": ["Add bonds for stability", "Increase diversification"]
+            "risk_score": min(100, round(volatility / 0.25 * 100)),
+            "volatility": "low" if volatility < 0.08 else "moderate" if volatility < 0.14 else "high",
+            "annual_volatility": volatility,
+            "expected_return": current["expected_return"],
+            "diversification_score": min(100, max(0, round(200 * (1 - 1 / current["diversification_ratio"])))),
+            "recommendations": recommendations or ["Risk is in line with your target"]
         }
 
-# Global AI instance
-pecunia_ai = PecuniaAI()
\ No newline at end of file
+class LazyPecuniaAI:
+    """Process-wide PecuniaAI, built on first use.
+
+    Construction (configuration, SDK import, connection pool, cache) happens
+    once under a lock, in whichever thread first needs the instance, and can
+    be done ahead of time with `warm_up()`. If it fails, for example because
+    OPENAI_API_KEY is missing, callers get AIUnavailableError and the build is
+    retried after AI_INIT_RETRY_SECONDS instead of on every request.
+    Attribute access is forwarded to the built instance.
+    """
+
+    def __init__(self, factory=PecuniaAI):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instance: Optional[PecuniaAI] = None
+        self._error: Optional[str] = None
+        self._failed_at = 0.0
+        self._init_seconds: Optional[float] = None
+
+    def get(self) -> PecuniaAI:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is not None:
+                return self._instance
+            if self._error is not None and time.monotonic() - self._failed_at < AI_INIT_RETRY_SECONDS:
+                raise AIUnavailableError(f"PecuniaAI unavailable: {self._error}")
+            started = time.perf_counter()
+            try:
+                instance = self._factory()
+            except Exception as e:
+                self._error = str(e)
+                self._failed_at = time.monotonic()
+                metrics.inc("ai_init_failures_total")
+                print(f"PecuniaAI init error: {str(e)}")
+                raise AIUnavailableError(f"PecuniaAI unavailable: {self._error}") from e
+            self._init_seconds = time.perf_counter() - started
+            self._error = None
+            metrics.observe("ai_init_seconds", self._init_seconds)
+            self._instance = instance
+            return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    async def warm_up(self) -> bool:
+        """Build the instance off the event loop; False if it could not be built"""
+        try:
+            await asyncio.to_thread(self.get)
+            return True
+        except AIUnavailableError:
+            return False
+
+    async def aclose(self):
+        if self._instance is not None:
+            await self._instance.aclose()
+
+    def flush_cache(self):
+        """Checkpoint the response cache, if the instance was built with one"""
+        if self._instance is not None and self._instance.cache is not None:
+            self._instance.cache.flush()
+
+    def health(self) -> Dict[str, Any]:
+        """Initialization state plus circuit breaker state once built"""
+        instance = self._instance
+        if instance is None:
+            return {"status": "unavailable" if self._error else "not_initialized", "error": self._error}
+        return {
+            "status": "degraded" if instance.breaker.is_open() else "ready",
+            "model": instance.model,
+            "init_seconds": round(self._init_seconds, 4),
+        }
+
+
+# Global AI instance; nothing is built until first use
+pecunia_ai = LazyPecuniaAI()
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Online spending-anomaly detection with per-category streaming statistics.
+
+Each user keeps one small record per spending category: a count and an
+exponentially weighted mean and variance of log(1 + amount). Logs make a
+charge's deviation relative to what the category usually costs, so a $40
+dinner in a $15 lunch habit scores like a $400 TV in a $150 electronics
+habit. A new outflow is scored in O(1) against its category's record
+before being folded in:
+
+    score = (log1p(amount) - mean) / max(std, ANOMALY_MIN_STD)
+
+and raises an alert when the score exceeds ANOMALY_Z_THRESHOLD, the record
+has seen ANOMALY_WARMUP charges, and the amount is at least
+ANOMALY_MIN_AMOUNT. Updates are winsorized at ANOMALY_CLIP standard
+deviations, so one huge charge does not mask the next. During warmup the
+weight is 1/count (a plain running mean); afterwards it is ANOMALY_ALPHA,
+so the record follows gradual changes in habits. Nothing is recomputed
+from history, and a record's size does not grow with it.
+
+Transactions arrive through the importer (transaction_import.py), which
+passes each batch of new rows here. Records and alerts are persisted in
+SQLite, written once per batch; users' records are cached in memory
+between batches. Each user keeps their newest ANOMALY_MAX_ALERTS alerts.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import metrics
+from ttl_store import TTLStore
+
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+ANOMALY_STATE_PATH = os.environ.get('ANOMALY_STATE_PATH', str(STATE_DIR / 'anomaly_state.sqlite'))
+# Standard deviations (of log amounts) above the category mean that raise an alert
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', 3.5))
+# Charges a category must have seen before it can alert
+ANOMALY_WARMUP = int(os.environ.get('ANOMALY_WARMUP', 8))
+# Charges below this amount never alert
+ANOMALY_MIN_AMOUNT = float(os.environ.get('ANOMALY_MIN_AMOUNT', 20))
+# Weight of each new charge once warmed up; about the last 1/alpha charges count
+ANOMALY_ALPHA = float(os.environ.get('ANOMALY_ALPHA', 0.05))
+# Floor on the standard deviation, so very regular categories need roughly 2x their usual amount to alert
+ANOMALY_MIN_STD = float(os.environ.get('ANOMALY_MIN_STD', 0.25))
+# Charges are clipped to this many standard deviations before updating the statistics
+ANOMALY_CLIP = float(os.environ.get('ANOMALY_CLIP', 3.0))
+ANOMALY_MAX_ALERTS = int(os.environ.get('ANOMALY_MAX_ALERTS', 50))
+# Alerts count as recent within this many days of the user's newest transaction
+ANOMALY_RECENT_DAYS = int(os.environ.get('ANOMALY_RECENT_DAYS', 30))
+ANOMALY_CACHED_USERS = int(os.environ.get('ANOMALY_CACHED_USERS', 10000))
+ANOMALY_STATE_TTL_SECONDS = float(os.environ.get('ANOMALY_STATE_TTL_SECONDS', 3600))
+
+_EPOCH = date(1970, 1, 1)
+
+
+class AnomalyState:
+    """A user's statistics: category -> [count, mean, variance] of log1p(amount)"""
+
+    __slots__ = ("stats", "newest_day", "changed")
+
+    def __init__(self, stats: Optional[Dict[str, List[float]]] = None, newest_day: int = 0):
+        self.stats: Dict[str, List[float]] = stats or {}
+        self.newest_day = newest_day
+        self.changed: set = set()
+
+
+def _day_label(day: int) -> str:
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+class AnomalyDetector:
+    """Per-user, per-category streaming statistics that score each new outflow as it arrives"""
+
+    def __init__(self, path: str = ANOMALY_STATE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._states = TTLStore(max_entries=ANOMALY_CACHED_USERS, ttl_seconds=ANOMALY_STATE_TTL_SECONDS)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, user_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS anomaly_stats ("
+                "user_id TEXT NOT NULL, category TEXT NOT NULL, count INTEGER NOT NULL, "
+                "mean REAL NOT NULL, variance REAL NOT NULL, PRIMARY KEY (user_id, category))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS anomaly_users (user_id TEXT PRIMARY KEY, newest_day INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS anomaly_alerts ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, day INTEGER NOT NULL, "
+                "category TEXT NOT NULL, merchant TEXT NOT NULL, amount REAL NOT NULL, "
+                "typical_amount REAL NOT NULL, score REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS anomaly_alerts_user ON anomaly_alerts (user_id, day)")
+            self._local.conn = conn
+        return conn
+
+    def _state(self, user_id: str) -> AnomalyState:
+        state = self._states.get(user_id)
+        if state is None:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT category, count, mean, variance FROM anomaly_stats WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            newest = conn.execute("SELECT newest_day FROM anomaly_users WHERE user_id = ?", (user_id,)).fetchone()
+            state = AnomalyState({category: [count, mean, variance] for category, count, mean, variance in rows},
+                                 newest[0] if newest else 0)
+            self._states.set(user_id, state)
+        return state
+
+    @staticmethod
+    def score(state: AnomalyState, category: str, amount: float) -> Optional[tuple]:
+        """Fold one outflow into its category's statistics; returns (score, mean before it) for an anomaly"""
+        x = math.log1p(amount)
+        stats = state.stats.get(category)
+        if stats is None:
+            state.stats[category] = [1, x, 0.0]
+            return None
+        count, mean, variance = stats
+        std = math.sqrt(variance)
+        anomaly = None
+        if count >= ANOMALY_WARMUP:
+            spread = std if std > ANOMALY_MIN_STD else ANOMALY_MIN_STD
+            z = (x - mean) / spread
+            if z > ANOMALY_Z_THRESHOLD and amount >= ANOMALY_MIN_AMOUNT:
+                anomaly = (z, mean)
+            # Winsorize, so an outlier nudges the statistics rather than resetting them
+            if z > ANOMALY_CLIP:
+                x = mean + ANOMALY_CLIP * spread
+            elif z < -ANOMALY_CLIP:
+                x = mean - ANOMALY_CLIP * spread
+        weight = 1.0 / (count + 1) if count < ANOMALY_WARMUP else ANOMALY_ALPHA
+        delta = x - mean
+        stats[0] = count + 1
+        stats[1] = mean + weight * delta
+        stats[2] = (1 - weight) * (variance + weight * delta * delta)
+        return anomaly
+
+    def observe(self, user_id: str, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Score new transactions (date, amount, category, merchant) in date order; returns the alerts raised"""
+        amounts = frame["amount"].to_numpy(dtype=float)
+        # Plain arrays throughout: per-batch pandas overhead would outweigh scoring a small batch
+        rows = np.flatnonzero(amounts > 0)
+        if not len(rows):
+            return []
+        days = frame["date"].to_numpy().astype("datetime64[D]").astype(np.int64)[rows]
+        rows = rows[np.argsort(days, kind="stable")]
+        days = np.sort(days, kind="stable").tolist()
+        amounts = amounts[rows].tolist()
+        categories = np.asarray(frame["category"], dtype=object)[rows].tolist()
+        merchants = np.asarray(frame["merchant"], dtype=object)[rows].tolist()
+
+        raised = []
+        with self._lock(user_id):
+            state = self._state(user_id)
+            score, changed = self.score, state.changed
+            for i, category in enumerate(categories):
+                anomaly = score(state, category, amounts[i])
+                if anomaly is not None:
+                    z, mean = anomaly
+                    raised.append((user_id, days[i], str(category), str(merchants[i]), amounts[i], math.expm1(mean), z))
+            changed.update(categories)
+            state.newest_day = max(state.newest_day, days[-1])
+            self._save(user_id, state, raised)
+        metrics.inc("anomaly_events_total", len(amounts))
+        if raised:
+            metrics.inc("anomaly_alerts_total", len(raised))
+        return [self._alert(row[1:]) for row in raised]
+
+    def _save(self, user_id: str, state: AnomalyState, raised: List[tuple]):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO anomaly_stats VALUES (?, ?, ?, ?, ?)",
+                [(user_id, category, *state.stats[category]) for category in state.changed],
+            )
+            conn.execute("INSERT OR REPLACE INTO anomaly_users VALUES (?, ?)", (user_id, state.newest_day))
+            if raised:
+                conn.executemany(
+                    "INSERT INTO anomaly_alerts (user_id, day, category, merchant, amount, typical_amount, score) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", raised,
+                )
+                conn.execute(
+                    "DELETE FROM anomaly_alerts WHERE user_id = ? AND id NOT IN "
+                    "(SELECT id FROM anomaly_alerts WHERE user_id = ? ORDER BY day DESC, id DESC LIMIT ?)",
+                    (user_id, user_id, ANOMALY_MAX_ALERTS),
+                )
+        state.changed.clear()
+
+    @staticmethod
+    def _alert(row: tuple) -> Dict[str, Any]:
+        day, category, merchant, amount, typical, score = row
+        return {
+            "date": _day_label(day),
+            "category": category,
+            "merchant": merchant,
+            "amount": round(amount, 2),
+            "typical_amount": round(typical, 2),
+            "score": round(score, 1),
+            "message": (f"${amount:,.2f} at {merchant} on {_day_label(day)} is about {amount / max(typical, 1):.1f}x "
+                        f"your typical ${typical:,.0f} {category} charge"),
+        }
+
+    def alerts(self, user_id: str, recent_days: Optional[int] = ANOMALY_RECENT_DAYS,
+               limit: int = ANOMALY_MAX_ALERTS) -> List[Dict[str, Any]]:
+        """A user's alerts, newest first; only those within `recent_days` of their newest transaction unless None"""
+        state = self._state(user_id)
+        since = state.newest_day - recent_days if recent_days is not None else -(2 ** 62)
+        rows = self._connect().execute(
+            "SELECT day, category, merchant, amount, typical_amount, score FROM anomaly_alerts "
+            "WHERE user_id = ? AND day >= ? ORDER BY day DESC, id DESC LIMIT ?",
+            (user_id, since, limit),
+        ).fetchall()
+        return [self._alert(row) for row in rows]
+
+    def flush(self):
+        """Checkpoint the write-ahead log; statistics are already written once per batch"""
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def forget(self, user_id: str):
+        """Drop a user's statistics and alerts"""
+        with self._lock(user_id):
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                for table in ("anomaly_stats", "anomaly_users", "anomaly_alerts"):
+                    conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+            self._states.pop(user_id)
+
+
+# Shared detector; the importer feeds it every batch of new transactions
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+End-to-end load and fault test of the live AI pipeline, fully offline.
+
+Starts the local OpenAI stub with the requested latency and failure
+injection, starts the API in live mode pointed at it, drives the /api/ai/*
+routes and reports throughput, latency percentiles and response statuses.
+
+    python benchmarks/bench_ai_pipeline.py --latency lognormal:0.3:0.5 \\
+        --error-rate 0.05 --rate-limit-rate 0.05 --duration 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+
+# The script's own directory is on sys.path, so the sibling benchmark imports directly
+from bench_runtime import BACKEND_DIR, free_port, run_load, wait_until_ready
+
+ROUTES = [
+    ("POST", "/api/ai/chat", {"query": "How much should I keep in my emergency fund?"}),
+    ("POST", "/api/ai/smart-budget", {"monthly_income": 6500, "expenses": {"housing": 2000, "food": 600}, "goals": []}),
+    ("POST", "/api/ai/comprehensive-analysis", {"monthly_income": 6500, "monthly_expenses": 3750, "age": 28}),
+]
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    command = [
+        sys.executable, "openai_stub.py", "--port", str(port),
+        "--latency", args.latency,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--timeout-rate", str(args.timeout_rate),
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_api(port: int, stub_port: int, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PECUNIA_AI_MODE": "live",
+        "PECUNIA_AI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "PECUNIA_RUNTIME_PROFILE": args.profile,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+    }
+    code = "import runtime_config; runtime_config.run(log_level='warning', access_log=False)"
+    return subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="default", help="runtime profile for the API")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per route")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=1, help="load generator processes")
+    parser.add_argument("--latency", default="fixed:0.2", help="stub latency distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    stub_port, api_port = free_port(), free_port()
+    stub = start_stub(stub_port, args)
+    api = start_api(api_port, stub_port, args)
+    base_url = f"http://127.0.0.1:{api_port}"
+    try:
+        wait_until_ready(base_url)
+        results = {path: run_load(base_url, method, path, body, {}, args) for method, path, body in ROUTES}
+        stub_stats = httpx.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()
+        api_metrics = httpx.get(f"{base_url}/api/metrics").json()
+    finally:
+        for process in (api, stub):
+            process.terminate()
+            process.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps({"routes": results, "stub": stub_stats, "metrics": api_metrics}, indent=2, default=str))
+        return
+    print(f"{'route':<32} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path, stats in results.items():
+        print(f"{path:<32} {stats['rps']:>8} {stats['p50_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}")
+    print(f"stub outcomes: {stub_stats}")
+
+
+if __name__ == "__main__":
+    main()
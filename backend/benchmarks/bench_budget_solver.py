@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Latency of the budget allocation solver (budget_solver.py).
+
+Reports the latency of allocating one user's budget, the time the batch
+solver spends on a matrix of users, and the end-to-end throughput of
+allocate_many, which also builds each user's response.
+
+    python benchmarks/bench_budget_solver.py --users 100000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+CATEGORIES = ("Housing", "Utilities", "Groceries", "Food & Dining", "Transportation",
+              "Entertainment", "Shopping", "Subscriptions", "Insurance", "Travel")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000, help="users allocated in the batch call")
+    parser.add_argument("--single", type=int, default=2000, help="single-user allocations timed")
+    args = parser.parse_args()
+
+    from budget_solver import BudgetSolver, solve_allocation
+
+    solver = BudgetSolver()
+    rng = np.random.default_rng(11)
+    income = rng.uniform(2500, 15000, args.users)
+    spending = rng.dirichlet(np.ones(len(CATEGORIES)), args.users) * income[:, None] * rng.uniform(0.6, 1.05, (args.users, 1))
+    users = [
+        {"monthly_income": round(float(income[i]), 2), "expenses": dict(zip(CATEGORIES, np.round(spending[i], 2).tolist()))}
+        for i in range(args.users)
+    ]
+
+    solver.allocate(users[0])
+    started = time.perf_counter()
+    for i in range(args.single):
+        solver.allocate(users[i % args.users])
+    single_us = (time.perf_counter() - started) * 1e6 / args.single
+
+    floors = spending * rng.uniform(0, 1, spending.shape)
+    caps = np.maximum(spending * rng.uniform(0.8, 1.5, spending.shape), floors)
+    started = time.perf_counter()
+    solve_allocation(spending, floors, caps, spending * 0.5, income * 0.8)
+    solve_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    solver.allocate_many(users)
+    batch_seconds = time.perf_counter() - started
+
+    print(f"allocate one budget:         {single_us:8.1f} us")
+    print(f"solve {args.users} x {len(CATEGORIES)} matrix:   {solve_seconds * 1000:8.1f} ms "
+          f"({args.users / solve_seconds:,.0f} budgets/s)")
+    print(f"allocate_many {args.users} users: {batch_seconds * 1000:8.1f} ms "
+          f"({args.users / batch_seconds:,.0f} budgets/s)")
+
+
+if __name__ == "__main__":
+    main()
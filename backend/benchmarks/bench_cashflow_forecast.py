@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Batched cash-flow forecasting (cashflow_forecast.py).
+
+Stores --history-users synthetic users, each with --years of transactions
+(twice-monthly pay, rent, a few subscriptions, and everyday spending with a
+December peak), in a scratch transaction store. Reports:
+- the nightly precompute over those users: reading their rows, detecting
+  subscriptions, extracting forecast inputs, projecting 365 days in batches
+  and writing the SQLite cache
+- serving one forecast from the cache
+- projection alone for --users users, as batched users x days matrices
+  and one user at a time, for comparison
+
+    python benchmarks/bench_cashflow_forecast.py --users 100000 --history-users 500
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+AS_OF = "2026-09-30"
+PLANS = [("NETFLIX.COM", 15.49), ("SPOTIFY USA", 11.99), ("ICLOUD STORAGE", 2.99), ("PLANET FITNESS", 24.99)]
+SPENDING = [("Groceries", "WHOLE FOODS", 0.5, 60), ("Dining", "CHIPOTLE", 0.3, 18),
+            ("Transportation", "SHELL OIL", 0.15, 45), ("Shopping", "AMAZON MKTP", 0.2, 40)]
+
+
+def user_history(rng: np.random.Generator, years: int) -> pd.DataFrame:
+    """One user's dated transactions: outflows positive, pay negative"""
+    end = np.datetime64(AS_OF) + 1
+    days = np.arange(end - years * 365, end)
+    day_of_month = (days - days.astype("datetime64[M]").astype("datetime64[D]")).astype(int) + 1
+    month = days.astype("datetime64[M]").astype(int) % 12
+    pay = rng.uniform(1500, 4000)
+    parts = [(days[np.isin(day_of_month, (1, 15))], -pay, "Income", "ACME PAYROLL"),
+             (days[day_of_month == 1], rng.uniform(800, 2500), "Housing", "OAK PROPERTY MGMT")]
+    for name, amount in PLANS[:rng.integers(1, len(PLANS) + 1)]:
+        parts.append((days[day_of_month == rng.integers(2, 28)], amount, "Subscriptions", name))
+    frames = [pd.DataFrame({"date": d, "amount": a, "category": c, "merchant": m}) for d, a, c, m in parts]
+    for category, merchant, rate, typical in SPENDING:
+        hit = rng.random(len(days)) < rate * np.where(month == 11, 1.6, 1.0)
+        amounts = np.round(rng.lognormal(np.log(typical), 0.5, hit.sum()), 2)
+        frames.append(pd.DataFrame({"date": days[hit], "amount": amounts, "category": category, "merchant": merchant}))
+    frame = pd.concat(frames).sort_values("date", kind="stable").reset_index(drop=True)
+    return pd.DataFrame({
+        "date": frame["date"].to_numpy().astype("datetime64[s]"),
+        "amount": frame["amount"].to_numpy(dtype=float),
+        "category": pd.Categorical(frame["category"]),
+        "merchant": pd.Categorical(frame["merchant"]),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000, help="users projected in the projection-only timing")
+    parser.add_argument("--history-users", type=int, default=500, help="users stored for the end-to-end precompute")
+    parser.add_argument("--years", type=int, default=3, help="years of history per user")
+    parser.add_argument("--loop-users", type=int, default=500, help="users timed one at a time")
+    args = parser.parse_args()
+
+    import cashflow_forecast
+    from cashflow_forecast import CashFlowForecaster, project
+    from subscription_detector import SubscriptionDetector
+    from transaction_store import TransactionStore
+
+    rng = np.random.default_rng(23)
+    with tempfile.TemporaryDirectory() as scratch:
+        store = TransactionStore(root=str(Path(scratch) / "store"))
+        users = [f"user-{i}" for i in range(args.history_users)]
+        rows = 0
+        for user_id in users:
+            frame = user_history(rng, args.years)
+            store.append(user_id, frame, np.arange(len(frame), dtype=np.uint64))
+            rows += len(frame)
+        forecaster = CashFlowForecaster(store, SubscriptionDetector(store), str(Path(scratch) / "forecasts.sqlite"))
+
+        started = time.perf_counter()
+        stats = forecaster.precompute(users, AS_OF)
+        precompute_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        served = [forecaster.forecast(user_id, AS_OF, balance=1000) for user_id in users[:100]]
+        serve_seconds = (time.perf_counter() - started) / len(served)
+        features = [cashflow_forecast.history_features(store.frame(user_id), forecaster.detector.detect(user_id),
+                                                       int(np.datetime64(AS_OF, "D").astype(np.int64)))
+                    for user_id in users[:min(len(users), 1000)]]
+
+    start = int(np.datetime64(AS_OF, "D").astype(np.int64)) + 1
+    many = [features[i % len(features)] for i in range(args.users)]
+    started = time.perf_counter()
+    for offset in range(0, len(many), cashflow_forecast.CASHFLOW_BATCH_USERS):
+        project(many[offset:offset + cashflow_forecast.CASHFLOW_BATCH_USERS], start)
+    batched_seconds = time.perf_counter() - started
+    loop = many[:args.loop_users]
+    started = time.perf_counter()
+    for item in loop:
+        project([item], start)
+    loop_seconds = (time.perf_counter() - started) * len(many) / len(loop)
+
+    print(f"{args.history_users:,} users, {rows:,} stored rows ({args.years} years each)")
+    print(f"nightly precompute (read, detect, project, cache): {precompute_seconds:6.2f} s, "
+          f"{stats['forecasts'] / precompute_seconds:,.0f} users/s")
+    print(f"forecast served from cache:               {serve_seconds * 1000:6.2f} ms")
+    print(f"projection, {args.users:,} users x {cashflow_forecast.CASHFLOW_HORIZON_DAYS} days, "
+          f"batches of {cashflow_forecast.CASHFLOW_BATCH_USERS}: {batched_seconds:6.2f} s, "
+          f"{args.users / batched_seconds:,.0f} users/s")
+    print(f"projection one user at a time:            {loop_seconds:6.2f} s "
+          f"(extrapolated from {len(loop):,} users)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Latency of the Monte Carlo goal simulator (goal_simulator.py).
+
+Times one goal at a time (cold cache) and a nightly-style batch of many goals
+in one call, and reports milliseconds per goal against the 10 ms target.
+
+    python benchmarks/bench_goal_simulator.py --goals 1000 --paths 10000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def sample_goals(count: int):
+    rng = random.Random(7)
+    today = date.today()
+    return [
+        {
+            "target": rng.randint(2, 100) * 1000,
+            "current": rng.randint(0, 20) * 500,
+            "deadline": (today + timedelta(days=rng.randint(60, 3650))).isoformat(),
+            "monthly_contribution": rng.randint(1, 40) * 50,
+            "risk_tolerance": rng.choice(["low", "medium", "high"]),
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", type=int, default=1000, help="goals in the batch run")
+    parser.add_argument("--single", type=int, default=50, help="goals simulated one call each")
+    parser.add_argument("--paths", type=int, default=None, help="paths per goal (default GOAL_SIM_PATHS)")
+    args = parser.parse_args()
+
+    from goal_simulator import GOAL_SIM_PATHS, GoalSimulator
+
+    paths = args.paths or GOAL_SIM_PATHS
+    GoalSimulator(paths).simulate(sample_goals(1)[0])
+
+    simulator = GoalSimulator(paths)
+    goals = sample_goals(args.single)
+    started = time.perf_counter()
+    for goal in goals:
+        simulator.simulate(goal)
+    single_ms = (time.perf_counter() - started) * 1000 / args.single
+
+    simulator = GoalSimulator(paths)
+    goals = sample_goals(args.goals)
+    started = time.perf_counter()
+    results = simulator.simulate_many(goals)
+    batch_ms = (time.perf_counter() - started) * 1000 / args.goals
+
+    started = time.perf_counter()
+    simulator.simulate_many(goals)
+    cached_ms = (time.perf_counter() - started) * 1000 / args.goals
+
+    mean_probability = sum(r["probability"] for r in results) / len(results)
+    print(f"{paths} paths per goal")
+    print(f"single goal:  {single_ms:7.2f} ms/goal")
+    print(f"batch of {args.goals}: {batch_ms:7.2f} ms/goal (mean success probability {mean_probability:.2f})")
+    print(f"cached:       {cached_ms:7.3f} ms/goal")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Compare the thread-wrapped synchronous OpenAI client with PecuniaAI's native
+async client at high concurrency, against the local OpenAI-compatible stub.
+
+    python benchmarks/bench_openai_client.py --calls 500 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(port: int, latency: float) -> subprocess.Popen:
+    stub = subprocess.Popen(
+        [sys.executable, "openai_stub.py", "--port", str(port), "--latency", f"fixed:{latency}"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return stub
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    stub.terminate()
+    raise RuntimeError("OpenAI stub did not start")
+
+
+async def measure(call: Callable[[], Awaitable[bool]], calls: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        started = time.perf_counter()
+        if not await call():
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(calls)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "calls": calls,
+        "errors": errors,
+        "wall_s": round(elapsed, 2),
+        "calls_per_s": round(calls / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 1),
+    }
+
+
+async def bench_threaded(base_url: str, calls: int) -> Dict[str, float]:
+    """The previous implementation: sync client wrapped in asyncio.to_thread"""
+    import openai
+
+    client = openai.OpenAI(api_key="stub", base_url=base_url, max_retries=0)
+
+    async def call() -> bool:
+        try:
+            await asyncio.to_thread(
+                client.chat.completions.create,
+                model="gpt-4",
+                messages=[{"role": "user", "content": "benchmark"}],
+                max_tokens=50,
+            )
+            return True
+        except Exception:
+            return False
+
+    return await measure(call, calls)
+
+
+async def bench_async(base_url: str, calls: int) -> Dict[str, float]:
+    """PecuniaAI._get_ai_response over the shared pooled AsyncOpenAI client"""
+    from ai_scheduler import ai_scheduler
+    from ai_resilience import AIUnavailableError
+    from ai_service import PecuniaAI
+
+    ai_scheduler.max_concurrency = calls
+    ai = PecuniaAI(base_url=base_url)
+
+    async def call() -> bool:
+        try:
+            return (await ai._get_ai_response("benchmark")).startswith("Stub")
+        except AIUnavailableError:
+            return False
+
+    try:
+        return await measure(call, calls)
+    finally:
+        await ai.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="concurrent calls per run")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds per completion")
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}/v1"
+    stub = start_stub(port, args.latency)
+    try:
+        results = {
+            "to_thread + sync client": asyncio.run(bench_threaded(base_url, args.calls)),
+            "native async client": asyncio.run(bench_async(base_url, args.calls)),
+        }
+    finally:
+        stub.terminate()
+        stub.wait(timeout=30)
+
+    print(f"{args.calls} concurrent calls, stub latency {args.latency * 1000:.0f} ms")
+    print(f"{'client':<26} {'calls/s':>9} {'wall s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, stats in results.items():
+        print(f"{name:<26} {stats['calls_per_s']:>9} {stats['wall_s']:>8} {stats['p50_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput of the peer-benchmark engine (peer_benchmarks.py).
+
+Ranks a batch of synthetic users on net worth, income and savings rate in one
+call, and times single-user percentile lookups.
+
+    python benchmarks/bench_peer_benchmarks.py --users 100000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+LOCATIONS = ["United States", "US", "Canada", "United Kingdom", "Germany", "Australia", "Elsewhere"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000, help="users ranked per batch call")
+    parser.add_argument("--lookups", type=int, default=20000, help="single-user lookups timed")
+    args = parser.parse_args()
+
+    from peer_benchmarks import peer_benchmarks
+
+    rng = np.random.default_rng(7)
+    ages = rng.integers(18, 80, args.users)
+    locations = rng.choice(LOCATIONS, args.users)
+    metric_values = {
+        "net_worth": rng.lognormal(11, 1.5, args.users) - 20000,
+        "income": rng.lognormal(11, 0.6, args.users),
+        "savings_rate": rng.normal(15, 12, args.users),
+    }
+    peer_benchmarks.percentile("income", 50000, 30, "US")
+
+    started = time.perf_counter()
+    ranks = peer_benchmarks.rank(metric_values, ages, locations)
+    batch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(args.lookups):
+        peer_benchmarks.percentile("net_worth", metric_values["net_worth"][i % args.users], ages[i % args.users], "US")
+    single_seconds = time.perf_counter() - started
+
+    print(f"tables v{peer_benchmarks.version}: {args.users} users ranked in {batch_seconds * 1000:.1f} ms "
+          f"({args.users / batch_seconds:,.0f} users/s), median rank {np.median(ranks):.1f}")
+    print(f"single lookup: {single_seconds / args.lookups * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Latency of the portfolio optimizer (portfolio_optimizer.py).
+
+Reports the one-time cost of building the covariance matrix, efficient
+frontier and risk-parity portfolio, the latency of optimizing one portfolio,
+and the throughput of rebalancing a batch of portfolios in one call.
+
+    python benchmarks/bench_portfolio_optimizer.py --portfolios 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--portfolios", type=int, default=10000, help="portfolios rebalanced in the batch call")
+    parser.add_argument("--single", type=int, default=1000, help="single-portfolio optimizations timed")
+    args = parser.parse_args()
+
+    from portfolio_optimizer import PortfolioOptimizer
+
+    optimizer = PortfolioOptimizer()
+    started = time.perf_counter()
+    optimizer._load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    holdings = {"VTI": 12500, "VXUS": 4200, "BND": 3100, "AAPL": 1800, "cash": 2500}
+    started = time.perf_counter()
+    for _ in range(args.single):
+        optimizer.optimize(holdings, risk_tolerance="medium")
+    single_ms = (time.perf_counter() - started) * 1000 / args.single
+
+    rng = np.random.default_rng(7)
+    matrix = rng.uniform(0, 20000, (args.portfolios, len(optimizer.tickers)))
+    matrix *= rng.random(matrix.shape) < 0.4
+    target_vols = rng.uniform(0.05, 0.17, args.portfolios)
+    started = time.perf_counter()
+    optimizer.rebalance_many(matrix, target_vols)
+    batch_seconds = time.perf_counter() - started
+
+    print(f"universe v{optimizer.version}: {len(optimizer.tickers)} funds, {len(optimizer.frontier_vols)} frontier points")
+    print(f"build (once per process): {load_ms:8.1f} ms")
+    print(f"optimize one portfolio:   {single_ms:8.3f} ms")
+    print(f"rebalance {args.portfolios} portfolios: {batch_seconds * 1000:8.1f} ms "
+          f"({args.portfolios / batch_seconds:,.0f} portfolios/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Report prompt tokens per PecuniaAI method before and after compaction.
+
+"Before" is the prompt as originally written (indented JSON, raw instruction
+blocks); "after" is what PromptBuilder sends within the method's budget. No
+provider is called.
+
+    python benchmarks/bench_prompt_tokens.py --transactions 500
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+CATEGORIES = ["Housing", "Food & Dining", "Transportation", "Entertainment", "Shopping", "Utilities", "Health"]
+MERCHANTS = ["Whole Foods", "Shell", "Netflix", "Amazon", "Uber", "Target", "CVS", "Starbucks", "Comcast"]
+
+
+def sample_payloads(transactions: int):
+    rng = random.Random(7)
+    spending = [
+        {
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "merchant": rng.choice(MERCHANTS),
+            "category": rng.choice(CATEGORIES),
+            "amount": round(rng.uniform(3, 400), 2),
+        }
+        for _ in range(transactions)
+    ]
+    goals = [
+        {"id": i, "title": f"Goal {i}", "target": 10000 * i, "current": 1500 * i, "deadline": "2027-06-30",
+         "category": "savings", "notes": "Automated monthly transfer from checking", "created_at": "2025-01-15"}
+        for i in range(1, 7)
+    ]
+    profile = {
+        "monthly_income": 6500, "monthly_expenses": 3750, "pecunia_score": 742, "age": 28,
+        "risk_tolerance": "medium", "location": "United States", "goals": goals,
+        "investments": {"VTI": 12500, "VXUS": 4200, "BND": 3100, "AAPL": 1800, "cash": 2500},
+    }
+    context = {"profile": profile, "recent_transactions": spending[:40]}
+    return {
+        "get_comprehensive_financial_analysis": ("get_comprehensive_financial_analysis", (profile,)),
+        "analyze_spending_patterns": ("analyze_spending_patterns", (spending,)),
+        "chat_with_ai": ("chat_with_ai", ("Can I afford to max out my Roth IRA this year?", context)),
+        "generate_smart_budget": ("generate_smart_budget", ({
+            "monthly_income": 6500, "expenses": {c: 300 for c in CATEGORIES}, "goals": goals,
+        },)),
+        "optimize_portfolio": ("optimize_portfolio", (profile["investments"],)),
+    }
+
+
+async def collect(transactions: int):
+    from ai_service import PecuniaAI
+    from metrics import metrics
+
+    ai = PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    ai.cache = None
+
+    async def capture(prompt: str) -> str:
+        return ""
+
+    ai._get_ai_response = capture
+    for name, (method, args) in sample_payloads(transactions).items():
+        await getattr(ai, method)(*args)
+    await ai.aclose()
+
+    rows = []
+    for name in sample_payloads(0):
+        before = metrics.quantile("ai_prompt_tokens", 0.5, method=name, stage="before")
+        after = metrics.quantile("ai_prompt_tokens", 0.5, method=name, stage="after")
+        rows.append((name, before, after))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=500, help="spending rows in the sample data")
+    args = parser.parse_args()
+
+    from prompt_builder import TIKTOKEN_AVAILABLE
+
+    rows = asyncio.run(collect(args.transactions))
+    print(f"token counts via {'tiktoken' if TIKTOKEN_AVAILABLE else 'character estimate'}")
+    print(f"{'method':<40} {'before':>8} {'after':>8} {'saved':>7}")
+    for name, before, after in rows:
+        print(f"{name:<40} {before:>8} {after:>8} {1 - after / before:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
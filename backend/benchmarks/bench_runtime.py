@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Runtime profile benchmark for the Pecunia API.
+
+Starts the server once per runtime profile (see runtime_config.py), drives
+/health, /api/auth/verify and a mock /api/ai/* route with a closed-loop load
+generator, and reports requests/sec and latency percentiles for each.
+
+    python benchmarks/bench_runtime.py --duration 10 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = [
+    ("GET", "/health", None),
+    ("GET", "/api/auth/verify", None),
+    ("POST", "/api/ai/chat", {"query": "How should I budget?"}),
+]
+
+# Seeded by auth_service.init_mock_users in every worker
+LOGIN = {"email": "demo@pecunia.com", "password": "DemoPass789"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(profile: str, port: int, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PECUNIA_RUNTIME_PROFILE": profile,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "MOCK_AI_LATENCY_SECONDS": str(args.ai_latency),
+        "AI_SCHEDULER_MAX_CONCURRENCY": str(args.concurrency * 4),
+    }
+    if args.workers:
+        env["UVICORN_WORKERS"] = str(args.workers)
+    code = "import logging, runtime_config; logging.basicConfig(level=logging.WARNING); runtime_config.run(log_level='warning', access_log=False)"
+    return subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+async def _drive(base_url: str, method: str, path: str, body, headers: Dict[str, str],
+                 concurrency: int, duration: float) -> Dict[str, object]:
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        stop_at = time.monotonic() + duration
+
+        async def loop():
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*[loop() for _ in range(concurrency)])
+    return {"latencies": latencies, "errors": errors}
+
+
+def _client_process(args_tuple):
+    return asyncio.run(_drive(*args_tuple))
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_load(base_url: str, method: str, path: str, body, headers, args) -> Dict[str, float]:
+    # Several client processes so the load generator is not the bottleneck
+    per_client = max(1, args.concurrency // args.clients)
+    jobs = [(base_url, method, path, body, headers, per_client, args.duration)] * args.clients
+    started = time.monotonic()
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(_client_process, jobs)
+    elapsed = time.monotonic() - started
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    return {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "rps": round(len(latencies) / min(elapsed, args.duration + 1), 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def benchmark_profile(profile: str, args) -> Dict[str, Dict[str, float]]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(profile, port, args)
+    try:
+        wait_until_ready(base_url)
+        token = httpx.post(f"{base_url}/api/auth/login", json=LOGIN, timeout=30).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        # Warm up connections and code paths before measuring
+        for method, path, body in ENDPOINTS:
+            httpx.request(method, f"{base_url}{path}", json=body, headers=headers, timeout=30)
+        return {path: run_load(base_url, method, path, body, headers, args) for method, path, body in ENDPOINTS}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["default", "performance"])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight requests")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="load generator processes")
+    parser.add_argument("--workers", type=int, default=0, help="override UVICORN_WORKERS for every profile")
+    parser.add_argument("--ai-latency", type=float, default=0.0, help="MOCK_AI_LATENCY_SECONDS for the AI route")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    results = {profile: benchmark_profile(profile, args) for profile in args.profiles}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<12} {'endpoint':<18} {'rps':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for profile, endpoints in results.items():
+        for path, stats in endpoints.items():
+            print(f"{profile:<12} {path:<18} {stats['rps']:>10} {stats['p50_ms']:>10} {stats['p99_ms']:>10} {stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
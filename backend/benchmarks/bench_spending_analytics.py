@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Spending analytics at scale (spending_analytics.py).
+
+Builds one user's history of synthetic transactions and reports the time to
+summarize it from columnar data, the time to convert request-shaped dicts
+to columns, the per-item Python loops the analysis used before, and prompt
+tokens for the summary against the raw list as indented JSON.
+
+    python benchmarks/bench_spending_analytics.py --transactions 1000000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+CATEGORIES = ["Housing", "Food & Dining", "Groceries", "Transportation", "Entertainment", "Shopping",
+              "Utilities", "Health", "Travel", "Subscriptions"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="transactions in the user's history")
+    parser.add_argument("--years", type=int, default=5, help="years the history spans")
+    parser.add_argument("--merchants", type=int, default=2000, help="distinct merchants")
+    parser.add_argument("--dict-rows", type=int, default=200_000,
+                        help="rows timed for dict conversion and the old loops (scaled to --transactions)")
+    args = parser.parse_args()
+
+    from prompt_builder import count_tokens
+    from spending_analytics import category_totals, summarize_spending, to_frame
+
+    n = args.transactions
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame({
+        "date": (np.datetime64("2021-01-01") + rng.integers(0, 365 * args.years, n)).astype("datetime64[s]"),
+        "amount": np.round(rng.lognormal(3.3, 1.0, n), 2),
+        "category": pd.Categorical.from_codes(rng.integers(0, len(CATEGORIES), n), CATEGORIES),
+        "merchant": pd.Categorical.from_codes(rng.integers(0, args.merchants, n),
+                                              [f"Merchant {i}" for i in range(args.merchants)]),
+    })
+
+    started = time.perf_counter()
+    summary = summarize_spending(frame)
+    category_totals(frame)
+    summarize_seconds = time.perf_counter() - started
+
+    rows = min(args.dict_rows, n)
+    records = frame.head(rows).astype({"date": str, "category": str, "merchant": str}).to_dict("records")
+    started = time.perf_counter()
+    to_frame(records)
+    convert_seconds = (time.perf_counter() - started) * n / rows
+
+    # What analyze_spending_patterns did per request before: a generator sum and a dict loop
+    started = time.perf_counter()
+    sum(item.get('amount', 0) for item in records)
+    totals = {}
+    for item in records:
+        category = item.get('category', 'Other')
+        totals[category] = totals.get(category, 0) + item.get('amount', 0)
+    loop_seconds = (time.perf_counter() - started) * n / rows
+    raw_tokens = count_tokens(json.dumps(records[:1000], indent=2)) * n / 1000
+
+    print(f"{n:,} transactions over {args.years} years, {len(CATEGORIES)} categories, {args.merchants:,} merchants")
+    print(f"summarize (columnar):           {summarize_seconds * 1000:9.1f} ms")
+    print(f"convert dicts to columns:       {convert_seconds * 1000:9.1f} ms (extrapolated from {rows:,} rows)")
+    print(f"old per-item loops (totals only): {loop_seconds * 1000:7.1f} ms (extrapolated from {rows:,} rows)")
+    print(f"prompt tokens, summary:         {count_tokens(json.dumps(summary, separators=(',', ':'))):9,}")
+    print(f"prompt tokens, raw list:        {raw_tokens:9,.0f} (estimated)")
+
+
+if __name__ == "__main__":
+    main()
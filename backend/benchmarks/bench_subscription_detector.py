@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Incremental subscription detection (subscription_detector.py).
+
+Stores a synthetic history of --rows transactions in a scratch transaction
+store: everyday purchases across --merchants merchants plus --subscriptions
+monthly, weekly and yearly recurring charges. It then times detection cold
+(a full scan) and after each of --appends appends of --new-rows rows (only
+the new rows are folded in). Reading the user's rows back from the store is
+timed separately, since the analytics endpoints share that read.
+
+    python benchmarks/bench_subscription_detector.py --rows 1000000 --new-rows 1000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+PERIOD_DAYS = (7, 30, 30, 30, 365)
+START = np.datetime64("2015-01-01")
+
+
+def history(rows: int, merchants: int, subscriptions: int, start: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Date-ordered purchases from `start` days after START, about 400 a day, plus every plan's charges in that span"""
+    span = max(1, rows // 400)
+    days = start + rng.integers(0, span, rows)
+    amount = np.round(rng.lognormal(3.3, 1.0, rows), 2)
+    names = np.array([f"STORE{i:04d} #{i % 97}" for i in range(merchants)], dtype=object)[rng.integers(0, merchants, rows)]
+    # Each plan charges once per period on its own schedule
+    charges = [(day, f"PLAN{plan:03d}.COM", round(5 + plan * 1.7, 2))
+               for plan in range(subscriptions)
+               for period in [PERIOD_DAYS[plan % len(PERIOD_DAYS)]]
+               for day in range(start - start % period + plan % period, start + span, period) if day >= start]
+    if charges:
+        plan_days, plan_names, plan_amounts = zip(*charges)
+        days = np.concatenate((days, plan_days))
+        names = np.concatenate((names, np.array(plan_names, dtype=object)))
+        amount = np.concatenate((amount, plan_amounts))
+    order = np.argsort(days, kind="stable")
+    return pd.DataFrame({
+        "date": (START + days[order]).astype("datetime64[s]"),
+        "amount": amount[order],
+        "category": pd.Categorical(np.full(len(days), "Other")),
+        "merchant": pd.Categorical(names[order]),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions already stored")
+    parser.add_argument("--merchants", type=int, default=5000, help="distinct everyday merchants")
+    parser.add_argument("--subscriptions", type=int, default=40, help="distinct recurring charges")
+    parser.add_argument("--new-rows", type=int, default=1000, help="rows per append")
+    parser.add_argument("--appends", type=int, default=5, help="appends timed")
+    args = parser.parse_args()
+
+    from subscription_detector import SubscriptionDetector
+    from transaction_store import TransactionStore
+
+    rng = np.random.default_rng(13)
+    with tempfile.TemporaryDirectory() as scratch:
+        store = TransactionStore(root=scratch)
+        detector = SubscriptionDetector(store)
+        frame = history(args.rows, args.merchants, args.subscriptions, 0, rng)
+        store.append("bench-user", frame, np.arange(len(frame), dtype=np.uint64))
+
+        started = time.perf_counter()
+        report = detector.detect("bench-user")
+        cold_seconds = time.perf_counter() - started
+
+        last_day = int((frame["date"].to_numpy()[-1] - START) // np.timedelta64(1, "D"))
+        incremental, reads = [], []
+        for i in range(args.appends):
+            new = history(args.new_rows, args.merchants, args.subscriptions, last_day + 1 + i * 3, rng)
+            store.append("bench-user", new, rng.integers(0, 2**63, len(new)).astype(np.uint64))
+            started = time.perf_counter()
+            store.frame("bench-user")
+            reads.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            report = detector.detect("bench-user")
+            incremental.append(time.perf_counter() - started)
+
+    print(f"{args.rows:,} stored rows, {report['active_count']} active of {len(report['subscriptions'])} "
+          f"recurring charges found")
+    print(f"cold detection (full scan):            {cold_seconds * 1000:9.1f} ms")
+    print(f"detection after +{args.new_rows:,} rows (median):   {np.median(incremental) * 1000:9.1f} ms")
+    print(f"  of which reading rows from the store: {np.median(reads) * 1000:9.1f} ms (shared with analytics)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of streaming bank-export import (transaction_import.py).
+
+Writes a synthetic CSV, OFX or QIF export of --rows transactions to a
+temporary directory, imports it into a scratch transaction store, and
+reports rows per second and the process's peak memory growth during the
+import. Rerun with a larger --rows to check that memory stays flat: it is
+set by TRANSACTION_IMPORT_BATCH_ROWS, not by the file size. A second import
+of the same file reports the speed of the all-duplicates path.
+
+    python benchmarks/bench_transaction_import.py --rows 1000000 --format csv
+"""
+
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+MERCHANTS = ["WHOLE FOODS #1032", "SHELL OIL 5743", "NETFLIX.COM", "AMAZON MKTPLACE", "UBER *TRIP",
+             "TARGET 00012", "CVS/PHARMACY", "STARBUCKS #2211", "COMCAST CABLE", "PAYROLL ACME INC"]
+
+
+def write_export(path: Path, rows: int, export_format: str, block: int = 100_000):
+    rng = np.random.default_rng(3)
+    with open(path, "w") as f:
+        if export_format == "csv":
+            f.write("Date,Description,Amount,Category\n")
+        elif export_format == "ofx":
+            f.write("OFXHEADER:100\nDATA:OFXSGML\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        else:
+            f.write("!Type:Bank\n")
+        for start in range(0, rows, block):
+            count = min(block, rows - start)
+            # Five years of history in date order across the whole file, as banks export it
+            first, last = start * 365 * 5 // rows, (start + count) * 365 * 5 // rows
+            days = np.datetime64("2020-01-01") + np.sort(rng.integers(first, last + 1, count))
+            amounts = -np.round(rng.lognormal(3.3, 1.0, count), 2)
+            names = rng.integers(0, len(MERCHANTS), count)
+            if export_format == "csv":
+                lines = (f"{d},{MERCHANTS[m]},{a:.2f},\n" for d, a, m in zip(days.astype(str), amounts, names))
+            elif export_format == "ofx":
+                lines = (f"<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{str(d).replace('-', '')}<TRNAMT>{a:.2f}"
+                         f"<FITID>{start + i}<NAME>{MERCHANTS[m]}</STMTTRN>\n"
+                         for i, (d, a, m) in enumerate(zip(days.astype(str), amounts, names)))
+            else:
+                lines = (f"D{d[5:7]}/{d[8:10]}/{d[:4]}\nT{a:.2f}\nP{MERCHANTS[m]}\n^\n"
+                         for d, a, m in zip(days.astype(str), amounts, names))
+            f.writelines(lines)
+        if export_format == "ofx":
+            f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions in the export")
+    parser.add_argument("--format", choices=("csv", "ofx", "qif"), default="csv", help="export format")
+    args = parser.parse_args()
+
+    from anomaly_detector import AnomalyDetector
+    from transaction_import import import_transactions
+    from transaction_store import TransactionStore
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = Path(scratch) / f"export.{args.format}"
+        write_export(path, args.rows, args.format)
+        size_mb = path.stat().st_size / 1e6
+        store = TransactionStore(root=str(Path(scratch) / "store"))
+        detector = AnomalyDetector(path=str(Path(scratch) / "anomaly.sqlite"))
+
+        baseline = peak_rss_mb()
+        for label in ("first import", "re-import (duplicates)"):
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                stats = import_transactions(f, "bench-user", filename=path.name, store=store, detector=detector)
+            seconds = time.perf_counter() - started
+            print(f"{label:24s} {stats['rows_read']:,} rows ({size_mb:,.0f} MB {args.format.upper()}): "
+                  f"{seconds:6.2f} s, {stats['rows_read'] / seconds:,.0f} rows/s, "
+                  f"imported {stats['imported']:,}, duplicates {stats['duplicates']:,}")
+        print(f"peak memory growth during imports: {peak_rss_mb() - baseline:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
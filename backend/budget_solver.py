@@ -0,0 +1,248 @@
+"""
+Deterministic budget allocation for PecuniaAI.generate_smart_budget.
+
+A budget is a small quadratic program over the user's expense categories:
+
+    minimize    sum_i (x_i - e_i)^2 / a_i
+    subject to  sum_i x_i <= income * (1 - savings target)
+                floor_i <= x_i <= cap_i
+
+where e_i is current spending and a_i = flexibility_i * e_i, so cuts fall
+on large, discretionary categories first and in proportion to their size.
+Floors (what cannot be cut this month, such as rent or minimum debt
+payments) and caps (guideline shares of income) come from the category's
+class, recognized from its name, and can be overridden per user in dollars.
+
+The optimality conditions give x_i = clip(e_i - mu * a_i, floor_i, cap_i)
+for a single multiplier mu >= 0. Total spending is piecewise linear in mu,
+so mu is found exactly from the sorted breakpoints, with no iteration.
+A batch of users is one array operation over users x categories, padded to
+the longest category list, for nightly runs.
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from goal_simulator import monthly_target
+
+# Share of income to save when the user has not set a target, in percent
+BUDGET_SAVINGS_RATE_TARGET = float(os.environ.get('BUDGET_SAVINGS_RATE_TARGET', 20))
+
+# Category class: (floor as a share of current spending, cap as a share of
+# income, flexibility). Flexibility scales how readily a class is cut.
+CATEGORY_CLASSES = {
+    "housing": (1.0, 0.30, 0.2),
+    "utilities": (0.9, 0.10, 0.3),
+    "insurance": (1.0, 0.10, 0.2),
+    "debt": (1.0, 0.36, 0.1),
+    "healthcare": (0.9, 0.10, 0.3),
+    "family": (0.9, 0.15, 0.3),
+    "groceries": (0.8, 0.12, 0.4),
+    "food": (0.5, 0.15, 0.7),
+    "transportation": (0.7, 0.15, 0.5),
+    "entertainment": (0.25, 0.10, 1.0),
+    "shopping": (0.25, 0.10, 1.0),
+    "subscriptions": (0.0, 0.03, 1.0),
+    "travel": (0.0, 0.08, 1.0),
+    "other": (0.5, 0.10, 0.8),
+}
+# Matched in order against the lowercased category name, so "credit card"
+# is debt and "childcare" is family before "car" can claim them
+CATEGORY_KEYWORDS = (
+    ("savings", ("saving", "invest", "retire", "emergency", "401k", "ira")),
+    ("debt", ("debt", "loan", "credit card", "repayment")),
+    ("insurance", ("insurance",)),
+    ("family", ("child", "daycare", "tuition", "education", "school")),
+    ("housing", ("rent", "mortgage", "housing", "home", "hoa")),
+    ("utilities", ("utilit", "electric", "water", "internet", "phone", "mobile", "heating")),
+    ("healthcare", ("health", "medical", "doctor", "pharma", "dental")),
+    ("groceries", ("grocer", "supermarket")),
+    ("food", ("food", "dining", "restaurant", "takeout", "coffee", "meal")),
+    ("transportation", ("transport", "car", "auto", "gas", "fuel", "commute", "transit", "parking")),
+    ("subscriptions", ("subscri", "streaming", "membership")),
+    ("entertainment", ("entertain", "fun", "leisure", "hobb", "recreation", "gaming")),
+    ("shopping", ("shop", "clothing", "apparel", "personal")),
+    ("travel", ("travel", "vacation", "holiday", "trip")),
+)
+
+
+@lru_cache(maxsize=4096)
+def classify_category(name: str) -> str:
+    """Category class for an expense name; "savings" entries are not spending"""
+    lowered = name.lower()
+    for category_class, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return category_class
+    return "other"
+
+
+def _amount(value: Any) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def solve_allocation(
+    current: np.ndarray,
+    floors: np.ndarray,
+    caps: np.ndarray,
+    flexibility: np.ndarray,
+    budgets: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise allocations x = clip(current - mu * flexibility, floors, caps) with sum(x) <= budget.
+
+    Arrays are (users, categories) with caps >= floors; padding columns are
+    all zero. Returns the allocations and whether each row met its budget;
+    rows whose floors alone exceed the budget get their floors.
+    """
+    users = np.arange(len(current))
+    # Each category falls at slope -a between mu = (e - cap) / a and (e - floor) / a;
+    # categories that cannot move get no breakpoints (both at 0, slope change 0)
+    movable = flexibility > 0
+    safe = np.where(movable, flexibility, 1.0)
+    starts = np.where(movable, np.maximum((current - caps) / safe, 0), 0)
+    stops = np.where(movable, np.maximum((current - floors) / safe, 0), 0)
+    events = np.concatenate((starts, stops), axis=1)
+    deltas = np.concatenate((-flexibility, flexibility), axis=1)
+    order = np.argsort(events, axis=1, kind="stable")
+    events = np.take_along_axis(events, order, axis=1)
+    slopes = np.cumsum(np.take_along_axis(deltas, order, axis=1), axis=1)
+
+    # Total spending at each breakpoint, starting from mu = 0
+    totals_at_zero = np.clip(current, floors, caps).sum(axis=1)
+    steps = slopes[:, :-1] * np.diff(events, axis=1)
+    totals = totals_at_zero[:, None] + np.concatenate((np.zeros((len(current), 1)), np.cumsum(steps, axis=1)), axis=1)
+
+    # First breakpoint at or under budget; mu lies on the segment before it
+    under = totals <= budgets[:, None] + 1e-9
+    first = np.argmax(under, axis=1)
+    k = np.maximum(first - 1, 0)
+    slope = slopes[users, k]
+    mu = events[users, k] + np.divide(
+        totals[users, k] - budgets, -slope, out=np.zeros(len(current)), where=slope < 0
+    )
+    mu = np.where(totals_at_zero <= budgets, 0.0, mu)
+    feasible = under.any(axis=1)
+    allocation = np.clip(current - mu[:, None] * flexibility, floors, caps)
+    return np.where(feasible[:, None], allocation, floors), feasible
+
+
+class BudgetSolver:
+    """Category targets from income, current spending, savings target, floors and caps"""
+
+    def __init__(self, savings_rate_target: float = BUDGET_SAVINGS_RATE_TARGET):
+        self.savings_rate_target = savings_rate_target
+
+    def _problem(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Arrays for one user's program; savings entries in `expenses` are set aside"""
+        income = _amount(user_data.get('monthly_income'))
+        floor_overrides = user_data.get('category_floors') or {}
+        cap_overrides = user_data.get('category_caps') or {}
+        names, classes, current, floors, caps, flexibility = [], [], [], [], [], []
+        saved = 0.0
+        for name, value in (user_data.get('expenses') or {}).items():
+            spent = _amount(value)
+            category_class = classify_category(str(name))
+            if category_class == "savings":
+                saved += spent
+                continue
+            floor_share, cap_share, flex = CATEGORY_CLASSES[category_class]
+            floor = _amount(floor_overrides[name]) if name in floor_overrides else spent * floor_share
+            cap = _amount(cap_overrides[name]) if name in cap_overrides else cap_share * income
+            names.append(name)
+            classes.append(category_class)
+            current.append(spent)
+            floors.append(floor)
+            caps.append(max(cap, floor))
+            flexibility.append(flex * spent)
+
+        rate = user_data.get('savings_rate_target')
+        rate = self.savings_rate_target if rate is None else _amount(rate)
+        # Goals with deadlines can need more than the rate target
+        goal_need = sum(monthly_target(goal) for goal in user_data.get('goals') or [] if isinstance(goal, dict))
+        savings_target = max(income * rate / 100, goal_need)
+        return {
+            "names": names,
+            "classes": classes,
+            "arrays": (current, floors, caps, flexibility),
+            "income": income,
+            "saved": saved,
+            "savings_target": savings_target,
+            "goal_need": goal_need,
+        }
+
+    def allocate(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.allocate_many([user_data])[0]
+
+    def allocate_many(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Budget per user, in input order, solved as one batch"""
+        problems = [self._problem(user) for user in users]
+        if not problems:
+            return []
+        width = max(1, max(len(p["names"]) for p in problems))
+        # current, floors, caps, flexibility, padded with zero columns
+        padded = np.zeros((4, len(problems), width))
+        for row, problem in enumerate(problems):
+            count = len(problem["names"])
+            if count:
+                padded[:, row, :count] = problem["arrays"]
+        income = np.array([p["income"] for p in problems])
+        savings_target = np.array([p["savings_target"] for p in problems])
+        allocation, feasible = solve_allocation(*padded, income - savings_target)
+
+        # Summary figures for the whole batch at once; padding columns are zero
+        current = padded[0]
+        allocated = allocation.sum(axis=1)
+        spent = current.sum(axis=1)
+        savings = income - allocated
+        shortfall = np.maximum(savings_target - savings, 0)
+        # How little spending has to change, and how close the plan gets to the target
+        moved = np.abs(allocation - current).sum(axis=1)
+        has_income = income > 0
+        per_income = np.divide(100, income, out=np.zeros_like(income), where=has_income)
+        score = np.where(has_income, np.clip(np.round(100 - (moved + shortfall) * per_income), 0, 100), 0)
+        summary = zip(
+            np.round(allocated, 2).tolist(), np.round(spent, 2).tolist(), np.round(savings, 2).tolist(),
+            np.round(savings * per_income, 1).tolist(), np.round((income - spent) * per_income, 1).tolist(),
+            np.round(shortfall, 2).tolist(), score.astype(int).tolist(), feasible.tolist(),
+        )
+        columns = zip(*(np.round(values, 2).tolist() for values in (current, allocation, padded[1], padded[2])))
+        return [self._result(problem, *rows) for problem, rows in zip(problems, zip(summary, columns))]
+
+    def _result(self, problem: Dict[str, Any], summary: Tuple, columns: Tuple) -> Dict[str, Any]:
+        allocated, spent, savings, savings_rate, current_savings_rate, shortfall, score, feasible = summary
+        current, target, floors, caps = columns
+        categories = {
+            name: {
+                "class": problem["classes"][i],
+                "current": current[i],
+                "target": target[i],
+                "change": round(target[i] - current[i], 2),
+                "floor": floors[i],
+                "cap": caps[i],
+            }
+            for i, name in enumerate(problem["names"])
+        }
+        return {
+            "categories": categories,
+            "total_income": round(problem["income"], 2),
+            "current_spending": spent,
+            "total_allocated": allocated,
+            "savings": savings,
+            "savings_rate": savings_rate,
+            "current_savings_rate": current_savings_rate,
+            "savings_target": round(problem["savings_target"], 2),
+            "goal_contributions": round(problem["goal_need"], 2),
+            "already_saving": round(problem["saved"], 2),
+            "target_met": feasible,
+            "shortfall": shortfall,
+            "optimization_score": score,
+        }
+
+
+# Shared solver; stateless apart from its defaults
+budget_solver = BudgetSolver()
@@ -0,0 +1,485 @@
+"""
+Daily cash-flow forecasts over the next CASHFLOW_HORIZON_DAYS days.
+
+A user's stored transactions are reduced to a few small arrays:
+- recurring income: inflows from payers seen in at least
+  CASHFLOW_INCOME_MIN_MONTHS distinct months of the whole calendar months
+  in the last CASHFLOW_INCOME_DAYS days, averaged per month by day of
+  month (31 values), so paydays land on the days they usually do
+- subscriptions: active recurring charges from subscription_detector,
+  projected forward from their next expected charge at their own period
+- variable spending: everything else, per category, as a recent daily
+  level (the last CASHFLOW_LEVEL_DAYS days) times a seasonal factor per
+  calendar month. The factors come from up to CASHFLOW_HISTORY_DAYS of
+  history and are shrunk towards 1 by CASHFLOW_SEASONAL_SHRINKAGE years of
+  prior, so one odd December does not set every December. Categories are
+  summed into one daily rate per calendar month (12 values)
+- volatility: the standard deviation of net cash flow across complete
+  calendar months of history, less each month's expected seasonal
+  spending
+
+Projection runs for a batch of users at once on users x days matrices:
+income and spending are gathered from the per-user arrays by each day's
+day of month and calendar month, subscription charges are scattered in,
+and a running sum along the days gives the expected balance change.
+Uncertainty grows with the square root of elapsed months, giving a band
+per level in CASHFLOW_BAND_LEVELS. Balances are relative to a starting
+balance that is added when a forecast is served.
+
+Forecasts are cached in SQLite per user and day. A nightly task
+(`nightly_precompute`) recomputes every known user's forecast at
+CASHFLOW_NIGHTLY_HOUR (UTC) in batches of CASHFLOW_BATCH_USERS. Requests
+are served from the cache; an import invalidates the user's entry, and a
+miss computes that user's forecast on the spot and caches it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from merchant_categorizer import merchant_categorizer
+from metrics import metrics
+from subscription_detector import DAYS_PER_MONTH, SUBSCRIPTION_AMOUNT_BAND, SubscriptionDetector, subscription_detector
+from transaction_store import TransactionStore, transaction_store
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+CASHFLOW_CACHE_PATH = os.environ.get('CASHFLOW_CACHE_PATH', str(STATE_DIR / 'cashflow_forecasts.sqlite'))
+CASHFLOW_HORIZON_DAYS = int(os.environ.get('CASHFLOW_HORIZON_DAYS', 365))
+# History read for seasonal factors and volatility
+CASHFLOW_HISTORY_DAYS = int(os.environ.get('CASHFLOW_HISTORY_DAYS', 3 * 365))
+# Recent window that sets each category's spending level
+CASHFLOW_LEVEL_DAYS = int(os.environ.get('CASHFLOW_LEVEL_DAYS', 182))
+# Window (taken as whole calendar months), and distinct months a payer must appear in, for inflows
+# to count as recurring income
+CASHFLOW_INCOME_DAYS = int(os.environ.get('CASHFLOW_INCOME_DAYS', 182))
+CASHFLOW_INCOME_MIN_MONTHS = int(os.environ.get('CASHFLOW_INCOME_MIN_MONTHS', 3))
+# Years of "no seasonality" prior each calendar month's factor is shrunk towards
+CASHFLOW_SEASONAL_SHRINKAGE = float(os.environ.get('CASHFLOW_SEASONAL_SHRINKAGE', 1.0))
+# Monthly volatility as a share of monthly spending when history is too short to measure it
+CASHFLOW_DEFAULT_VOLATILITY = float(os.environ.get('CASHFLOW_DEFAULT_VOLATILITY', 0.15))
+CASHFLOW_BAND_LEVELS = tuple(
+    float(level) for level in os.environ.get('CASHFLOW_BAND_LEVELS', '0.8,0.95').split(',') if level.strip()
+)
+CASHFLOW_BATCH_USERS = int(os.environ.get('CASHFLOW_BATCH_USERS', 500))
+# UTC hour of the nightly precompute; negative disables it
+CASHFLOW_NIGHTLY_HOUR = int(os.environ.get('CASHFLOW_NIGHTLY_HOUR', 3))
+
+# Days between charges for periods counted in days; the rest step by calendar months
+_PERIOD_DAYS = {"weekly": 7, "biweekly": 14}
+_PERIOD_MONTHS = {"monthly": 1, "quarterly": 3, "yearly": 12}
+
+
+def _day(value: Optional[str] = None) -> int:
+    """Days since the epoch of a YYYY-MM-DD date, or of today (UTC)"""
+    if value is None:
+        return int(np.datetime64(datetime.now(timezone.utc).date(), "D").astype(np.int64))
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def _day_label(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def _calendar(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calendar month (0-11), day of month (1-31) and days in that month, per day number"""
+    dates = days.astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    day_of_month = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+    month_days = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+    return months.astype(np.int64) % 12, day_of_month, month_days
+
+
+def _month_start(months: np.ndarray) -> np.ndarray:
+    """Day number of the first day of each month (months since the epoch)"""
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+def _charge_days(next_days: np.ndarray, periods: Sequence[str], start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(charge, day) pairs for every day in [start, end) each charge recurs on, stepping from its next expected day"""
+    step_days = np.array([_PERIOD_DAYS.get(period, 0) for period in periods], dtype=np.int64)
+    step_months = np.array([_PERIOD_MONTHS.get(period, 0) for period in periods], dtype=np.int64)
+    charges, days = [], []
+    by_days = np.flatnonzero(step_days)
+    if len(by_days):
+        step, next_day = step_days[by_days], next_days[by_days]
+        # The first occurrence on or after start, then every step
+        first = next_day + np.maximum(0, -((next_day - start) // step)) * step
+        count = (end - start) // int(step.min()) + 1
+        charges.append(np.repeat(by_days[:, None], count, axis=1))
+        days.append(first[:, None] + np.arange(count) * step[:, None])
+    by_months = np.flatnonzero(step_months)
+    if len(by_months):
+        step, next_day = step_months[by_months], next_days[by_months]
+        month = next_day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        offset = next_day - _month_start(month)
+        count = int(((end - next_day) // 28 // step).max()) + 2
+        months = month[:, None] + np.arange(count) * step[:, None]
+        # The charge's day of month, or the month's last day when it is shorter
+        charges.append(np.repeat(by_months[:, None], count, axis=1))
+        days.append(np.minimum(_month_start(months) + offset[:, None], _month_start(months + 1) - 1))
+    if not charges:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    charges = np.concatenate([block.ravel() for block in charges])
+    days = np.concatenate([block.ravel() for block in days])
+    inside = (days >= start) & (days < end)
+    return charges[inside], days[inside]
+
+
+class CashFlowFeatures:
+    """What a user's forecast is projected from"""
+
+    __slots__ = ("income", "variable", "volatility", "charges", "subscriptions_monthly", "history_days", "source")
+
+    def __init__(self, income: np.ndarray, variable: np.ndarray, volatility: float,
+                 charges: List[Tuple[int, str, float]], subscriptions_monthly: float, history_days: int, source: str):
+        self.income = income            # recurring income per month by day of month, (31,)
+        self.variable = variable        # variable spending per day by calendar month, (12,)
+        self.volatility = volatility    # standard deviation of a month's net cash flow
+        self.charges = charges          # (next expected day, period, amount) per active subscription
+        self.subscriptions_monthly = subscriptions_monthly
+        self.history_days = history_days
+        self.source = source
+
+    def components(self) -> Dict[str, float]:
+        return {
+            "recurring_income_monthly": round(float(self.income.sum()), 2),
+            "subscriptions_monthly": round(self.subscriptions_monthly, 2),
+            "variable_spending_monthly": round(float(self.variable.mean() * DAYS_PER_MONTH), 2),
+            "monthly_volatility": round(self.volatility, 2),
+        }
+
+
+def history_features(frame: pd.DataFrame, subscriptions: Optional[Dict[str, Any]], as_of: int) -> Optional[CashFlowFeatures]:
+    """Forecast inputs from a user's transactions (date, amount, category, merchant) up to `as_of`"""
+    days = frame["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    amounts = frame["amount"].to_numpy(dtype=float)
+    keep = days <= as_of
+    if not keep.any():
+        return None
+    anchor = int(days[keep].max())
+    window = keep & (days > anchor - CASHFLOW_HISTORY_DAYS)
+    days, amounts = days[window], amounts[window]
+    merchants = frame["merchant"].to_numpy(dtype=object)[window]
+    categories = frame["category"].to_numpy(dtype=object)[window]
+    first = int(days.min())
+    span = anchor - first + 1
+    calendar_month, day_of_month, _ = _calendar(days)
+    # Calendar months wholly inside the history
+    month = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    first_month = int(np.datetime64(first - 1, "D").astype("datetime64[M]").astype(np.int64)) + 1
+    last_month = int(np.datetime64(anchor + 1, "D").astype("datetime64[M]").astype(np.int64)) - 1
+
+    # Recurring income: payers seen in enough distinct months of the income window. The window is
+    # whole calendar months, so each month brings all of its paydays or none
+    income = np.zeros(31)
+    income_first = max(first_month, last_month - max(1, round(CASHFLOW_INCOME_DAYS / DAYS_PER_MONTH)) + 1)
+    if last_month >= income_first:
+        in_window = (month >= income_first) & (month <= last_month)
+        income_months = float(last_month - income_first + 1)
+    else:
+        # Less than one whole month of history: all of it, pro rata
+        in_window = np.ones(len(days), dtype=bool)
+        income_months = span / DAYS_PER_MONTH
+    recent_inflow = (amounts < 0) & in_window
+    if recent_inflow.any():
+        payers, _ = pd.factorize(merchant_categorizer.merchant_names(merchants[recent_inflow]), use_na_sentinel=False)
+        months = month[recent_inflow] - month[recent_inflow].min()
+        stride = int(months.max()) + 1
+        # Distinct (payer, month) pairs, counted per payer
+        seen = np.bincount(np.unique(payers * stride + months) // stride, minlength=payers.max() + 1)
+        needed = min(CASHFLOW_INCOME_MIN_MONTHS, max(1, round(income_months)))
+        recurring = seen[payers] >= needed
+        income = np.bincount(day_of_month[recent_inflow][recurring] - 1, weights=-amounts[recent_inflow][recurring],
+                             minlength=31) / max(1.0, income_months)
+
+    # Subscription charges are projected on their own schedule, not as variable spending
+    outflow = amounts > 0
+    active = [entry for entry in (subscriptions or {}).get("subscriptions", []) if entry["active"]]
+    known = {entry["merchant"]: entry["amount"] for entry in (subscriptions or {}).get("subscriptions", [])}
+    if known:
+        names = merchant_categorizer.merchant_names(np.asarray(list(known), dtype=object))
+        by_name = dict(zip(names.tolist(), known.values()))
+        typical = pd.Series(merchant_categorizer.merchant_names(merchants[outflow])).map(by_name).to_numpy(dtype=float)
+        charge = np.abs(amounts[outflow] - typical) <= SUBSCRIPTION_AMOUNT_BAND * typical
+        outflow[np.flatnonzero(outflow)[charge]] = False
+
+    # Variable spending: recent level per category times a shrunk seasonal factor per calendar month
+    variable = np.zeros(12)
+    if outflow.any():
+        codes, labels = pd.factorize(categories[outflow])
+        spend = np.bincount(codes * 12 + calendar_month[outflow], weights=amounts[outflow],
+                            minlength=len(labels) * 12).reshape(len(labels), 12)
+        coverage = np.bincount(_calendar(np.arange(first, anchor + 1))[0], minlength=12).astype(float)
+        rate = spend / np.maximum(coverage, 1)
+        overall = spend.sum(axis=1, keepdims=True) / coverage.sum()
+        ratio = np.divide(rate, overall, out=np.ones_like(rate), where=overall > 0)
+        years = coverage / DAYS_PER_MONTH
+        season = (years * ratio + CASHFLOW_SEASONAL_SHRINKAGE) / (years + CASHFLOW_SEASONAL_SHRINKAGE)
+        level_start = max(first, anchor - CASHFLOW_LEVEL_DAYS + 1)
+        recent = days[outflow] >= level_start
+        recent_spend = np.bincount(codes[recent], weights=amounts[outflow][recent], minlength=len(labels))
+        recent_coverage = np.bincount(_calendar(np.arange(level_start, anchor + 1))[0], minlength=12)
+        level = recent_spend / np.maximum(season @ recent_coverage, 1e-9)
+        variable = level @ season
+
+    # Volatility of net cash flow across the complete calendar months of history
+    subscriptions_monthly = float(sum(entry["monthly_cost"] for entry in active))
+    if last_month - first_month + 1 >= 3:
+        inside = (month >= first_month) & (month <= last_month)
+        net = np.bincount(month[inside] - first_month, weights=-amounts[inside], minlength=last_month - first_month + 1)
+        # Less the seasonal spending the forecast already expects in each month
+        months = np.arange(first_month, last_month + 1)
+        month_days = _month_start(months + 1) - _month_start(months)
+        volatility = float((net + variable[months % 12] * month_days).std(ddof=1))
+    else:
+        volatility = CASHFLOW_DEFAULT_VOLATILITY * float(variable.mean() * DAYS_PER_MONTH + subscriptions_monthly)
+
+    charges = [(_day(entry["next_expected"]), entry["period"], float(entry["amount"])) for entry in active]
+    return CashFlowFeatures(income, variable, volatility, charges, subscriptions_monthly, span, "history")
+
+
+def profile_features(monthly_income: float, monthly_expenses: float) -> CashFlowFeatures:
+    """Forecast inputs from point-in-time monthly income and expenses, spread evenly over each month"""
+    income = np.zeros(31)
+    # Days 1-28 exist in every month, so the monthly total is exact
+    income[:28] = max(0.0, monthly_income) / 28
+    variable = np.full(12, max(0.0, monthly_expenses) / DAYS_PER_MONTH)
+    return CashFlowFeatures(income, variable, CASHFLOW_DEFAULT_VOLATILITY * max(0.0, monthly_expenses), [], 0.0, 0, "profile")
+
+
+def project(features: Sequence[CashFlowFeatures], start: int,
+            horizon: int = CASHFLOW_HORIZON_DAYS) -> Dict[str, np.ndarray]:
+    """Daily inflow, outflow, expected balance change and its standard deviation, each users x days"""
+    days = start + np.arange(horizon, dtype=np.int64)
+    calendar_month, day_of_month, month_days = _calendar(days)
+    income = np.stack([item.income for item in features])
+    # Income on days 29-31 of shorter months lands on their last day
+    tail = np.cumsum(income[:, ::-1], axis=1)[:, ::-1]
+    last_day = day_of_month == month_days
+    inflow = np.where(last_day, tail[:, day_of_month - 1], income[:, day_of_month - 1])
+    outflow = np.stack([item.variable for item in features])[:, calendar_month]
+
+    # Every user's subscription charges, scattered into their days
+    charges = [(row, *charge) for row, item in enumerate(features) for charge in item.charges]
+    if charges:
+        rows, next_days, periods, amounts = zip(*charges)
+        charge, charged = _charge_days(np.array(next_days, dtype=np.int64), periods, start, start + horizon)
+        np.add.at(outflow, (np.array(rows)[charge], charged - start), np.array(amounts)[charge])
+
+    volatility = np.array([item.volatility for item in features])
+    spread = volatility[:, None] * np.sqrt(np.arange(1, horizon + 1) / DAYS_PER_MONTH)[None, :]
+    return {
+        "inflow": inflow,
+        "outflow": outflow,
+        "change": np.cumsum(inflow - outflow, axis=1),
+        "spread": spread,
+    }
+
+
+def render_forecast(payload: Dict[str, Any], balance: float = 0.0) -> Dict[str, Any]:
+    """A cached forecast as served: balances from `balance`, bands, month ends and shortfall dates"""
+    start, horizon = payload["start"], len(payload["change"])
+    days = start + np.arange(horizon, dtype=np.int64)
+    dates = days.astype("datetime64[D]").astype(str).tolist()
+    expected = balance + np.asarray(payload["change"])
+    spread = np.asarray(payload["spread"])
+    bands = {}
+    for level in CASHFLOW_BAND_LEVELS:
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        bands[f"{level * 100:g}"] = {"lower": np.round(expected - z * spread, 2), "upper": np.round(expected + z * spread, 2)}
+    widest = bands[f"{max(CASHFLOW_BAND_LEVELS) * 100:g}"]["lower"] if bands else expected
+
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    month_end = np.flatnonzero(np.r_[months[1:] != months[:-1], True])
+    inflow, outflow = np.asarray(payload["inflow"]), np.asarray(payload["outflow"])
+    month_start = np.r_[0, month_end[:-1] + 1]
+    monthly = [{
+        "month": str(months[end]),
+        "income": round(float(inflow[begin:end + 1].sum()), 2),
+        "spending": round(float(outflow[begin:end + 1].sum()), 2),
+        "balance": round(float(expected[end]), 2),
+        **{f"lower_{name}": float(band["lower"][end]) for name, band in bands.items()},
+        **{f"upper_{name}": float(band["upper"][end]) for name, band in bands.items()},
+    } for begin, end in zip(month_start.tolist(), month_end.tolist())]
+
+    lowest = int(expected.argmin())
+    below = np.flatnonzero(expected < 0)
+    at_risk = np.flatnonzero(widest < 0)
+    return {
+        "as_of": _day_label(payload["as_of"]),
+        "source": payload["source"],
+        "computed_at": payload["computed_at"],
+        "history_days": payload["history_days"],
+        "starting_balance": round(balance, 2),
+        "components": payload["components"],
+        "lowest_balance": {"date": dates[lowest], "balance": round(float(expected[lowest]), 2)},
+        "first_shortfall": dates[below[0]] if len(below) else None,
+        "shortfall_risk_date": dates[at_risk[0]] if len(at_risk) else None,
+        "monthly": monthly,
+        "daily": {
+            "dates": dates,
+            "balance": np.round(expected, 2).tolist(),
+            "inflow": payload["inflow"],
+            "outflow": payload["outflow"],
+            "bands": {name: {side: values.tolist() for side, values in band.items()} for name, band in bands.items()},
+        },
+    }
+
+
+class CashFlowForecaster:
+    """Batched daily forecasts over the transaction store, cached per user in SQLite"""
+
+    def __init__(
+        self,
+        store: TransactionStore = transaction_store,
+        detector: SubscriptionDetector = subscription_detector,
+        path: str = CASHFLOW_CACHE_PATH,
+    ):
+        self.store = store
+        self.detector = detector
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # as_of is -1 for a user whose forecast must be recomputed
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cashflow_forecasts ("
+                "user_id TEXT PRIMARY KEY, as_of INTEGER NOT NULL, payload TEXT)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _features(self, user_id: str, as_of: int) -> Optional[CashFlowFeatures]:
+        frame = self.store.frame(user_id)
+        if not len(frame):
+            return None
+        return history_features(frame, self.detector.detect(user_id), as_of)
+
+    @staticmethod
+    def _payloads(features: Sequence[CashFlowFeatures], as_of: int) -> List[Dict[str, Any]]:
+        projected = project(features, as_of + 1)
+        rounded = {name: np.round(values, 2) for name, values in projected.items()}
+        computed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return [{
+            "as_of": as_of,
+            "start": as_of + 1,
+            "source": item.source,
+            "computed_at": computed_at,
+            "history_days": item.history_days,
+            "components": item.components(),
+            **{name: values[row].tolist() for name, values in rounded.items()},
+        } for row, item in enumerate(features)]
+
+    def precompute(
+        self,
+        user_ids: Optional[Sequence[str]] = None,
+        as_of: Optional[str] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        """Compute and cache forecasts for `user_ids` (default: every known user) in batches,
+        returning early between batches once `stop` is set"""
+        started = time.perf_counter()
+        day = _day(as_of)
+        users = list(user_ids) if user_ids is not None else self.users()
+        computed = 0
+        for offset in range(0, len(users), CASHFLOW_BATCH_USERS):
+            if stop is not None and stop.is_set():
+                break
+            batch = [(user_id, self._features(user_id, day)) for user_id in users[offset:offset + CASHFLOW_BATCH_USERS]]
+            batch = [(user_id, item) for user_id, item in batch if item is not None]
+            if not batch:
+                continue
+            payloads = self._payloads([item for _, item in batch], day)
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cashflow_forecasts VALUES (?, ?, ?)",
+                    [(user_id, day, json.dumps(payload)) for (user_id, _), payload in zip(batch, payloads)],
+                )
+            computed += len(batch)
+        seconds = time.perf_counter() - started
+        metrics.inc("cashflow_forecasts_computed_total", computed)
+        metrics.observe("cashflow_precompute_seconds", seconds)
+        return {"as_of": _day_label(day), "users": len(users), "forecasts": computed, "seconds": round(seconds, 3)}
+
+    def forecast(self, user_id: str, as_of: Optional[str] = None, balance: float = 0.0) -> Optional[Dict[str, Any]]:
+        """A user's forecast from the cache, computed on a miss; None without stored transactions"""
+        day = _day(as_of)
+        row = self._connect().execute(
+            "SELECT payload FROM cashflow_forecasts WHERE user_id = ? AND as_of = ?", (user_id, day)
+        ).fetchone()
+        metrics.inc("cashflow_forecast_requests_total", result="hit" if row else "miss")
+        if row is None:
+            self.precompute([user_id], as_of)
+            row = self._connect().execute(
+                "SELECT payload FROM cashflow_forecasts WHERE user_id = ? AND as_of = ?", (user_id, day)
+            ).fetchone()
+            if row is None:
+                return None
+        return render_forecast(json.loads(row[0]), balance)
+
+    def forecast_profile(self, monthly_income: float, monthly_expenses: float, as_of: Optional[str] = None,
+                         balance: float = 0.0) -> Dict[str, Any]:
+        """A forecast from point-in-time monthly figures, for users without transaction history; not cached"""
+        day = _day(as_of)
+        payload = self._payloads([profile_features(monthly_income, monthly_expenses)], day)[0]
+        return render_forecast(payload, balance)
+
+    def users(self) -> List[str]:
+        return [user_id for (user_id,) in self._connect().execute("SELECT user_id FROM cashflow_forecasts")]
+
+    def invalidate(self, user_id: str):
+        """Mark a user's forecast for recomputation, keeping them in the nightly run"""
+        self._connect().execute(
+            "INSERT INTO cashflow_forecasts VALUES (?, -1, NULL) "
+            "ON CONFLICT (user_id) DO UPDATE SET as_of = -1, payload = NULL", (user_id,)
+        )
+
+    def forget(self, user_id: str):
+        self._connect().execute("DELETE FROM cashflow_forecasts WHERE user_id = ?", (user_id,))
+
+
+async def nightly_precompute(forecaster: "CashFlowForecaster", hour: int = CASHFLOW_NIGHTLY_HOUR):
+    """Recompute every known user's forecast once a day at `hour` UTC, until cancelled"""
+    if hour < 0:
+        return
+    stop = threading.Event()
+    while True:
+        now = datetime.now(timezone.utc)
+        run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        await asyncio.sleep((run_at - now).total_seconds())
+        try:
+            stats = await asyncio.to_thread(forecaster.precompute, stop=stop)
+            logger.info(f"Precomputed cash-flow forecasts: {stats}")
+        except asyncio.CancelledError:
+            # The worker thread cannot be interrupted; it stops after its current batch
+            stop.set()
+            raise
+        except Exception:
+            logger.exception("Nightly cash-flow forecast precompute failed")
+
+
+# Shared forecaster over the transaction store
+cashflow_forecaster = CashFlowForecaster()
@@ -0,0 +1,145 @@
+"""
+Bounded per-user chat memory for PecuniaAI.chat_with_ai.
+
+The last few turns are kept verbatim. Older turns are folded into a rolling
+summary of one short line per exchange, and the oldest lines are dropped once
+the summary exceeds its token cap. Every turn does a constant amount of work,
+so latency stays flat however long a conversation runs. The prompt builder
+enforces the hard per-prompt cap on top of this.
+
+Conversations live in a TTLStore, so memory is bounded by entry count and
+idle conversations expire. They are saved to CHAT_MEMORY_PATH at shutdown
+and reloaded on start.
+"""
+
+import json
+import logging
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Tuple
+
+from prompt_builder import count_tokens
+from ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+CHAT_RECENT_TURNS = int(os.environ.get('CHAT_RECENT_TURNS', 6))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', 200))
+CHAT_MAX_CONVERSATIONS = int(os.environ.get('CHAT_MAX_CONVERSATIONS', 10000))
+CHAT_CONVERSATION_TTL_SECONDS = float(os.environ.get('CHAT_CONVERSATION_TTL_SECONDS', 24 * 3600))
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+CHAT_MEMORY_PATH = os.environ.get('CHAT_MEMORY_PATH', str(STATE_DIR / 'chat_memory.json'))
+
+# Longest stored turn, in characters; replies can be pages long
+MAX_TURN_CHARS = 1500
+GIST_WORDS = 24
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _gist(text: str) -> str:
+    """First sentence of `text`, capped at GIST_WORDS words"""
+    sentence = _SENTENCE_END.split(" ".join(text.split()), maxsplit=1)[0]
+    words = sentence.split()
+    return " ".join(words[:GIST_WORDS]) + ("..." if len(words) > GIST_WORDS else "")
+
+
+class Conversation:
+    __slots__ = ("turns", "summary", "summary_tokens")
+
+    def __init__(self):
+        self.turns: Deque[Dict[str, str]] = deque()
+        self.summary: Deque[Tuple[str, int]] = deque()
+        self.summary_tokens = 0
+
+
+class ConversationStore:
+    """Recent turns verbatim plus a token-capped rolling summary, per user"""
+
+    def __init__(
+        self,
+        recent_turns: int = CHAT_RECENT_TURNS,
+        summary_max_tokens: int = CHAT_SUMMARY_MAX_TOKENS,
+        max_conversations: int = CHAT_MAX_CONVERSATIONS,
+        ttl_seconds: float = CHAT_CONVERSATION_TTL_SECONDS,
+        path: str = CHAT_MEMORY_PATH,
+    ):
+        self.path = path
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self._conversations = TTLStore(max_entries=max_conversations, ttl_seconds=ttl_seconds)
+
+    def history(self, user_id: str) -> Dict[str, Any]:
+        """Summary and recent turns to include in the next prompt"""
+        conversation = self._conversations.get(user_id)
+        if conversation is None:
+            return {"summary": [], "recent_turns": []}
+        return {
+            "summary": [line for line, _ in conversation.summary],
+            "recent_turns": list(conversation.turns),
+        }
+
+    def record(self, user_id: str, message: str, reply: str):
+        """Append one exchange, folding turns that fall out of the verbatim window"""
+        conversation = self._conversations.get(user_id)
+        if conversation is None:
+            conversation = Conversation()
+        conversation.turns.append({"role": "user", "content": message[:MAX_TURN_CHARS]})
+        conversation.turns.append({"role": "assistant", "content": reply[:MAX_TURN_CHARS]})
+        while len(conversation.turns) > self.recent_turns:
+            self._fold(conversation)
+        # Re-setting refreshes the TTL and LRU position
+        self._conversations.set(user_id, conversation)
+
+    def _fold(self, conversation: Conversation):
+        turn = conversation.turns.popleft()
+        speaker = "User" if turn["role"] == "user" else "Pecunia"
+        line = f"{speaker}: {_gist(turn['content'])}"
+        tokens = count_tokens(line)
+        conversation.summary.append((line, tokens))
+        conversation.summary_tokens += tokens
+        while conversation.summary_tokens > self.summary_max_tokens and conversation.summary:
+            conversation.summary_tokens -= conversation.summary.popleft()[1]
+
+    def clear(self, user_id: str):
+        self._conversations.pop(user_id)
+
+    def save(self):
+        """Write every live conversation to `path`"""
+        records = {
+            user_id: {"turns": list(conversation.turns), "summary": [list(item) for item in conversation.summary]}
+            for user_id, conversation in self._conversations.items()
+        }
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".tmp")
+        partial.write_text(json.dumps(records))
+        partial.replace(path)
+        logger.info(f"Saved {len(records)} conversations")
+
+    def load(self):
+        """Restore conversations saved by `save`; each gets a fresh TTL"""
+        path = Path(self.path)
+        if not path.exists():
+            return
+        try:
+            records = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable chat memory {path}: {str(e)}")
+            return
+        for user_id, record in records.items():
+            conversation = Conversation()
+            conversation.turns.extend(record["turns"])
+            conversation.summary.extend((line, tokens) for line, tokens in record["summary"])
+            conversation.summary_tokens = sum(tokens for _, tokens in conversation.summary)
+            self._conversations.set(user_id, conversation)
+        path.unlink()
+
+    def stats(self) -> Dict[str, int]:
+        return {"conversations": len(self._conversations), "max_conversations": self._conversations.max_entries}
+
+
+# Global conversation memory for chat
+conversation_store = ConversationStore()
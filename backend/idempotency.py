@@ -0,0 +1,192 @@
+"""
+Idempotency-Key support for POST routes.
+
+The first response for a key is stored and replayed byte-for-byte when the
+client retries, so a retried analysis or registration does not redo the LLM
+call or the bcrypt hash. A duplicate that arrives while the original is still
+running waits for it instead of running again.
+
+Request bodies are buffered to fingerprint them, up to
+IDEMPOTENCY_MAX_REQUEST_BYTES; larger requests, and routes that stream
+their body (bank imports), pass through without idempotency. Responses that
+only reflect load at the time (429, 408) are not stored, so a retry after
+backing off runs again instead of replaying the rejection.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from metrics import metrics
+from ttl_store import TTLStore
+
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+# Total size of stored responses; the least recently used are evicted beyond it
+IDEMPOTENCY_MAX_STORED_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_STORED_BYTES', 64 * 1024 * 1024))
+# Responses larger than this are passed through without being stored
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_BODY_BYTES', 1024 * 1024))
+# Request bodies larger than this are passed through without idempotency
+IDEMPOTENCY_MAX_REQUEST_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_REQUEST_BYTES', 1024 * 1024))
+# Routes whose request body is streamed by the handler are never buffered
+IDEMPOTENCY_STREAMING_PATHS = ("/api/transactions/import",)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Rejections caused by load rather than the request itself: retried, never replayed
+TRANSIENT_STATUSES = frozenset({408, 425, 429})
+
+REPLAY_HEADER = (b"idempotent-replayed", b"true")
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status", "headers", "body")
+
+    def __init__(self, fingerprint: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers) + 128
+
+
+async def _send_json(send, status_code: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for repeated Idempotency-Keys"""
+
+    def __init__(
+        self,
+        app,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        max_body_bytes: int = IDEMPOTENCY_MAX_BODY_BYTES,
+        max_stored_bytes: int = IDEMPOTENCY_MAX_STORED_BYTES,
+        max_request_bytes: int = IDEMPOTENCY_MAX_REQUEST_BYTES,
+        streaming_paths: Tuple[str, ...] = IDEMPOTENCY_STREAMING_PATHS,
+    ):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.max_request_bytes = max_request_bytes
+        self.streaming_paths = streaming_paths
+        self.responses = TTLStore(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_stored_bytes, sizeof=StoredResponse.size
+        )
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[bytes]:
+        for key, value in scope["headers"]:
+            if key == name:
+                return value
+        return None
+
+    def _storage_key(self, scope, idempotency_key: bytes) -> str:
+        # Scope keys to the caller and route so clients cannot replay each other
+        authorization = self._header(scope, b"authorization") or b""
+        material = b"\x00".join([idempotency_key, scope["path"].encode(), authorization])
+        return hashlib.sha256(material).hexdigest()
+
+    @staticmethod
+    def _replaying(messages: list, receive):
+        """A receive callable yielding the buffered messages, then the rest of the request"""
+        replay_messages = iter(messages)
+
+        async def replay_receive():
+            message = next(replay_messages, None)
+            return message if message is not None else await receive()
+
+        return replay_receive
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] in self.streaming_paths:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = self._header(scope, b"idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await _send_json(send, 400, "Idempotency-Key is too long")
+            return
+
+        # Buffer the request body so it can be fingerprinted and then replayed to the app
+        messages = []
+        body = hashlib.sha256()
+        received = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body.update(message.get("body", b""))
+            received += len(message.get("body", b""))
+            if received > self.max_request_bytes:
+                metrics.inc("idempotency_passthrough_total")
+                await self.app(scope, self._replaying(messages, receive), send)
+                return
+            if not message.get("more_body", False):
+                break
+        fingerprint = body.hexdigest()
+        key = self._storage_key(scope, idempotency_key)
+
+        while True:
+            stored = self.responses.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    metrics.inc("idempotency_conflicts_total")
+                    await _send_json(send, 422, "Idempotency-Key was already used with a different request body")
+                    return
+                metrics.inc("idempotency_replays_total")
+                await send({"type": "http.response.start", "status": stored.status, "headers": stored.headers + [REPLAY_HEADER]})
+                await send({"type": "http.response.body", "body": stored.body})
+                return
+            pending = self.in_flight.get(key)
+            if pending is None:
+                break
+            # A duplicate of an in-flight request: wait for the original, then replay it.
+            # If the original left nothing replayable (5xx, 429, disconnect) the loop runs it here.
+            metrics.inc("idempotency_waits_total")
+            await asyncio.shield(pending)
+
+        self.in_flight[key] = asyncio.get_running_loop().create_future()
+        response_start = None
+        chunks = []
+        size = 0
+        complete = False
+
+        async def capture_send(message):
+            nonlocal response_start, size, complete
+            if message["type"] == "http.response.start":
+                response_start = message
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= self.max_body_bytes:
+                    chunks.append(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, self._replaying(messages, receive), capture_send)
+        finally:
+            # Store even if the client went away mid-send: that is exactly when it retries
+            status = response_start["status"] if response_start else 500
+            if complete and status < 500 and status not in TRANSIENT_STATUSES and size <= self.max_body_bytes:
+                self.responses.set(key, StoredResponse(
+                    fingerprint,
+                    response_start["status"],
+                    list(response_start.get("headers", [])),
+                    b"".join(chunks),
+                ))
+            future = self.in_flight.pop(key)
+            future.set_result(None)
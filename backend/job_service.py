@@ -0,0 +1,264 @@
+"""
+Asynchronous job runner for long-running AI analyses.
+
+A POST submits a job and returns its id immediately; a pool of worker tasks
+runs the analysis and keeps the result in a TTL store where clients poll or
+subscribe for it. Resubmitting the same work returns the existing job instead
+of paying for the analysis again.
+
+Finished results are saved to JOB_STATE_PATH at shutdown and reloaded on
+start, so a client polling across a restart still gets its result. Jobs
+that were still queued or running are saved as failed, to be resubmitted.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ai_scheduler import PRIORITY_BACKGROUND, get_request_context, set_request_context
+from metrics import metrics
+from ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', 4))
+JOB_QUEUE_MAX = int(os.environ.get('AI_JOB_QUEUE_MAX', 1000))
+JOB_TIMEOUT_SECONDS = float(os.environ.get('AI_JOB_TIMEOUT_SECONDS', 300))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get('AI_JOB_RESULT_TTL_SECONDS', 3600))
+JOB_RESULT_MAX_ENTRIES = int(os.environ.get('AI_JOB_RESULT_MAX_ENTRIES', 10000))
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+JOB_STATE_PATH = os.environ.get('AI_JOB_STATE_PATH', str(STATE_DIR / 'ai_jobs.json'))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue cannot take more work"""
+
+
+class Job:
+    def __init__(self, job_id: str, kind: str, payload: Dict[str, Any], owner: str, priority: str):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.owner = owner
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.changed = asyncio.Event()
+
+    def set_status(self, status: str):
+        self.status = status
+        # Wake current subscribers and give later ones a fresh event
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], owner: str) -> "Job":
+        job = cls(data["job_id"], data["kind"], {}, owner, PRIORITY_BACKGROUND)
+        for field in ("status", "result", "error", "created_at", "started_at", "finished_at"):
+            setattr(job, field, data[field])
+        return job
+
+
+class JobManager:
+    """Queue, worker pool and result store for AI analysis jobs"""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_max: int = JOB_QUEUE_MAX,
+        timeout_seconds: float = JOB_TIMEOUT_SECONDS,
+        result_ttl_seconds: float = JOB_RESULT_TTL_SECONDS,
+        result_max_entries: int = JOB_RESULT_MAX_ENTRIES,
+        state_path: str = JOB_STATE_PATH,
+    ):
+        self.workers = workers
+        self.state_path = state_path
+        self.queue_max = queue_max
+        self.timeout_seconds = timeout_seconds
+        self.handlers: Dict[str, JobHandler] = {}
+        # Unfinished jobs are never evicted; finished ones age out of the store
+        self._active: Dict[str, Job] = {}
+        self._finished = TTLStore(max_entries=result_max_entries, ttl_seconds=result_ttl_seconds)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def register_handler(self, kind: str, handler: JobHandler):
+        """Make an analysis available as a job kind"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} AI job workers")
+
+    async def stop(self):
+        """Cancel the worker pool"""
+        tasks, self._tasks = set(self._tasks), []
+        while tasks:
+            # wait_for can swallow a cancel that lands as the job finishes; the worker then takes the next job
+            for task in tasks:
+                task.cancel()
+            _, tasks = await asyncio.wait(tasks, timeout=0.1)
+
+    @staticmethod
+    def job_id_for(owner: str, kind: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> str:
+        """Deterministic id so resubmitting the same work finds the same job"""
+        material = idempotency_key if idempotency_key else json.dumps(payload, sort_keys=True, default=str)
+        digest = hashlib.sha256(f"{owner}\x00{kind}\x00{material}".encode()).hexdigest()
+        return str(uuid.UUID(digest[:32]))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._active.get(job_id) or self._finished.get(job_id)
+
+    async def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        owner: str,
+        idempotency_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> Job:
+        """Queue a job, or return the live job for identical earlier work.
+
+        A caller-chosen `job_id` is always new work and is never matched to earlier jobs.
+        """
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        self.start()
+
+        if job_id is None:
+            job_id = self.job_id_for(owner, kind, payload, idempotency_key)
+            existing = self.get(job_id)
+            if existing is not None and existing.status != JOB_FAILED:
+                metrics.inc("ai_jobs_deduplicated_total", kind=kind)
+                return existing
+
+        priority, _ = get_request_context()
+        job = Job(job_id, kind, payload, owner, priority)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"AI job queue is full ({self.queue_max} jobs)")
+        self._finished.pop(job_id)
+        self._active[job_id] = job
+        metrics.inc("ai_jobs_submitted_total", kind=kind)
+        metrics.set_gauge("ai_jobs_queued", self._queue.qsize())
+        return job
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the job to change state"""
+        if job.status in TERMINAL_STATES:
+            return True
+        try:
+            await asyncio.wait_for(job.changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            metrics.set_gauge("ai_jobs_queued", self._queue.qsize())
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        set_request_context(job.priority or PRIORITY_BACKGROUND, job.owner)
+        job.started_at = time.time()
+        job.set_status(JOB_RUNNING)
+        metrics.observe("ai_job_queue_seconds", job.started_at - job.created_at, kind=job.kind)
+        try:
+            job.result = await asyncio.wait_for(self.handlers[job.kind](job.payload), self.timeout_seconds)
+            status = JOB_SUCCEEDED
+        except asyncio.TimeoutError:
+            job.error = f"Job exceeded {self.timeout_seconds:.0f}s"
+            status = JOB_FAILED
+        except Exception as e:
+            logger.error(f"AI job {job.id} ({job.kind}) failed: {str(e)}")
+            job.error = "Analysis failed"
+            status = JOB_FAILED
+        job.finished_at = time.time()
+        self._active.pop(job.id, None)
+        self._finished.set(job.id, job)
+        job.set_status(status)
+        metrics.inc("ai_jobs_completed_total", kind=job.kind, status=status)
+        metrics.observe("ai_job_run_seconds", job.finished_at - job.started_at, kind=job.kind)
+
+    def save(self):
+        """Write finished results, and unfinished jobs as failed, to `state_path`"""
+        now = time.time()
+        records = [{**job.to_dict(), "owner": job.owner} for _, job in self._finished.items()]
+        for job in self._active.values():
+            records.append({**job.to_dict(), "owner": job.owner, "status": JOB_FAILED,
+                            "error": "Interrupted by a server restart; please resubmit", "finished_at": now})
+        path = Path(self.state_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".tmp")
+        partial.write_text(json.dumps({"saved_at": now, "jobs": records}, default=str))
+        partial.replace(path)
+        logger.info(f"Saved {len(records)} AI jobs")
+
+    def load(self):
+        """Restore results saved by `save`, ageing them by the time since they finished"""
+        path = Path(self.state_path)
+        if not path.exists():
+            return
+        try:
+            records = json.loads(path.read_text())["jobs"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Ignoring unreadable AI job state {path}: {str(e)}")
+            return
+        now = time.time()
+        for record in records:
+            remaining = self._finished.ttl_seconds - (now - (record["finished_at"] or now))
+            if remaining > 0:
+                job = Job.from_dict(record, record["owner"])
+                self._finished.set(job.id, job, remaining)
+        path.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "active": len(self._active),
+            "finished": len(self._finished),
+        }
+
+
+# Global job manager
+job_manager = JobManager()
@@ -0,0 +1,148 @@
+"""
+Graceful shutdown for the Pecunia API.
+
+On shutdown the process first drains: new AI work is refused with 503, /health
+reports "draining" so the load balancer stops routing here, and in-flight AI
+requests and queued jobs get until a deadline to finish. Only then are the job
+workers stopped and registered write-behind stores flushed.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from job_service import job_manager
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', 30))
+# Keep failing health checks at least this long so the load balancer notices
+SHUTDOWN_MIN_DRAIN_SECONDS = float(os.environ.get('SHUTDOWN_MIN_DRAIN_SECONDS', 0))
+DRAIN_POLL_SECONDS = 0.1
+
+STATE_SERVING = "serving"
+STATE_DRAINING = "draining"
+STATE_STOPPED = "stopped"
+
+# Requests that start new AI work and are refused while draining
+DRAINED_PATH_PREFIX = "/api/ai/"
+
+
+class DrainController:
+    """Tracks in-flight AI work and coordinates drain, stop and flush"""
+
+    def __init__(self, drain_seconds: float = SHUTDOWN_DRAIN_SECONDS, min_drain_seconds: float = SHUTDOWN_MIN_DRAIN_SECONDS):
+        self.drain_seconds = drain_seconds
+        self.min_drain_seconds = min_drain_seconds
+        self.state = STATE_SERVING
+        self.in_flight = 0
+        self.drain_started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self._flush_hooks: List[Tuple[str, Callable[[], Any]]] = []
+
+    @property
+    def draining(self) -> bool:
+        return self.state != STATE_SERVING
+
+    def register_flush(self, name: str, hook: Callable[[], Any]):
+        """Run `hook` (sync or async) after draining, before the process exits"""
+        self._flush_hooks.append((name, hook))
+
+    def begin_drain(self):
+        """Stop accepting new AI work; idempotent"""
+        if self.draining:
+            return
+        self.state = STATE_DRAINING
+        self.drain_started_at = time.monotonic()
+        self.deadline = self.drain_started_at + self.drain_seconds
+        logger.info(f"Draining: {self.pending()} pending, deadline in {self.drain_seconds:.0f}s")
+
+    def pending(self) -> Dict[str, int]:
+        jobs = job_manager.stats()
+        return {"in_flight_requests": self.in_flight, "jobs_queued": jobs["queued"], "jobs_active": jobs["active"]}
+
+    def _idle(self) -> bool:
+        pending = self.pending()
+        return not pending["in_flight_requests"] and not pending["jobs_active"]
+
+    async def wait_for_drain(self) -> bool:
+        """Wait until in-flight work finishes or the deadline passes; True if fully drained"""
+        self.begin_drain()
+        while time.monotonic() < self.deadline:
+            elapsed = time.monotonic() - self.drain_started_at
+            if self._idle() and elapsed >= self.min_drain_seconds:
+                return True
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+        logger.warning(f"Drain deadline reached with {self.pending()} still pending")
+        return self._idle()
+
+    async def flush(self):
+        for name, hook in self._flush_hooks:
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+                logger.info(f"Flushed {name}")
+            except Exception as e:
+                logger.error(f"Flushing {name} failed: {str(e)}")
+
+    async def shutdown(self):
+        """Drain, stop job workers and flush state"""
+        drained = await self.wait_for_drain()
+        metrics.inc("shutdown_drains_total", complete=drained)
+        await job_manager.stop()
+        await self.flush()
+        self.state = STATE_STOPPED
+
+    def status(self) -> Dict[str, Any]:
+        """Drain progress for /health"""
+        status = {"state": self.state, **self.pending()}
+        if self.drain_started_at is not None:
+            now = time.monotonic()
+            status["draining_for_seconds"] = round(now - self.drain_started_at, 1)
+            status["deadline_in_seconds"] = round(max(0.0, self.deadline - now), 1)
+        return status
+
+
+class DrainMiddleware:
+    """Counts in-flight AI requests and refuses new ones while draining"""
+
+    def __init__(self, app, controller: Optional[DrainController] = None):
+        self.app = app
+        self.controller = controller or drain_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(DRAINED_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        if self.controller.draining:
+            metrics.inc("shutdown_rejected_requests_total")
+            body = json.dumps({"detail": "Server is shutting down, please retry"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", b"1"),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        self.controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.in_flight -= 1
+
+
+# Global drain controller for this process
+drain_controller = DrainController()
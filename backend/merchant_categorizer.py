@@ -0,0 +1,243 @@
+"""
+Merchant categorization for raw bank transaction descriptions.
+
+A description such as "SQ *BLUE BOTTLE COFFEE #1032 OAKLAND" is first
+normalized into a merchant name: lowercased, card-processor prefixes (SQ *,
+TST*, PAYPAL *) and store numbers removed, punctuation folded to spaces.
+Keywords go through the same normalization, so rules are written the way
+merchants are spelled.
+
+All keyword rules are compiled into one regex shaped as a trie of their
+characters. A name is scanned once, branching on one character at a time,
+however many rules there are. The leftmost keyword in the name wins, and
+the longest one among keywords starting at the same place ("uber eats"
+before "uber"). Keywords match whole words, so "att" does not claim
+"attorney" nor "shell" "shellfish". A keyword written with a trailing "*"
+("mcdonald*") also matches the start of a longer word ("mcdonalds"); the
+rules mark the stems and possessives that need it.
+
+The shared rules are a versioned JSON file mapping categories to keywords.
+Each user can add overrides (keyword -> category), which are checked first.
+They are stored in SQLite and compiled per user on first use. Descriptions
+repeat heavily, so an LRU maps each raw description to its normalized name
+and shared category, and `categorize_many` looks up each distinct
+description in a batch once.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import metrics
+from ttl_store import TTLStore
+
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+MERCHANT_RULES_PATH = os.environ.get(
+    'MERCHANT_RULES_PATH', str(Path(__file__).parent / 'data' / 'merchant_rules_v1.json')
+)
+MERCHANT_OVERRIDES_PATH = os.environ.get('MERCHANT_OVERRIDES_PATH', str(STATE_DIR / 'merchant_overrides.sqlite'))
+# Distinct raw descriptions remembered with their normalized name and category
+MERCHANT_CACHE_SIZE = int(os.environ.get('MERCHANT_CACHE_SIZE', 100000))
+MERCHANT_OVERRIDE_USERS = int(os.environ.get('MERCHANT_OVERRIDE_USERS', 10000))
+# Other workers' override changes are picked up within this long
+MERCHANT_OVERRIDES_TTL_SECONDS = float(os.environ.get('MERCHANT_OVERRIDES_TTL_SECONDS', 60))
+
+# Trailing marker of a keyword that matches as a word prefix
+PREFIX_MARKER = "*"
+MAX_OVERRIDES_PER_USER = 500
+
+# Leading payment-processor tags ("SQ *", "TST* ", "PAYPAL *") and card-purchase boilerplate
+_PROCESSOR_PREFIX = re.compile(
+    r"^(?:(?:sq|tst|sp|pp|paypal|py|dd|in|bt|pmt|ckcd) ?\* ?|(?:pos|dbt|debit|card|checkcard|ckcd|purchase|recurring|visa) +)+"
+)
+# Store and terminal numbers: "#1032", "00012", "f1234"; words with letters and digits otherwise stay
+_STORE_NUMBER = re.compile(r"#\S*|\b(?:[a-z]{1,2})?\d+\b")
+# "&" folds to a space like other punctuation: "H&M" and "AT&T" become the rules' "h m" and "at t"
+_NOT_WORD = re.compile(r"[^a-z0-9]+")
+_APOSTROPHE = re.compile(r"['`’]")
+_WORD_CHAR = "[a-z0-9]"
+
+
+def normalize_merchant(description: str) -> str:
+    """Merchant name from a raw description: "TST* Joe's Pizza #12" -> "joes pizza\""""
+    name = _APOSTROPHE.sub("", description.lower()).strip()
+    name = _PROCESSOR_PREFIX.sub("", name)
+    name = _STORE_NUMBER.sub(" ", name)
+    return " ".join(_NOT_WORD.sub(" ", name).split())
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    """Regex for a character trie; branches are tried before ending, so longer keywords win"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    end = node.get("")
+    if end is None:
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # "" marks the end of a keyword; only keywords marked as prefixes may end inside a word
+    ending = f"(?!{_WORD_CHAR})" if end == "word" else ""
+    if not branches:
+        return ending
+    return "(?:" + "|".join(branches + [ending]) + ")"
+
+
+class MerchantRules:
+    """Keyword -> category rules compiled into a single trie-shaped regex"""
+
+    def __init__(self, rules: Dict[str, str]):
+        self.categories: Dict[str, str] = {}
+        trie: Dict[str, Any] = {}
+        for keyword, category in rules.items():
+            prefix = keyword.rstrip().endswith(PREFIX_MARKER)
+            keyword = normalize_merchant(keyword)
+            if not keyword or keyword in self.categories:
+                continue
+            self.categories[keyword] = category
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = "prefix" if prefix else "word"
+        self.pattern = re.compile(f"(?<!{_WORD_CHAR})" + _trie_pattern(trie)) if trie else None
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def match(self, name: str) -> Optional[str]:
+        """Category of the leftmost (then longest) keyword in a normalized name"""
+        found = self.pattern.search(name) if self.pattern is not None else None
+        return self.categories[found.group()] if found else None
+
+
+def load_rules(path: str = MERCHANT_RULES_PATH) -> Dict[str, str]:
+    """Keyword -> category from a rules file of {"version", "categories": {category: [keywords]}}.
+
+    Keywords keep their PREFIX_MARKER, which MerchantRules reads.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    return {keyword: category for category, keywords in manifest["categories"].items() for keyword in keywords}
+
+
+class MerchantCategorizer:
+    """Shared merchant rules plus per-user overrides, with an LRU in front"""
+
+    def __init__(
+        self,
+        rules_path: str = MERCHANT_RULES_PATH,
+        overrides_path: str = MERCHANT_OVERRIDES_PATH,
+        cache_size: int = MERCHANT_CACHE_SIZE,
+    ):
+        self.rules_path = rules_path
+        self.overrides_path = overrides_path
+        self._rules: Optional[MerchantRules] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._user_rules = TTLStore(max_entries=MERCHANT_OVERRIDE_USERS, ttl_seconds=MERCHANT_OVERRIDES_TTL_SECONDS)
+        self._lookup = lru_cache(maxsize=cache_size)(self._lookup_uncached)
+
+    @property
+    def rules(self) -> MerchantRules:
+        rules = self._rules
+        if rules is None:
+            with self._lock:
+                if self._rules is None:
+                    self._rules = MerchantRules(load_rules(self.rules_path))
+                rules = self._rules
+        return rules
+
+    def use_rules(self, rules: Dict[str, str]):
+        """Replace the shared rules (keyword -> category)"""
+        with self._lock:
+            self._rules = MerchantRules(rules)
+            self._lookup.cache_clear()
+
+    def _lookup_uncached(self, description: str) -> Tuple[str, Optional[str]]:
+        name = normalize_merchant(description)
+        return name, self.rules.match(name)
+
+    def categorize(self, description: Any, user_id: Optional[str] = None) -> Optional[str]:
+        """Category of one description, or None when no rule matches"""
+        return self.categorize_many([description], user_id)[0]
+
+    def categorize_many(self, descriptions: Iterable[Any], user_id: Optional[str] = None) -> np.ndarray:
+        """Category per description (object array, None where no rule matches), one lookup per distinct value"""
+        values = descriptions if isinstance(descriptions, np.ndarray) else np.asarray(list(descriptions), dtype=object)
+        codes, uniques = pd.factorize(values)
+        user_rules = self._overrides_rules(user_id) if user_id else None
+        categories = np.empty(len(uniques) + 1, dtype=object)
+        for i, description in enumerate(uniques):
+            name, category = self._lookup(str(description))
+            if user_rules is not None:
+                category = user_rules.match(name) or category
+            categories[i] = category
+        # Missing descriptions (code -1) read the trailing None
+        result = categories[codes]
+        metrics.inc("merchant_categorizations_total", len(result))
+        return result
+
+    def merchant_names(self, descriptions: Iterable[Any]) -> np.ndarray:
+        """Normalized merchant name per description (object array, None where missing), through the same LRU"""
+        values = descriptions if isinstance(descriptions, np.ndarray) else np.asarray(list(descriptions), dtype=object)
+        codes, uniques = pd.factorize(values)
+        names = np.empty(len(uniques) + 1, dtype=object)
+        for i, description in enumerate(uniques):
+            names[i] = self._lookup(str(description))[0]
+        return names[codes]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.overrides_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.overrides_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS merchant_overrides ("
+                "user_id TEXT NOT NULL, keyword TEXT NOT NULL, category TEXT NOT NULL, "
+                "PRIMARY KEY (user_id, keyword))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def overrides(self, user_id: str) -> Dict[str, str]:
+        rows = self._connect().execute(
+            "SELECT keyword, category FROM merchant_overrides WHERE user_id = ? ORDER BY keyword", (user_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def set_overrides(self, user_id: str, overrides: Dict[str, str]) -> Dict[str, str]:
+        """Add or replace a user's keyword -> category overrides; returns all of them"""
+        rows = [(user_id, keyword.strip(), str(category).strip()) for keyword, category in overrides.items()
+                if normalize_merchant(keyword) and str(category).strip()]
+        conn = self._connect()
+        existing = self.overrides(user_id)
+        if len(set(existing) | {keyword for _, keyword, _ in rows}) > MAX_OVERRIDES_PER_USER:
+            raise ValueError(f"At most {MAX_OVERRIDES_PER_USER} merchant overrides per user")
+        conn.executemany("INSERT OR REPLACE INTO merchant_overrides VALUES (?, ?, ?)", rows)
+        self._user_rules.pop(user_id)
+        return self.overrides(user_id)
+
+    def remove_override(self, user_id: str, keyword: str) -> bool:
+        removed = self._connect().execute(
+            "DELETE FROM merchant_overrides WHERE user_id = ? AND keyword = ?", (user_id, keyword)
+        ).rowcount
+        self._user_rules.pop(user_id)
+        return removed > 0
+
+    def _overrides_rules(self, user_id: str) -> Optional[MerchantRules]:
+        cached = self._user_rules.get(user_id)
+        if cached is None:
+            overrides = self.overrides(user_id)
+            # An empty entry caches "no overrides" too
+            cached = MerchantRules(overrides) if overrides else False
+            self._user_rules.set(user_id, cached)
+        return cached or None
+
+
+# Shared categorizer; rules load on first use
+merchant_categorizer = MerchantCategorizer()
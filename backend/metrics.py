@@ -0,0 +1,134 @@
+"""
+In-process metrics registry for the Pecunia API.
+
+Counters, gauges and windowed histograms keyed by metric name plus labels.
+Exposed as JSON through /api/metrics.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# Number of recent observations each histogram keeps for quantiles
+HISTOGRAM_WINDOW = 2048
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Running totals plus a sliding window of samples for quantiles"""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters, gauges and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to an absolute value"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a histogram observation"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def quantile(self, name: str, q: float, **labels) -> Optional[float]:
+        """Quantile of the recent window of a histogram, None without samples"""
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(key)
+            return histogram.quantile(q) if histogram else None
+
+    def sample_count(self, name: str, **labels) -> int:
+        """Number of samples in the recent window of a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(key)
+            return len(histogram.samples) if histogram else 0
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as JSON-serializable data"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.snapshot()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        """Drop all recorded metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,111 @@
+"""
+Latency-aware model routing for PecuniaAI calls.
+
+Each configured model has a quality rank and a latency prior (time to first
+token plus generation speed). For every call the router takes the models
+good enough for the method, predicts each one's latency for the method's
+expected output length — from the measured p95 once a model has enough
+samples, from the prior until then — and picks the highest-quality model
+that fits the latency budget of the request's priority class. When none
+fits, the fastest eligible model is used.
+
+Models, per-method quality floors and latency budgets are read from
+ai_models.json (or AI_MODEL_CONFIG) and reloaded when the file changes.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from metrics import metrics
+
+AI_MODEL_CONFIG = os.environ.get('AI_MODEL_CONFIG', str(Path(__file__).parent / 'ai_models.json'))
+AI_ROUTER_MIN_SAMPLES = int(os.environ.get('AI_ROUTER_MIN_SAMPLES', 20))
+AI_ROUTER_LATENCY_QUANTILE = float(os.environ.get('AI_ROUTER_LATENCY_QUANTILE', 0.95))
+
+# Seconds between checks of the config file for changes
+CONFIG_CHECK_INTERVAL = 5.0
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "models": [{"name": "gpt-4", "quality": 3, "ttft_seconds": 1.2, "tokens_per_second": 25}],
+    "methods": {"default": {"min_quality": 0}},
+    "latency_budgets": {},
+}
+
+
+class ModelRouter:
+    """Chooses the model for each call from quality floors and latency predictions"""
+
+    def __init__(self, config_path: Optional[str] = AI_MODEL_CONFIG):
+        self.config_path = config_path
+        self._lock = threading.Lock()
+        self._config = DEFAULT_CONFIG
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._reload()
+
+    def _reload(self):
+        """Re-read the config file if it changed; keep the last good config on errors"""
+        self._checked_at = time.monotonic()
+        if not self.config_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self._mtime:
+                return
+            with open(self.config_path) as f:
+                config = json.load(f)
+            if not config.get("models"):
+                raise ValueError("no models configured")
+        except (OSError, ValueError) as e:
+            print(f"Model config error ({self.config_path}): {str(e)}")
+            return
+        self._config = {**DEFAULT_CONFIG, **config}
+        self._mtime = mtime
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        with self._lock:
+            if time.monotonic() - self._checked_at >= CONFIG_CHECK_INTERVAL:
+                self._reload()
+            return self._config
+
+    @property
+    def default_model(self) -> str:
+        """Highest-quality configured model"""
+        return max(self.config["models"], key=lambda m: m.get("quality", 0))["name"]
+
+    def predicted_latency(self, model: Dict[str, Any], method: str, output_tokens: int) -> float:
+        """Seconds a call to `model` is expected to take at the routing quantile"""
+        name = model["name"]
+        if metrics.sample_count("ai_model_call_seconds", model=name, method=method) >= AI_ROUTER_MIN_SAMPLES:
+            return metrics.quantile("ai_model_call_seconds", AI_ROUTER_LATENCY_QUANTILE, model=name, method=method)
+        return model.get("ttft_seconds", 1.0) + output_tokens / max(1.0, model.get("tokens_per_second", 25))
+
+    def choose(self, method: str, priority: str, output_tokens: int) -> str:
+        """Model for one call of `method` in priority class `priority`"""
+        config = self.config
+        policy = config["methods"].get(method, config["methods"].get("default", {}))
+        floor = policy.get("min_quality", 0)
+        eligible: List[Dict[str, Any]] = [m for m in config["models"] if m.get("quality", 0) >= floor]
+        if not eligible:
+            eligible = config["models"]
+        budget = policy.get("latency_budget", config["latency_budgets"].get(priority))
+
+        predictions = [(self.predicted_latency(m, method, output_tokens), m) for m in eligible]
+        fitting = [(latency, m) for latency, m in predictions if budget is None or latency <= budget]
+        if fitting:
+            model = max(fitting, key=lambda pair: pair[1].get("quality", 0))[1]
+            reason = "fits_budget"
+        else:
+            model = min(predictions, key=lambda pair: pair[0])[1]
+            reason = "fastest_available"
+        metrics.inc("ai_model_routing_total", method=method, model=model["name"], reason=reason)
+        return model["name"]
+
+    def record(self, model: str, method: str, seconds: float):
+        """Feed an observed call duration into the model's latency estimate"""
+        metrics.observe("ai_model_call_seconds", seconds, model=model, method=method)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub for load and fault testing.
+
+Speaks the chat-completions protocol, streaming included, so the whole
+PecuniaAI pipeline can be benchmarked offline without paying for tokens.
+Latency, generation speed and failures are configurable:
+
+    python openai_stub.py --port 8900 --latency lognormal:0.4:0.5 \\
+        --tokens-per-second 40 --error-rate 0.02 --rate-limit-rate 0.05
+    PECUNIA_AI_BASE_URL=http://127.0.0.1:8900/v1 PECUNIA_AI_MODE=live ...
+
+Latency specs: `fixed:S`, `uniform:LOW:HIGH`, `normal:MEAN:STDDEV`,
+`lognormal:MEDIAN:SIGMA` and `exponential:MEAN` (seconds). The same settings
+can be changed at runtime with POST /stub/config; GET /stub/stats returns
+outcome counts.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Words the stub "generates", roughly one token each
+VOCABULARY = (
+    "save invest budget emergency fund index portfolio allocate monthly percent "
+    "rebalance diversify expenses income goal automate review interest debt "
+    "retirement account savings rate market bonds stocks ETF timeline target"
+).split()
+
+
+class StubConfig:
+    """Runtime-adjustable behaviour of the stub"""
+
+    def __init__(self, **settings):
+        self.latency = "fixed:0.05"
+        self.tokens_per_second = 0.0  # 0 = completion appears instantly
+        self.completion_tokens = 120
+        self.error_rate = 0.0
+        self.rate_limit_rate = 0.0
+        self.timeout_rate = 0.0
+        self.timeout_seconds = 600.0
+        self.rpm_limit = 0  # 0 = unlimited
+        self.tpm_limit = 0
+        self.seed: Optional[int] = None
+        self.update(settings)
+
+    def update(self, settings: Dict[str, Any]):
+        """Apply settings all together, or raise ValueError and leave the config unchanged"""
+        candidate = copy.copy(self)
+        for key, value in settings.items():
+            if value is None:
+                continue
+            if not hasattr(candidate, key):
+                raise ValueError(f"Unknown stub setting: {key}")
+            setattr(candidate, key, value)
+        try:
+            candidate.sample_latency()  # validate the spec
+        except (AttributeError, IndexError, ValueError) as e:
+            raise ValueError(f"Invalid latency spec {candidate.latency!r}: expected e.g. fixed:0.05") from e
+        self.__dict__.update(candidate.__dict__)
+        if self.seed is not None:
+            random.seed(self.seed)
+
+    def sample_latency(self) -> float:
+        """Draw a time-to-first-token from the configured distribution"""
+        kind, *params = self.latency.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed":
+            delay = values[0]
+        elif kind == "uniform":
+            delay = random.uniform(values[0], values[1])
+        elif kind == "normal":
+            delay = random.gauss(values[0], values[1])
+        elif kind == "lognormal":
+            delay = random.lognormvariate(math.log(values[0]), values[1])
+        elif kind == "exponential":
+            delay = random.expovariate(1 / values[0])
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.latency}")
+        return max(0.0, delay)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class WindowLimiter:
+    """Sliding one-minute window counting requests or tokens"""
+
+    def __init__(self):
+        self.events = deque()
+        self.total = 0
+
+    def _expire(self, now: float):
+        while self.events and self.events[0][0] <= now - 60:
+            self.total -= self.events.popleft()[1]
+
+    def remaining(self, limit: int, now: float) -> int:
+        self._expire(now)
+        return max(0, limit - self.total)
+
+    def reset_seconds(self, now: float) -> float:
+        self._expire(now)
+        return max(0.0, self.events[0][0] + 60 - now) if self.events else 0.0
+
+    def add(self, amount: int, now: float):
+        self.events.append((now, amount))
+        self.total += amount
+
+
+config = StubConfig(latency=os.environ.get('STUB_LATENCY', 'fixed:0.05'))
+request_window = WindowLimiter()
+token_window = WindowLimiter()
+stats: Dict[str, int] = {"requests": 0, "ok": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "timeouts": 0}
+
+app = FastAPI(title="OpenAI stub")
+
+
+def _estimate_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+
+
+def _completion_text(tokens: int) -> List[str]:
+    words = [random.choice(VOCABULARY) for _ in range(tokens)]
+    words[0] = "Stub"
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+
+def _rate_limit_headers(now: float) -> Dict[str, str]:
+    headers = {}
+    if config.rpm_limit:
+        headers["x-ratelimit-limit-requests"] = str(config.rpm_limit)
+        headers["x-ratelimit-remaining-requests"] = str(request_window.remaining(config.rpm_limit, now))
+        headers["x-ratelimit-reset-requests"] = f"{request_window.reset_seconds(now):.3f}s"
+    if config.tpm_limit:
+        headers["x-ratelimit-limit-tokens"] = str(config.tpm_limit)
+        headers["x-ratelimit-remaining-tokens"] = str(token_window.remaining(config.tpm_limit, now))
+        headers["x-ratelimit-reset-tokens"] = f"{token_window.reset_seconds(now):.3f}s"
+    return headers
+
+
+def _error(status_code: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        headers=headers,
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    now = time.monotonic()
+    messages = body.get("messages", [])
+    prompt_tokens = _estimate_prompt_tokens(messages)
+    completion_tokens = max(1, min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens))
+
+    # Provider-style rate limits, then injected faults
+    over_rpm = config.rpm_limit and request_window.remaining(config.rpm_limit, now) < 1
+    over_tpm = config.tpm_limit and token_window.remaining(config.tpm_limit, now) < prompt_tokens + completion_tokens
+    if over_rpm or over_tpm or random.random() < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        reset = max(request_window.reset_seconds(now), token_window.reset_seconds(now), 1.0)
+        headers = {**_rate_limit_headers(now), "retry-after": f"{reset:.0f}"}
+        return _error(429, "Rate limit reached (stub)", "rate_limit_error", headers)
+    request_window.add(1, now)
+    token_window.add(prompt_tokens + completion_tokens, now)
+
+    if random.random() < config.timeout_rate:
+        stats["timeouts"] += 1
+        await asyncio.sleep(config.timeout_seconds)
+    if random.random() < config.error_rate:
+        stats["errors"] += 1
+        return _error(500, "The server had an error while processing your request (stub)", "server_error")
+
+    await asyncio.sleep(config.sample_latency())
+    pieces = _completion_text(completion_tokens)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "stub")
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    headers = _rate_limit_headers(time.monotonic())
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            # Pace output at tokens_per_second, batching tokens into ~20ms chunks
+            per_chunk = max(1, int(config.tokens_per_second * 0.02)) if config.tokens_per_second else len(pieces)
+            for start in range(0, len(pieces), per_chunk):
+                batch = pieces[start:start + per_chunk]
+                if config.tokens_per_second:
+                    await asyncio.sleep(len(batch) / config.tokens_per_second)
+                yield chunk({"content": "".join(batch)})
+            yield chunk({}, "stop")
+            if include_usage:
+                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+            stats["ok"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    if config.tokens_per_second:
+        await asyncio.sleep(completion_tokens / config.tokens_per_second)
+    stats["ok"] += 1
+    return JSONResponse(
+        content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(pieces)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        },
+        headers=headers,
+    )
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": m, "object": "model", "owned_by": "stub"} for m in ("gpt-4", "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo")]}
+
+
+@app.get("/stub/config")
+async def get_config():
+    return config.to_dict()
+
+
+@app.post("/stub/config")
+async def update_config(settings: Dict[str, Any]):
+    try:
+        config.update(settings)
+    except ValueError as e:
+        return _error(400, str(e), "invalid_request_error")
+    return config.to_dict()
+
+
+@app.get("/stub/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stub/stats/reset")
+async def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    return stats
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default=os.environ.get('STUB_LATENCY', 'fixed:0.05'),
+                        help="time-to-first-token distribution, or plain seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction that hang for --timeout-seconds")
+    parser.add_argument("--timeout-seconds", type=float, default=600.0)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="requests per minute before 429s")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="tokens per minute before 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    latency = args.latency if ":" in args.latency else f"fixed:{args.latency}"
+    config.update({
+        "latency": latency,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "timeout_rate": args.timeout_rate,
+        "timeout_seconds": args.timeout_seconds,
+        "rpm_limit": args.rpm_limit,
+        "tpm_limit": args.tpm_limit,
+        "seed": args.seed,
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Peer benchmarks: where a user stands against people of the same age and country.
+
+Each (metric, country, age band) cell holds the metric's value at every
+percentile 0..100, i.e. an inverted cumulative distribution. A percentile
+lookup is a binary search in the cell's 101 values plus linear
+interpolation, and `percentiles` ranks whole arrays of users at once, one
+vectorized pass per cell present in the batch.
+
+The tables are a versioned pair of files: a JSON manifest (version, metrics,
+countries and their aliases, age bands, percentile levels) and a .npy array
+of shape (metrics, countries, age bands, levels) that is memory-mapped, so
+every worker on the host shares one copy through the page cache.
+Running this module regenerates the bundled tables.
+"""
+
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+PEER_BENCHMARKS_PATH = os.environ.get(
+    'PEER_BENCHMARKS_PATH', str(Path(__file__).parent / 'data' / 'peer_benchmarks_v1.json')
+)
+
+METRICS = ("net_worth", "income", "savings_rate")
+DEFAULT_COUNTRY = "US"
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+class PeerBenchmarks:
+    """Memory-mapped percentile tables by metric, country and age band"""
+
+    def __init__(self, manifest_path: str = PEER_BENCHMARKS_PATH):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._tables: Optional[np.ndarray] = None
+        self.manifest: Dict[str, Any] = {}
+
+    def _load(self) -> np.ndarray:
+        tables = self._tables
+        if tables is not None:
+            return tables
+        with self._lock:
+            if self._tables is None:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                tables = np.load(Path(self.manifest_path).parent / manifest["tables"], mmap_mode="r")
+                expected = (len(manifest["metrics"]), len(manifest["countries"]),
+                            len(manifest["age_bands"]), len(manifest["levels"]))
+                if tables.shape != expected:
+                    raise ValueError(f"peer benchmark tables have shape {tables.shape}, manifest expects {expected}")
+                self.manifest = manifest
+                self._levels = np.asarray(manifest["levels"], dtype=np.float64)
+                self._band_starts = np.asarray(manifest["age_bands"], dtype=np.float64)
+                self._metric_index = {name: i for i, name in enumerate(manifest["metrics"])}
+                self._country_index = {code: i for i, code in enumerate(manifest["countries"])}
+                for alias, code in manifest.get("aliases", {}).items():
+                    self._country_index[alias.lower()] = self._country_index[code]
+                self._tables = tables
+            return self._tables
+
+    @property
+    def version(self) -> int:
+        self._load()
+        return self.manifest["version"]
+
+    def country_index(self, location: Optional[str]) -> int:
+        """Table index for a country code or name; unknown places use DEFAULT_COUNTRY"""
+        self._load()
+        key = (location or "").strip()
+        index = self._country_index.get(key.upper(), self._country_index.get(key.lower()))
+        return self._country_index[DEFAULT_COUNTRY] if index is None else index
+
+    def _cells(self, ages: ArrayLike, countries: Union[str, Iterable[str], None]) -> np.ndarray:
+        """Flat (country, age band) cell index per user"""
+        ages = np.atleast_1d(np.asarray(ages, dtype=np.float64))
+        bands = np.clip(np.searchsorted(self._band_starts, ages, side="right") - 1, 0, len(self._band_starts) - 1)
+        if countries is None or isinstance(countries, str):
+            country = np.full(ages.shape, self.country_index(countries))
+        else:
+            # Resolve each distinct location once
+            names, inverse = np.unique(np.asarray(list(countries), dtype=object).astype(str), return_inverse=True)
+            country = np.array([self.country_index(name) for name in names])[inverse]
+        return country * len(self._band_starts) + bands
+
+    def percentiles(
+        self,
+        metric: str,
+        values: ArrayLike,
+        ages: ArrayLike,
+        countries: Union[str, Iterable[str], None] = None,
+    ) -> np.ndarray:
+        """Percentile (0-100) of each value among peers of the same age band and country"""
+        self._load()
+        return self._percentiles(metric, values, self._cells(ages, countries))
+
+    def _percentiles(self, metric: str, values: ArrayLike, cells: np.ndarray) -> np.ndarray:
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        cells = np.broadcast_to(cells, values.shape)
+        rows = self._tables[self._metric_index[metric]].reshape(-1, len(self._levels))
+        result = np.empty(values.shape)
+        # Sort users by cell once, then interpolate each cell's contiguous run
+        order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+        present, starts = np.unique(sorted_cells, return_index=True)
+        for cell, start, end in zip(present, starts, np.append(starts[1:], len(order))):
+            users = order[start:end]
+            result[users] = np.interp(values[users], rows[cell], self._levels)
+        result[np.isnan(values)] = np.nan
+        return result
+
+    def _row(self, metric: str, age: float, country: Optional[str]) -> np.ndarray:
+        tables = self._load()
+        band = min(max(bisect.bisect_right(self.manifest["age_bands"], age) - 1, 0), len(self._band_starts) - 1)
+        return tables[self._metric_index[metric], self.country_index(country), band]
+
+    def percentile(self, metric: str, value: float, age: float, country: Optional[str] = None) -> float:
+        """Percentile of one value among the user's peers"""
+        row = self._row(metric, age, country)
+        return float(np.interp(value, row, self._levels))
+
+    def quantile(self, metric: str, level: float, age: float, country: Optional[str] = None) -> float:
+        """Metric value at percentile `level` for the user's peer group"""
+        row = self._row(metric, age, country)
+        return float(np.interp(level, self._levels, row))
+
+    def rank(
+        self,
+        metric_values: Dict[str, ArrayLike],
+        ages: ArrayLike,
+        countries: Union[str, Iterable[str], None] = None,
+    ) -> np.ndarray:
+        """Mean percentile across the given metrics per user; missing values (NaN) are skipped"""
+        self._load()
+        cells = self._cells(ages, countries)
+        stacked = np.vstack([self._percentiles(metric, values, cells)
+                             for metric, values in metric_values.items()])
+        counts = np.sum(~np.isnan(stacked), axis=0)
+        totals = np.nansum(stacked, axis=0)
+        return np.divide(totals, counts, out=np.full(totals.shape, np.nan), where=counts > 0)
+
+
+# Process-wide tables; loaded on first lookup
+peer_benchmarks = PeerBenchmarks()
+
+
+# Bundled tables. Medians by age band follow the survey figures the service
+# used before (net worth 10k at 25 to 250k at 50, income 45k to 85k); spread
+# and country scaling are approximations until survey microdata is loaded
+# through the same file format.
+AGE_BANDS = (18, 25, 30, 35, 40, 45, 50, 55, 65)
+MEDIAN_NET_WORTH = (5000, 10000, 30000, 65000, 120000, 185000, 250000, 300000, 280000)
+MEDIAN_INCOME = (32000, 45000, 55000, 65000, 75000, 80000, 85000, 80000, 50000)
+MEDIAN_SAVINGS_RATE = (8, 12, 14, 15, 15, 16, 17, 18, 12)
+# (net worth, income) relative to the US
+COUNTRY_SCALES = {
+    "US": (1.0, 1.0), "CA": (0.95, 0.85), "GB": (0.85, 0.8), "AU": (1.1, 0.9), "DE": (0.7, 0.8),
+}
+COUNTRY_ALIASES = {
+    "United States": "US", "USA": "US", "Canada": "CA", "United Kingdom": "GB", "UK": "GB",
+    "Australia": "AU", "Germany": "DE",
+}
+
+
+def _build_tables(levels: np.ndarray) -> np.ndarray:
+    # Percentiles 0 and 100 are taken at 0.5 and 99.5 to keep the tails finite
+    z = np.array([NormalDist().inv_cdf(p) for p in np.clip(levels, 0.5, 99.5) / 100])
+    tables = np.empty((len(METRICS), len(COUNTRY_SCALES), len(AGE_BANDS), len(levels)))
+    for c, (net_worth_scale, income_scale) in enumerate(COUNTRY_SCALES.values()):
+        for b in range(len(AGE_BANDS)):
+            median = MEDIAN_NET_WORTH[b] * net_worth_scale
+            # Shifted log-normal: a tenth of people have negative net worth, top 10% hold ~5x the median
+            tables[0, c, b] = 1.35 * median * np.exp(1.1 * z) - 0.35 * median
+            tables[1, c, b] = MEDIAN_INCOME[b] * income_scale * np.exp(0.6 * z)
+            tables[2, c, b] = np.clip(MEDIAN_SAVINGS_RATE[b] + 12 * z, -40, 70)
+    # Interpolation needs strictly increasing values
+    tables += np.arange(len(levels)) * 1e-6
+    return np.maximum.accumulate(tables, axis=-1)
+
+
+def write_tables(manifest_path: str = PEER_BENCHMARKS_PATH, version: int = 1):
+    """Regenerate the bundled manifest and tables"""
+    levels = np.arange(101, dtype=np.float64)
+    path = Path(manifest_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tables_file = f"{path.stem}.npy"
+    np.save(path.parent / tables_file, _build_tables(levels))
+    manifest = {
+        "version": version,
+        "tables": tables_file,
+        "metrics": list(METRICS),
+        "countries": list(COUNTRY_SCALES),
+        "aliases": COUNTRY_ALIASES,
+        "age_bands": list(AGE_BANDS),
+        "levels": levels.tolist(),
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    write_tables()
+    print(f"Wrote {PEER_BENCHMARKS_PATH}")
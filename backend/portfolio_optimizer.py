@@ -0,0 +1,333 @@
+"""
+Mean-variance portfolio optimization over Pecunia's fund universe.
+
+The universe (expected returns, volatilities and correlations of the funds
+Pecunia recommends) is read from a versioned dataset once per process. The
+covariance matrix, the efficient frontier and the risk-parity portfolio are
+derived from it once and shared by every request, since none of them depends
+on the user. Optimizing one portfolio is then a search along the frontier:
+individual stocks the user holds are kept, and the rest of the portfolio is
+placed between the two frontier points at which the whole portfolio brackets
+the target volatility, where its variance is a quadratic to solve. The
+trades are the difference from current holdings. The same search runs over
+a matrix of holdings to rebalance thousands of portfolios in one call.
+
+Frontier points are long-only with a per-fund cap, solved together as one
+batch by accelerated projected gradient ascent on mu'w - gamma/2 w'Sigma w.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+PORTFOLIO_UNIVERSE_PATH = os.environ.get(
+    'PORTFOLIO_UNIVERSE_PATH', str(Path(__file__).parent / 'data' / 'fund_universe_v1.json')
+)
+# Largest share of a portfolio any one fund may hold
+PORTFOLIO_MAX_FUND_WEIGHT = float(os.environ.get('PORTFOLIO_MAX_FUND_WEIGHT', 0.6))
+# Trades smaller than this share of the portfolio are not worth making
+PORTFOLIO_REBALANCE_BAND = float(os.environ.get('PORTFOLIO_REBALANCE_BAND', 0.01))
+
+TARGET_VOLATILITY = {"low": 0.07, "medium": 0.11, "high": 0.16}
+FRONTIER_POINTS = 64
+SOLVER_ITERATIONS = 1000
+SOLVER_TOLERANCE = 1e-8
+
+
+def _project_capped_simplex(v: np.ndarray, cap: float, allowed: np.ndarray) -> np.ndarray:
+    """Row-wise Euclidean projection onto {w : sum(w) = 1, 0 <= w <= cap, w = 0 outside `allowed`}.
+
+    w = clip(v - tau, 0, cap) for the tau where the weights sum to one. The
+    sum is piecewise linear in tau with breakpoints at v and v - cap, so tau
+    is found exactly by evaluating the sum at the sorted breakpoints and
+    interpolating within the bracketing segment.
+    """
+    breakpoints = np.sort(np.concatenate((v - cap, v), axis=1), axis=1)
+    sums = (np.clip(v[:, None, :] - breakpoints[:, :, None], 0, cap) * allowed).sum(axis=2)
+    rows = np.arange(len(v))
+    k = np.minimum((sums >= 1).sum(axis=1) - 1, breakpoints.shape[1] - 2)
+    left, right = breakpoints[rows, k], breakpoints[rows, k + 1]
+    drop = sums[rows, k] - sums[rows, k + 1]
+    tau = left + np.divide((sums[rows, k] - 1) * (right - left), drop, out=np.zeros_like(left), where=drop > 0)
+    return np.clip(v - tau[:, None], 0, cap) * allowed
+
+
+def solve_mean_variance(
+    mu: np.ndarray,
+    cov: np.ndarray,
+    gammas: np.ndarray,
+    cap: float,
+    allowed: np.ndarray,
+) -> np.ndarray:
+    """Long-only capped portfolios maximizing mu'w - gamma/2 w'Sigma w, one row per gamma"""
+    lipschitz = gammas * np.linalg.eigvalsh(cov)[-1]
+    step = (1 / lipschitz)[:, None]
+    w = _project_capped_simplex(np.tile(allowed / allowed.sum(), (len(gammas), 1)), cap, allowed)
+    y, t = w, 1.0
+    for _ in range(SOLVER_ITERATIONS):
+        gradient = mu - gammas[:, None] * (y @ cov)
+        w_next = _project_capped_simplex(y + step * gradient, cap, allowed)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + ((t - 1) / t_next) * (w_next - w)
+        converged = np.max(np.abs(w_next - w)) < SOLVER_TOLERANCE
+        w, t = w_next, t_next
+        if converged:
+            break
+    return w
+
+
+def risk_parity(cov: np.ndarray, allowed: np.ndarray, tolerance: float = 1e-10) -> np.ndarray:
+    """Weights at which every allowed fund contributes the same share of portfolio variance"""
+    sub = cov[np.ix_(allowed, allowed)]
+    x = 1 / np.sqrt(np.diag(sub))
+    for _ in range(10000):
+        contributions = x * (sub @ x)
+        if np.max(np.abs(contributions / contributions.sum() - 1 / len(x))) < tolerance:
+            break
+        x *= np.sqrt(contributions.mean() / contributions)
+    weights = np.zeros(len(cov))
+    weights[allowed] = x / x.sum()
+    return weights
+
+
+class PortfolioOptimizer:
+    """Shared covariance, frontier and risk-parity solutions for the fund universe"""
+
+    def __init__(self, universe_path: str = PORTFOLIO_UNIVERSE_PATH, max_fund_weight: float = PORTFOLIO_MAX_FUND_WEIGHT):
+        self.universe_path = universe_path
+        self.max_fund_weight = max_fund_weight
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _load(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            with open(self.universe_path) as f:
+                universe = json.load(f)
+            funds = universe["funds"]
+            self.version = universe["version"]
+            self.tickers = [fund["ticker"] for fund in funds]
+            self.names = {fund["ticker"]: fund["name"] for fund in funds}
+            self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+            self.aliases = {alias.upper(): ticker for alias, ticker in universe.get("aliases", {}).items()}
+            self.unknown_index = self.index[universe["unknown_ticker"]]
+            classes: Dict[str, List[int]] = {}
+            for i, fund in enumerate(funds):
+                classes.setdefault(fund["asset_class"], []).append(i)
+            self.class_members = [members for members in classes.values() if len(members) > 1]
+            self.mu = np.array([fund["expected_return"] - fund.get("expense_ratio", 0) for fund in funds])
+            volatility = np.array([fund["volatility"] for fund in funds])
+            self.cov = self._nearest_psd(np.array(universe["correlations"]) * np.outer(volatility, volatility))
+            self.volatility = np.sqrt(np.diag(self.cov))
+
+            self.recommendable = np.array([t not in universe.get("non_recommendable", []) for t in self.tickers])
+            gammas = np.geomspace(0.5, 500, FRONTIER_POINTS)
+            frontier = solve_mean_variance(self.mu, self.cov, gammas, self.max_fund_weight, self.recommendable)
+            self._set_frontier(frontier)
+            parity_allowed = np.array([t not in universe.get("risk_parity_excluded", []) for t in self.tickers])
+            self.risk_parity_weights = risk_parity(self.cov, parity_allowed)
+            self._ready = True
+
+    @staticmethod
+    def _nearest_psd(cov: np.ndarray) -> np.ndarray:
+        """Clip negative eigenvalues left by hand-entered correlations"""
+        values, vectors = np.linalg.eigh((cov + cov.T) / 2)
+        return (vectors * np.clip(values, 1e-10, None)) @ vectors.T
+
+    def _set_frontier(self, weights: np.ndarray):
+        returns = weights @ self.mu
+        vols = np.sqrt(np.einsum("pi,ij,pj->p", weights, self.cov, weights))
+        order = np.argsort(vols)
+        weights, returns, vols = weights[order], returns[order], vols[order]
+        # Keep only efficient points: return must rise with volatility
+        keep = np.concatenate(([True], np.diff(vols) > 5e-4)) & (returns >= np.maximum.accumulate(returns) - 1e-9)
+        self.frontier_weights, self.frontier_returns, self.frontier_vols = weights[keep], returns[keep], vols[keep]
+        cash_return = self.mu[self.index["CASH"]] if "CASH" in self.index else 0.0
+        self.max_sharpe_index = int(np.argmax((self.frontier_returns - cash_return) / self.frontier_vols))
+
+    def holdings_vector(self, holdings: Dict[str, Any]) -> Tuple[np.ndarray, List[str]]:
+        """Dollar value per universe fund; unknown tickers count as individual stocks"""
+        self._load()
+        values = np.zeros(len(self.tickers))
+        unmapped = []
+        for ticker, value in holdings.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            key = str(ticker).upper()
+            key = self.aliases.get(key, key)
+            if key not in self.index:
+                unmapped.append(str(ticker))
+            values[self.index.get(key, self.unknown_index)] += value
+        return values, unmapped
+
+    def target_weights(self, target_vols: np.ndarray) -> np.ndarray:
+        """Frontier portfolios at each target volatility, interpolated between bracketing points"""
+        self._load()
+        target_vols = np.atleast_1d(np.asarray(target_vols, dtype=np.float64))
+        return np.column_stack([
+            np.interp(target_vols, self.frontier_vols, self.frontier_weights[:, i]) for i in range(len(self.tickers))
+        ])
+
+    def _held_classes(self, weights: np.ndarray, holdings: np.ndarray) -> np.ndarray:
+        """Weights with each asset class's total split across the funds already held in it, where any are.
+
+        `holdings` broadcasts against `weights` along the leading axes; the split is linear in the weights.
+        """
+        weights = np.broadcast_to(weights, np.broadcast_shapes(weights.shape, holdings.shape)).copy()
+        for members in self.class_members:
+            held = holdings[..., members]
+            held_total = held.sum(axis=-1, keepdims=True)
+            class_weight = weights[..., members].sum(axis=-1, keepdims=True)
+            split = np.divide(held, held_total, out=np.zeros_like(held), where=held_total > 0)
+            weights[..., members] = np.where(held_total > 0, class_weight * split, weights[..., members])
+        return weights
+
+    def sleeve_weights(self, holdings: np.ndarray, fixed: np.ndarray,
+                       target_vols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Weights for the rest of each portfolio, given its `fixed` individual-stock share, at which the
+        whole portfolio has its target volatility; and whether that target is reachable.
+
+        Candidates are frontier portfolios split within asset classes as the user holds them. The whole
+        portfolio's volatility is evaluated at every frontier point, and the target is solved for
+        exactly on the first segment between adjacent points that brackets it. Targets no point
+        reaches get the point that comes closest.
+        """
+        stock = self.unknown_index
+        rows = np.arange(len(target_vols))
+        points = self._held_classes(self.frontier_weights[None, :, :], holdings[:, None, :])
+        # Variance of share * stock + (1 - share) * sleeve, from the sleeve's covariance with the stock
+        # and its own variance
+        share, rest = fixed[:, None], 1 - fixed[:, None]
+        cross, own = points @ self.cov[:, stock], ((points @ self.cov) * points).sum(axis=2)
+        variance = share ** 2 * self.cov[stock, stock] + 2 * share * rest * cross + rest ** 2 * own
+        gap = np.sqrt(variance) - target_vols[:, None]
+        crossing = gap[:, :-1] * gap[:, 1:] <= 0
+        reachable = crossing.any(axis=1)
+        k = np.argmax(crossing, axis=1)
+
+        # Along the segment low + t * (high - low) the variance is quadratic in t; the target is its root in [0, 1]
+        low, step = points[rows, k], points[rows, k + 1] - points[rows, k]
+        share, rest = fixed, 1 - fixed
+        quadratic = rest ** 2 * np.einsum("bi,ij,bj->b", step, self.cov, step)
+        linear = 2 * share * rest * (step @ self.cov[:, stock]) + 2 * rest ** 2 * np.einsum("bi,ij,bj->b", low, self.cov, step)
+        constant = variance[rows, k] - target_vols ** 2
+        root = np.sqrt(np.maximum(linear ** 2 - 4 * quadratic * constant, 0))
+        # The variance is convex along the segment: rising through the target takes the larger root
+        sign = np.where(gap[rows, k + 1] >= gap[rows, k], 1.0, -1.0)
+        t = np.divide(-linear + sign * root, 2 * quadratic, out=np.zeros(len(rows)), where=quadratic > 1e-15)
+        t = np.where(quadratic > 1e-15, t, np.divide(-constant, linear, out=np.zeros(len(rows)), where=linear != 0))
+        solved = low + np.clip(t, 0, 1)[:, None] * step
+        closest = points[rows, np.argmin(np.abs(gap), axis=1)]
+        return np.where(reachable[:, None], solved, closest), reachable
+
+    def stats(self, weights: np.ndarray) -> Dict[str, np.ndarray]:
+        """Expected return, volatility and diversification ratio per row of weights"""
+        self._load()
+        weights = np.atleast_2d(weights)
+        variance = np.einsum("bi,ij,bj->b", weights, self.cov, weights)
+        volatility = np.sqrt(variance)
+        return {
+            "expected_return": weights @ self.mu,
+            "volatility": volatility,
+            "diversification_ratio": np.divide(weights @ self.volatility, volatility,
+                                               out=np.ones_like(volatility), where=volatility > 0),
+        }
+
+    def rebalance_many(self, holdings: np.ndarray, target_vols: np.ndarray) -> Dict[str, np.ndarray]:
+        """Target weights and dollar trades for a (portfolios, funds) matrix of holdings.
+
+        Individual-stock positions are left as they are; the rest of each
+        portfolio moves to the frontier portfolio at which the whole
+        portfolio, stocks included, has its target volatility, or comes
+        closest where no frontier portfolio reaches it ("reachable" is
+        False). Within an asset class the target is split across the funds
+        the user already holds there, so near-identical funds are not
+        swapped for a few basis points. Trades inside the rebalance band
+        are dropped.
+        """
+        self._load()
+        holdings = np.atleast_2d(np.asarray(holdings, dtype=np.float64))
+        totals = holdings.sum(axis=1)
+        fixed = holdings[:, self.unknown_index] / np.where(totals > 0, totals, 1)
+        target_vols = np.broadcast_to(np.asarray(target_vols, dtype=np.float64), totals.shape)
+        sleeve, reachable = self.sleeve_weights(holdings, fixed, target_vols)
+        weights = sleeve * (1 - fixed)[:, None]
+        weights[:, self.unknown_index] = fixed
+        trades = weights * totals[:, None] - holdings
+        trades[np.abs(trades) < PORTFOLIO_REBALANCE_BAND * totals[:, None]] = 0
+        return {"weights": weights, "trades": trades, "reachable": reachable}
+
+    def rebalance_portfolios(self, portfolios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """rebalance_many for request-shaped portfolios ({"holdings", "risk_tolerance" or "target_volatility"})"""
+        self._load()
+        if not portfolios:
+            return []
+        holdings = np.array([self.holdings_vector(p.get("holdings", {}))[0] for p in portfolios])
+        target_vols = np.array([
+            p.get("target_volatility") or TARGET_VOLATILITY.get(p.get("risk_tolerance"), TARGET_VOLATILITY["medium"])
+            for p in portfolios
+        ])
+        plan = self.rebalance_many(holdings, target_vols)
+        return [
+            {
+                "target_weights": {t: round(float(w[i]), 4) for i, t in enumerate(self.tickers) if w[i] >= 0.0005},
+                "trades": {t: round(float(trades[i]), 2) for i, t in enumerate(self.tickers) if trades[i]},
+                "target_reachable": bool(reachable),
+            }
+            for w, trades, reachable in zip(plan["weights"], plan["trades"], plan["reachable"])
+        ]
+
+    def optimize(
+        self,
+        holdings: Dict[str, Any],
+        target_volatility: Optional[float] = None,
+        risk_tolerance: str = "medium",
+    ) -> Dict[str, Any]:
+        """Current risk, target-volatility allocation and trades for one portfolio"""
+        self._load()
+        target = target_volatility or TARGET_VOLATILITY.get(risk_tolerance, TARGET_VOLATILITY["medium"])
+        values, unmapped = self.holdings_vector(holdings)
+        total = values.sum()
+        current = values / total if total > 0 else np.zeros_like(values)
+        plan = self.rebalance_many(values, [target])
+        weights, trades = plan["weights"][0], plan["trades"][0]
+        if total <= 0:
+            weights = self.target_weights([target])[0]
+        current_stats = self.stats(current)
+        target_stats = self.stats(weights)
+        max_sharpe = self.frontier_weights[self.max_sharpe_index]
+        return {
+            "universe_version": self.version,
+            "total_value": round(float(total), 2),
+            "unmapped_holdings": unmapped,
+            "current": self._describe(current, current_stats),
+            "target_volatility": target,
+            "target_reachable": bool(plan["reachable"][0]),
+            "target": self._describe(weights, target_stats),
+            "trades": {t: round(float(trades[i]), 2) for i, t in enumerate(self.tickers) if trades[i]},
+            "risk_parity": self._describe(self.risk_parity_weights, self.stats(self.risk_parity_weights)),
+            "max_sharpe": self._describe(max_sharpe, self.stats(max_sharpe)),
+            "efficient_frontier": [
+                {"volatility": round(float(v), 4), "expected_return": round(float(r), 4)}
+                for v, r in zip(self.frontier_vols[::4], self.frontier_returns[::4])
+            ],
+        }
+
+    def _describe(self, weights: np.ndarray, stats: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        return {
+            "weights": {t: round(float(weights[i]), 4) for i, t in enumerate(self.tickers) if weights[i] >= 0.0005},
+            "expected_return": round(float(stats["expected_return"][0]), 4),
+            "volatility": round(float(stats["volatility"][0]), 4),
+            "diversification_ratio": round(float(stats["diversification_ratio"][0]), 3),
+        }
+
+
+# Shared optimizer; the universe and frontier are computed on first use
+portfolio_optimizer = PortfolioOptimizer()
@@ -0,0 +1,206 @@
+"""
+Token-budgeted prompt construction for PecuniaAI.
+
+Prompts are assembled from instruction text and data fields. Text is dedented
+and data is serialized as compact JSON. If the result is still over the
+method's input budget, the lowest-value fields are summarized, then
+truncated, then dropped until it fits. Token counts use tiktoken when it is
+installed and a character heuristic otherwise.
+
+Completion limits are sized the same way: `max_tokens_for` picks max_tokens
+per method from the output lengths observed so far.
+
+Each build records the prompt size before (indented JSON, raw text blocks, as
+the prompts were originally written) and after compaction, so /api/metrics
+and benchmarks/bench_prompt_tokens.py report tokens per call both ways.
+"""
+
+import importlib.util
+import json
+import os
+import textwrap
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from ai_resilience import current_ai_method
+from metrics import metrics
+
+TIKTOKEN_AVAILABLE = importlib.util.find_spec('tiktoken') is not None
+TOKENIZER_MODEL = os.environ.get('AI_TOKENIZER_MODEL', 'gpt-4')
+
+# Input token budget per PecuniaAI method
+DEFAULT_INPUT_BUDGET = int(os.environ.get('AI_PROMPT_DEFAULT_BUDGET', 1200))
+METHOD_INPUT_BUDGETS: Dict[str, int] = {
+    "get_comprehensive_financial_analysis": 900,
+    "analyze_spending_patterns": 1200,
+    "chat_with_ai": 800,
+    **json.loads(os.environ.get('AI_PROMPT_BUDGETS', '{}')),
+}
+
+# max_tokens bounds; observed output lengths choose a value in between
+AI_MAX_TOKENS_CEILING = int(os.environ.get('AI_MAX_TOKENS_CEILING', 2000))
+AI_MAX_TOKENS_FLOOR = int(os.environ.get('AI_MAX_TOKENS_FLOOR', 256))
+AI_MAX_TOKENS_MIN_SAMPLES = int(os.environ.get('AI_MAX_TOKENS_MIN_SAMPLES', 20))
+AI_MAX_TOKENS_HEADROOM = float(os.environ.get('AI_MAX_TOKENS_HEADROOM', 1.25))
+# Output length assumed before a method has samples
+AI_EXPECTED_OUTPUT_TOKENS = int(os.environ.get('AI_EXPECTED_OUTPUT_TOKENS', 600))
+# Methods whose answers legitimately run longer than the ceiling
+METHOD_MAX_TOKENS_CEILINGS: Dict[str, int] = {
+    "generate_full_plan": 4000,
+}
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = TOKENIZER_MODEL) -> int:
+    """Tokens in `text`, exact with tiktoken, estimated without it"""
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding(model).encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = TOKENIZER_MODEL) -> str:
+    """`text` cut to at most `max_tokens` tokens, marked with "..." when cut"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    if TIKTOKEN_AVAILABLE:
+        encoding = _encoding(model)
+        return encoding.decode(encoding.encode(text)[:max(0, max_tokens - 1)]) + "..."
+    return text[:max(0, max_tokens - 1) * CHARS_PER_TOKEN] + "..."
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def compact_text(text: str) -> str:
+    """Dedent an instruction block and drop blank lines"""
+    return "\n".join(line.rstrip() for line in textwrap.dedent(text).strip().splitlines() if line.strip())
+
+
+def _shrink(value: Any) -> Any:
+    """One generic reduction step; returns the value unchanged when it cannot shrink"""
+    if isinstance(value, list):
+        omitted = 0
+        if value and isinstance(value[-1], dict) and "_omitted" in value[-1]:
+            omitted, value = value[-1]["_omitted"], value[:-1]
+        if len(value) > 1:
+            keep = len(value) // 2
+            return value[:keep] + [{"_omitted": omitted + len(value) - keep}]
+    if isinstance(value, dict):
+        items = [(k, v) for k, v in value.items() if k != "_omitted"]
+        if len(items) > 1:
+            if all(isinstance(v, (int, float)) for _, v in items):
+                # Keep the largest amounts
+                items.sort(key=lambda item: abs(item[1]), reverse=True)
+            keep = len(items) // 2
+            return {**dict(items[:keep]), "_omitted": value.get("_omitted", 0) + len(items) - keep}
+    if isinstance(value, str) and len(value) > 80:
+        return value[:len(value) // 2] + "..."
+    return value
+
+
+class _Field:
+    __slots__ = ("label", "value", "priority", "summarize", "summarized")
+
+    def __init__(self, label: str, value: Any, priority: int, summarize: Optional[Callable[[Any], Any]]):
+        self.label = label
+        self.value = value
+        self.priority = priority
+        self.summarize = summarize
+        self.summarized = False
+
+
+class PromptBuilder:
+    """Instruction text plus data fields, rendered within a token budget.
+
+    Fields with a higher priority are kept longest. A field's `summarize`
+    callable is applied before generic truncation.
+    """
+
+    def __init__(self, method: Optional[str] = None, budget: Optional[int] = None):
+        self.method = method or current_ai_method()
+        self.budget = budget or METHOD_INPUT_BUDGETS.get(self.method, DEFAULT_INPUT_BUDGET)
+        self._parts: List[Any] = []
+
+    def text(self, block: str) -> "PromptBuilder":
+        self._parts.append(block)
+        return self
+
+    def field(
+        self,
+        label: str,
+        value: Any,
+        priority: int = 0,
+        summarize: Optional[Callable[[Any], Any]] = None,
+    ) -> "PromptBuilder":
+        self._parts.append(_Field(label, value, priority, summarize))
+        return self
+
+    def _render(self, compact: bool = True) -> str:
+        lines = []
+        for part in self._parts:
+            if isinstance(part, _Field):
+                if part.value is None:
+                    continue
+                body = compact_json(part.value) if compact else json.dumps(part.value, indent=2, default=str)
+                lines.append(f"{part.label}: {body}")
+            else:
+                lines.append(compact_text(part) if compact else part)
+        return "\n".join(lines)
+
+    def build(self) -> str:
+        """Render the prompt, reducing low-value fields until it fits the budget"""
+        before = count_tokens(self._render(compact=False))
+        prompt = self._render()
+        tokens = count_tokens(prompt)
+        fields = sorted((p for p in self._parts if isinstance(p, _Field)), key=lambda f: f.priority)
+        for field in fields:
+            while tokens > self.budget and field.value is not None:
+                if field.summarize is not None and not field.summarized:
+                    field.value = field.summarize(field.value)
+                    field.summarized = True
+                else:
+                    shrunk = _shrink(field.value)
+                    field.value = None if shrunk == field.value else shrunk
+                metrics.inc("ai_prompt_reductions_total", method=self.method, field=field.label)
+                prompt = self._render()
+                tokens = count_tokens(prompt)
+            if tokens <= self.budget:
+                break
+        metrics.observe("ai_prompt_tokens", before, method=self.method, stage="before")
+        metrics.observe("ai_prompt_tokens", tokens, method=self.method, stage="after")
+        return prompt
+
+
+def record_completion(method: str, completion_tokens: int, max_tokens: int, truncated: bool):
+    """Feed an observed output length into the max_tokens estimate"""
+    # A cut-off answer says the limit was too low, not how long the answer is
+    observed = max_tokens * 1.5 if truncated else completion_tokens
+    metrics.observe("ai_completion_tokens", observed, method=method)
+
+
+def max_tokens_for(method: str) -> int:
+    """max_tokens covering the method's p99 output length with headroom"""
+    ceiling = METHOD_MAX_TOKENS_CEILINGS.get(method, AI_MAX_TOKENS_CEILING)
+    if metrics.sample_count("ai_completion_tokens", method=method) < AI_MAX_TOKENS_MIN_SAMPLES:
+        return ceiling
+    p99 = metrics.quantile("ai_completion_tokens", 0.99, method=method)
+    return int(min(ceiling, max(AI_MAX_TOKENS_FLOOR, p99 * AI_MAX_TOKENS_HEADROOM)))
+
+
+def expected_output_tokens(method: str) -> int:
+    """Typical completion length of the method, for latency predictions"""
+    if metrics.sample_count("ai_completion_tokens", method=method) < AI_MAX_TOKENS_MIN_SAMPLES:
+        return AI_EXPECTED_OUTPUT_TOKENS
+    return int(metrics.quantile("ai_completion_tokens", 0.95, method=method))
@@ -0,0 +1,269 @@
+"""
+Client-side governor for the LLM provider's rate limits.
+
+Two token buckets — requests per minute and tokens per minute — are charged
+before each upstream call with the request's estimated token cost (prompt
+plus max_tokens). A call that would overdraw a bucket waits until it refills;
+when that wait exceeds what the caller's priority class can afford, the call
+is shed locally instead of collecting a 429. Limits and remaining budget are
+corrected from the provider's x-ratelimit-* headers, and a 429 pauses every
+caller for its retry-after.
+
+Bucket state lives in process memory by default. Set AI_RATE_STATE_PATH to a
+SQLite file to share one budget across worker processes on the same host;
+its transactions can wait on other workers' locks, so they run in a worker
+thread rather than on the event loop.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from ai_resilience import AIUnavailableError
+from ai_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_PAGE_LOAD
+from metrics import metrics
+from prompt_builder import count_tokens
+
+# Configured limits; 0 means unknown until learned from provider headers
+OPENAI_RPM_LIMIT = float(os.environ.get('OPENAI_RPM_LIMIT', 0))
+OPENAI_TPM_LIMIT = float(os.environ.get('OPENAI_TPM_LIMIT', 0))
+AI_RATE_STATE_PATH = os.environ.get('AI_RATE_STATE_PATH') or None
+
+# Longest a call of each class may wait for budget before it is shed
+AI_RATE_MAX_WAIT_SECONDS = {
+    PRIORITY_INTERACTIVE: float(os.environ.get('AI_RATE_INTERACTIVE_MAX_WAIT', 3)),
+    PRIORITY_PAGE_LOAD: float(os.environ.get('AI_RATE_PAGE_LOAD_MAX_WAIT', 15)),
+    PRIORITY_BACKGROUND: float(os.environ.get('AI_RATE_BACKGROUND_MAX_WAIT', 60)),
+}
+
+BUCKET_REQUESTS = "requests"
+BUCKET_TOKENS = "tokens"
+BUCKETS = (BUCKET_REQUESTS, BUCKET_TOKENS)
+
+# Chat-format overhead per message
+TOKENS_PER_MESSAGE = 4
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class RateLimitShedError(AIUnavailableError):
+    """The call was shed locally because the rate budget could not cover it in time"""
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a chat completion may charge against TPM: prompt plus max_tokens"""
+    prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+    return prompt_tokens + TOKENS_PER_MESSAGE * len(messages) + max_tokens
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a provider reset header such as `1s`, `6m0s` or `20ms`"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _new_state() -> Dict[str, float]:
+    return {"capacity": 0.0, "level": 0.0, "updated": time.time(), "blocked_until": 0.0}
+
+
+class MemoryBucketStore:
+    """Bucket state for a single process"""
+
+    # Transactions only hold a thread lock briefly, so they run on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {name: _new_state() for name in BUCKETS}
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Dict[str, float]]]:
+        with self._lock:
+            yield self._states
+
+
+class SqliteBucketStore:
+    """Bucket state in a SQLite file shared by every worker on the host"""
+
+    # BEGIN IMMEDIATE can wait up to the busy timeout for another worker
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "name TEXT PRIMARY KEY, capacity REAL, level REAL, updated REAL, blocked_until REAL)"
+            )
+            for name in BUCKETS:
+                state = _new_state()
+                conn.execute(
+                    "INSERT OR IGNORE INTO rate_buckets VALUES (?, ?, ?, ?, ?)",
+                    (name, state["capacity"], state["level"], state["updated"], state["blocked_until"]),
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Dict[str, float]]]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT name, capacity, level, updated, blocked_until FROM rate_buckets").fetchall()
+            states = {
+                name: {"capacity": capacity, "level": level, "updated": updated, "blocked_until": blocked_until}
+                for name, capacity, level, updated, blocked_until in rows
+            }
+            yield states
+            conn.executemany(
+                "UPDATE rate_buckets SET capacity = ?, level = ?, updated = ?, blocked_until = ? WHERE name = ?",
+                [(s["capacity"], s["level"], s["updated"], s["blocked_until"], name) for name, s in states.items()],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _refill(state: Dict[str, float], now: float):
+    if state["capacity"] > 0:
+        rate = state["capacity"] / 60
+        state["level"] = min(state["capacity"], state["level"] + (now - state["updated"]) * rate)
+    state["updated"] = now
+
+
+class RateGovernor:
+    """RPM and TPM token buckets in front of the provider"""
+
+    def __init__(
+        self,
+        rpm_limit: float = OPENAI_RPM_LIMIT,
+        tpm_limit: float = OPENAI_TPM_LIMIT,
+        state_path: Optional[str] = AI_RATE_STATE_PATH,
+        max_wait: Optional[Dict[str, float]] = None,
+    ):
+        self.store = SqliteBucketStore(state_path) if state_path else MemoryBucketStore()
+        self.max_wait = max_wait or dict(AI_RATE_MAX_WAIT_SECONDS)
+        with self.store.transaction() as states:
+            for name, limit in ((BUCKET_REQUESTS, rpm_limit), (BUCKET_TOKENS, tpm_limit)):
+                if limit and not states[name]["capacity"]:
+                    states[name].update(capacity=float(limit), level=float(limit))
+
+    async def _in_store(self, operation: Callable[..., Any], *args) -> Any:
+        """Run a bucket-store operation, in a worker thread if the store can block"""
+        if self.store.blocking:
+            return await asyncio.to_thread(operation, *args)
+        return operation(*args)
+
+    def _reserve(self, tokens: int, max_wait: float) -> Optional[float]:
+        """Charge both buckets, returning the wait before sending, or None to shed"""
+        demands = {BUCKET_REQUESTS: 1, BUCKET_TOKENS: tokens}
+        now = time.time()
+        with self.store.transaction() as states:
+            wait = 0.0
+            for name, amount in demands.items():
+                state = states[name]
+                _refill(state, now)
+                wait = max(wait, state["blocked_until"] - now)
+                if state["capacity"] > 0 and state["level"] < amount:
+                    # Buckets may go into debt; later callers queue behind it
+                    wait = max(wait, (amount - state["level"]) / (state["capacity"] / 60))
+            if wait > max_wait:
+                return None
+            for name, amount in demands.items():
+                if states[name]["capacity"] > 0:
+                    states[name]["level"] -= amount
+            for name in BUCKETS:
+                metrics.set_gauge("ai_rate_budget_remaining", round(states[name]["level"]), bucket=name)
+        return max(0.0, wait)
+
+    async def acquire(self, tokens: int, priority: str, deadline: Optional[float] = None):
+        """Wait until the buckets cover this call, or raise RateLimitShedError"""
+        max_wait = self.max_wait.get(priority, self.max_wait[PRIORITY_PAGE_LOAD])
+        if deadline is not None:
+            max_wait = min(max_wait, deadline - time.monotonic())
+        wait = await self._in_store(self._reserve, tokens, max_wait)
+        if wait is None:
+            metrics.inc("ai_rate_limit_shed_total", priority=priority)
+            raise RateLimitShedError(f"Rate budget exhausted for {priority} call ({tokens} tokens)")
+        metrics.observe("ai_rate_limit_wait_seconds", wait, priority=priority)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def settle(self, estimated_tokens: int, used_tokens: Optional[int]):
+        """Refund the difference between the estimate and the provider's usage"""
+        if used_tokens is not None:
+            await self._in_store(self._settle, estimated_tokens, used_tokens)
+
+    def _settle(self, estimated_tokens: int, used_tokens: int):
+        with self.store.transaction() as states:
+            state = states[BUCKET_TOKENS]
+            if state["capacity"] > 0:
+                _refill(state, time.time())
+                state["level"] = min(state["capacity"], state["level"] + estimated_tokens - used_tokens)
+
+    async def observe_headers(self, headers: Mapping[str, Any], rate_limited: bool = False):
+        """Adopt the provider's view of limits and remaining budget"""
+        await self._in_store(self._observe_headers, headers, rate_limited)
+        if rate_limited:
+            metrics.inc("ai_provider_rate_limited_total")
+
+    def _observe_headers(self, headers: Mapping[str, Any], rate_limited: bool):
+        now = time.time()
+        with self.store.transaction() as states:
+            for name in BUCKETS:
+                state = states[name]
+                _refill(state, now)
+                limit = headers.get(f"x-ratelimit-limit-{name}")
+                remaining = headers.get(f"x-ratelimit-remaining-{name}")
+                try:
+                    learned = not state["capacity"]
+                    if limit is not None:
+                        state["capacity"] = float(limit)
+                    if remaining is not None:
+                        # Only lower a known level: our in-flight reservations are not in the provider's count yet
+                        state["level"] = float(remaining) if learned else min(state["level"], float(remaining))
+                except ValueError:
+                    continue
+            if rate_limited:
+                pause = parse_duration(headers.get("retry-after")) or max(
+                    parse_duration(headers.get(f"x-ratelimit-reset-{name}")) or 0 for name in BUCKETS
+                ) or 1.0
+                for state in states.values():
+                    state["blocked_until"] = max(state["blocked_until"], now + pause)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Current bucket levels for the metrics endpoint"""
+        now = time.time()
+        with self.store.transaction() as states:
+            for state in states.values():
+                _refill(state, now)
+            return {
+                name: {
+                    "capacity": state["capacity"],
+                    "remaining": round(state["level"], 1),
+                    "blocked_for": round(max(0.0, state["blocked_until"] - now), 3),
+                }
+                for name, state in states.items()
+            }
@@ -0,0 +1,153 @@
+"""
+Persistent, content-addressed cache of AI completions.
+
+Entries are keyed by a hash of everything that determines the completion —
+model, temperature, system prompt and rendered user prompt — and stored
+zlib-compressed in SQLite so paid-for answers survive restarts and are shared
+by every worker on the host. The cache is bounded by total compressed size
+(least recently used entries are evicted first) and by a TTL.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from metrics import metrics
+
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+
+AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', '1') == '1'
+AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH', str(STATE_DIR / 'ai_response_cache.sqlite'))
+AI_CACHE_TTL_SECONDS = float(os.environ.get('AI_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Evict down to this fraction of the size bound so eviction runs rarely
+EVICTION_TARGET = 0.9
+
+
+def cache_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+    """Content address of a completion request"""
+    material = json.dumps([model, temperature, system_prompt, user_prompt], separators=(",", ":"))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LRU of compressed completions with per-entry expiry"""
+
+    def __init__(
+        self,
+        path: str = AI_CACHE_PATH,
+        ttl_seconds: float = AI_CACHE_TTL_SECONDS,
+        max_bytes: int = AI_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, method: str = "unknown") -> Optional[str]:
+        """Cached completion, or None on a miss; counts the lookup against `method`"""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT body FROM responses WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        if row is None:
+            metrics.inc("ai_cache_requests_total", method=method, result="miss")
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        metrics.inc("ai_cache_requests_total", method=method, result="hit")
+        return zlib.decompress(row[0]).decode()
+
+    def set(self, key: str, completion: str, ttl_seconds: Optional[float] = None):
+        """Store a completion, evicting least recently used entries past the size bound"""
+        body = zlib.compress(completion.encode(), 6)
+        now = time.time()
+        expires_at = now + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        conn = self._connect()
+        # A stored entry for the key is replaced, so its size comes off the total; read it in the same transaction
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, body, len(body), now, now, expires_at),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Lookups and stores run in worker threads, so the running total is locked
+        with self._size_lock:
+            self._total_bytes += len(body) - (row[0] if row else 0)
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used until under the size bound"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            target = self.max_bytes * EVICTION_TARGET
+            evicted = 0
+            if total > target:
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    evicted += 1
+                    if total <= target:
+                        break
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._total_bytes = total
+        metrics.inc("ai_cache_evictions_total", evicted)
+
+    def flush(self):
+        """Checkpoint the write-ahead log into the database file"""
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def clear(self):
+        self._connect().execute("DELETE FROM responses")
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, stored bytes and hit rate per PecuniaAI method"""
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups: Dict[str, Dict[str, float]] = {}
+        for sample in metrics.snapshot()["counters"].get("ai_cache_requests_total", []):
+            method = sample["labels"]["method"]
+            lookups.setdefault(method, {"hit": 0, "miss": 0})[sample["labels"]["result"]] = sample["value"]
+        hit_rates = {
+            method: round(counts["hit"] / (counts["hit"] + counts["miss"]), 4)
+            for method, counts in lookups.items()
+        }
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "hit_rate": hit_rates}
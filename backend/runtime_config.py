@@ -0,0 +1,147 @@
+"""
+Uvicorn runtime profiles for the Pecunia API.
+
+`default` keeps uvicorn's stock settings. `performance` is the supported
+production profile: uvloop event loop, httptools parser, a deeper accept
+backlog, keep-alive longer than typical load-balancer idle timeouts and a
+concurrency cap that sheds load with 503s instead of queueing without
+bound. Every field can be overridden from the environment.
+
+Both profiles run one worker. Jobs, idempotency keys, conversation memory
+and metrics live in process memory, so with several workers a job polled
+on another worker is not found and a retried POST runs twice; the nightly
+forecast precompute would also run once per worker. Scale out with more
+processes behind the load balancer only once that state is shared.
+
+`run` serves with DrainingServer so a deploy drains in-flight AI work first.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "loop": "auto",
+        "http": "auto",
+        "backlog": 2048,
+        "timeout_keep_alive": 5,
+        "workers": 1,
+        "limit_concurrency": None,
+        "timeout_graceful_shutdown": None,
+    },
+    "performance": {
+        "loop": "uvloop",
+        "http": "httptools",
+        "backlog": 4096,
+        "timeout_keep_alive": 75,
+        "workers": 1,
+        "limit_concurrency": 1000,
+        "timeout_graceful_shutdown": 10,
+    },
+}
+
+# Environment variable overriding each profile field
+ENV_OVERRIDES = {
+    "loop": "UVICORN_LOOP",
+    "http": "UVICORN_HTTP",
+    "backlog": "UVICORN_BACKLOG",
+    "timeout_keep_alive": "UVICORN_TIMEOUT_KEEP_ALIVE",
+    "workers": "UVICORN_WORKERS",
+    "limit_concurrency": "UVICORN_LIMIT_CONCURRENCY",
+    "timeout_graceful_shutdown": "UVICORN_TIMEOUT_GRACEFUL_SHUTDOWN",
+}
+
+INT_FIELDS = ("backlog", "timeout_keep_alive", "workers", "limit_concurrency", "timeout_graceful_shutdown")
+
+# Optional packages backing the fast implementations
+OPTIONAL_BACKENDS = {("loop", "uvloop"): "uvloop", ("http", "httptools"): "httptools"}
+
+
+def _module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def get_runtime_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve a profile plus environment overrides into uvicorn settings"""
+    name = name or os.environ.get('PECUNIA_RUNTIME_PROFILE', 'default')
+    if name not in RUNTIME_PROFILES:
+        raise ValueError(f"Unknown runtime profile '{name}', expected one of {sorted(RUNTIME_PROFILES)}")
+
+    settings = dict(RUNTIME_PROFILES[name])
+    for field, env_var in ENV_OVERRIDES.items():
+        value = os.environ.get(env_var)
+        if value is None or value == "":
+            continue
+        if field in INT_FIELDS:
+            settings[field] = None if value.lower() == "none" else int(value)
+        else:
+            settings[field] = value
+
+    for (field, value), module in OPTIONAL_BACKENDS.items():
+        if settings[field] == value and not _module_available(module):
+            logger.warning(f"{module} is not installed; falling back to {field}=auto")
+            settings[field] = "auto"
+
+    settings["host"] = os.environ.get('HOST', '0.0.0.0')
+    settings["port"] = int(os.environ.get('PORT', 8001))
+    return settings
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains AI work before it stops listening.
+
+    The first SIGTERM/SIGINT puts the app into draining mode while the socket
+    stays open, so /health can tell the load balancer to stop routing here;
+    once in-flight work is done (or the drain deadline passes) the normal
+    uvicorn shutdown runs. A second signal exits immediately.
+    """
+
+    _drain_task: Optional[asyncio.Task] = None
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if self._drain_task is not None or self.should_exit:
+            super().handle_exit(signal.SIGINT, frame)
+            return
+        self._drain_task = asyncio.get_event_loop().create_task(self._drain_then_exit(sig, frame))
+
+    async def _drain_then_exit(self, sig: int, frame: Optional[FrameType]):
+        from lifecycle import drain_controller
+
+        try:
+            await drain_controller.wait_for_drain()
+        finally:
+            super().handle_exit(sig, frame)
+
+
+def run(app_path: str = "server:app", profile: Optional[str] = None, **overrides):
+    """Start uvicorn with the selected runtime profile"""
+    settings = {**get_runtime_profile(profile), **overrides}
+    logger.info(f"Starting {app_path} with runtime settings {settings}")
+
+    # Mirrors uvicorn.run, with the draining server class
+    sys.path.insert(0, str(Path(__file__).parent))
+    if (settings.get("workers") or 1) > 1:
+        logger.warning(
+            f"Running {settings['workers']} workers: jobs, idempotency keys, conversation memory and metrics "
+            "are per process, and each worker runs the nightly forecast precompute"
+        )
+    config = uvicorn.Config(app_path, **settings)
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        # An import string is required for workers > 1
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
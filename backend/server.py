@@ -2,7 +2,7 @@ import logging
 import traceback
 from fastapi import FastAPI, HTTPException, Depends, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import Response
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -11,8 +11,11 @@ from datetime import datetime, timedelta
 import uuid
 import asyncio
 import httpx
+import tempfile
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
+from jose import JWTError, jwt
 
 # Import authentication service
 from auth_service import (
@@ -23,8 +26,34 @@ from auth_service import (
     Token,
     UserResponse,
     get_current_user,
-    verify_token
+    verify_token,
+    SECRET_KEY,
+    ALGORITHM
 )
+from ai_scheduler import (
+    ai_scheduler,
+    set_request_context,
+    PRIORITY_CLASSES,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PAGE_LOAD,
+    PRIORITY_BACKGROUND
+)
+from idempotency import IdempotencyMiddleware
+from job_service import job_manager, JobQueueFullError, TERMINAL_STATES
+from lifecycle import drain_controller, DrainMiddleware
+from ai_resilience import AIUnavailableError
+from conversation_store import conversation_store
+from anomaly_detector import ANOMALY_RECENT_DAYS, anomaly_detector
+from budget_solver import budget_solver
+from cashflow_forecast import cashflow_forecaster, nightly_precompute
+from goal_simulator import goal_simulator
+from portfolio_optimizer import portfolio_optimizer
+from merchant_categorizer import merchant_categorizer
+from spending_analytics import DEFAULT_CATEGORY, category_totals, summarize_spending, to_frame
+from subscription_detector import subscription_detector, subscription_recommendation
+from transaction_import import ImportFormatError, import_transactions
+from transaction_store import transaction_store
+from metrics import metrics
 
 # Load environment variables
 load_dotenv()
@@ -36,7 +65,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Pecunia API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Results and chat memory saved by the previous process's shutdown
+    await asyncio.to_thread(job_manager.load)
+    await asyncio.to_thread(conversation_store.load)
+    job_manager.start()
+    nightly_forecasts = asyncio.create_task(nightly_precompute(cashflow_forecaster))
+    background = [nightly_forecasts]
+    drain_controller.register_flush("AI job results", job_manager.save)
+    drain_controller.register_flush("conversation memory", conversation_store.save)
+    drain_controller.register_flush("anomaly state", anomaly_detector.flush)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        # Built in the background so the first AI request doesn't pay for it
+        background.append(asyncio.create_task(pecunia_ai.warm_up()))
+        drain_controller.register_flush("AI response cache", pecunia_ai.flush_cache)
+        # Closed only after in-flight AI calls have drained
+        drain_controller.register_flush("OpenAI connection pool", pecunia_ai.aclose)
+    yield
+    # Stop background work before anything is flushed underneath it
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    # Drain in-flight AI calls and queued jobs, then flush state
+    await drain_controller.shutdown()
+
+app = FastAPI(title="Pecunia API", version="1.0.0", lifespan=lifespan)
+
+# Refuse new AI work and track in-flight AI requests while draining
+app.add_middleware(DrainMiddleware)
+
+# Replay stored responses for retried POSTs carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
 
 # CORS configuration
 app.add_middleware(
@@ -147,7 +208,7 @@ class UserProfile(BaseModel):
     emergency_fund: Optional[float] = None
     
 class FinancialQuery(BaseModel):
-    query: str
+    query: str = Field(..., min_length=1, max_length=4000)
     context: Optional[str] = None
 
 class TravelRequest(BaseModel):
@@ -164,6 +225,60 @@ class GoalRequest(BaseModel):
     deadline: str = "2025-12-31"
     monthly_income: Optional[float] = None
 
+# "mock" serves canned responses, "live" calls PecuniaAI
+AI_MODE = os.environ.get('PECUNIA_AI_MODE', 'mock')
+
+# Simulated upstream latency for the mock AI endpoints
+MOCK_AI_LATENCY_SECONDS = float(os.environ.get('MOCK_AI_LATENCY_SECONDS', 1))
+
+def token_subject(request: Request) -> Optional[str]:
+    """Subject of a valid bearer token, if the request carries one"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            return payload.get("sub") or None
+        except JWTError:
+            pass
+    return None
+
+def request_user_key(request: Request) -> str:
+    """Identify the caller for fair queuing only: token subject, else client address.
+
+    Callers behind one NAT share an address, so never key per-user state on this.
+    """
+    subject = token_subject(request)
+    if subject:
+        return subject
+    return request.client.host if request.client else "anonymous"
+
+def authenticated_user_key(request: Request) -> str:
+    """Token subject that keys the caller's stored state; 401 without a valid bearer token"""
+    subject = token_subject(request)
+    if subject is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sign in to use your stored transactions, settings and history",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return subject
+
+def ai_priority(priority: str):
+    """Route dependency declaring the scheduler priority class of an AI endpoint"""
+    async def declare_priority(request: Request):
+        effective = priority
+        # Clients may lower their own priority (e.g. pre-fetches), never raise it
+        requested = request.headers.get("x-pecunia-priority")
+        if requested in PRIORITY_CLASSES and PRIORITY_CLASSES.index(requested) > PRIORITY_CLASSES.index(priority):
+            effective = requested
+        set_request_context(effective, request_user_key(request))
+    return Depends(declare_priority)
+
+async def simulate_ai_call():
+    """Stand-in for the upstream LLM call, scheduled like a real one"""
+    async with ai_scheduler.slot():
+        await asyncio.sleep(MOCK_AI_LATENCY_SECONDS)
+
 # Mock AI responses
 def get_mock_comprehensive_analysis():
     return {
@@ -230,6 +345,32 @@ def get_mock_travel_plan(request: TravelRequest):
         "savings_goal": f"Save ${request.budget/6:.0f} monthly for 6 months"
     }
 
+def get_mock_portfolio_optimization():
+    return {
+        "optimization": "Your portfolio shows good diversification. Consider rebalancing: reduce tech stocks by 5%, increase international exposure by 8%. Add 3% REITs for stability.",
+        "rebalancing_score": 88,
+        "suggested_changes": [
+            "Reduce AAPL position by 2%",
+            "Add VTIAX for international exposure", 
+            "Consider VNQ for REIT exposure"
+        ]
+    }
+
+def get_mock_spending_analysis(summary: Dict[str, Any], category_breakdown: Dict[str, float], subscriptions: Dict[str, Any]):
+    return {
+        "analysis": "Your spending is steady overall. Dining and shopping are your most flexible categories; capping them at last quarter's average would free up about $200 a month.",
+        "total_spending": summary["total_spending"],
+        "category_breakdown": category_breakdown,
+        "recommendations": [
+            "Set alerts on your fastest-growing categories",
+            subscription_recommendation(subscriptions),
+            "Automate savings before spending"
+        ],
+        "trends": summary["top_movers"],
+        "summary": summary,
+        "subscriptions": subscriptions
+    }
+
 def get_mock_goal_strategy(request: GoalRequest):
     months_to_deadline = 12
     monthly_target = (request.target - request.current) / months_to_deadline
@@ -241,6 +382,68 @@ def get_mock_goal_strategy(request: GoalRequest):
         "progress_percentage": (request.current / request.target) * 100
     }
 
+# ================================
+# LONG-RUNNING ANALYSES
+# ================================
+
+# Shared by the synchronous routes and the job workers
+async def run_comprehensive_analysis(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.get_comprehensive_financial_analysis(payload)
+    await simulate_ai_call()
+    return get_mock_comprehensive_analysis()
+
+async def run_travel_plan(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.generate_travel_plan(payload)
+    await simulate_ai_call()
+    return get_mock_travel_plan(TravelRequest(**payload))
+
+async def run_portfolio_optimization(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.optimize_portfolio(payload.get("portfolio_data", payload))
+    await simulate_ai_call()
+    return get_mock_portfolio_optimization()
+
+async def run_full_plan(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.generate_full_plan(payload)
+    await simulate_ai_call()
+    return {
+        "analysis": get_mock_comprehensive_analysis(),
+        "budget": get_mock_budget_optimization(),
+        "investment": get_mock_investment_strategy(),
+        "competitive": get_mock_competitive_insights(),
+        "combined": True
+    }
+
+async def run_goal_simulation(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Success probabilities for a batch of goals, e.g. every user's in a nightly run"""
+    results = await asyncio.to_thread(goal_simulator.simulate_many, payload.get("goals", []))
+    return {"results": results}
+
+async def run_portfolio_rebalance(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Target weights and trades for a batch of portfolios"""
+    results = await asyncio.to_thread(portfolio_optimizer.rebalance_portfolios, payload.get("portfolios", []))
+    return {"results": results}
+
+async def run_budget_allocation(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Category targets for a batch of users' budgets, e.g. in a nightly run"""
+    results = await asyncio.to_thread(budget_solver.allocate_many, payload.get("users", []))
+    return {"results": results}
+
+job_manager.register_handler("comprehensive-analysis", run_comprehensive_analysis)
+job_manager.register_handler("travel-plan", run_travel_plan)
+job_manager.register_handler("portfolio-optimization", run_portfolio_optimization)
+job_manager.register_handler("full-plan", run_full_plan)
+job_manager.register_handler("goal-simulation", run_goal_simulation)
+job_manager.register_handler("portfolio-rebalance", run_portfolio_rebalance)
+job_manager.register_handler("budget-allocation", run_budget_allocation)
+
 @app.post("/api/context")
 async def update_context(context: UserContext):
     user_contexts['default'] = context.dict()
@@ -253,42 +456,189 @@ async def update_profile(profile: UserProfile):
     user_contexts['default'].update(profile.dict(exclude_none=True))
     return {"status": "success", "message": "Profile updated successfully"}
 
-@app.post("/api/ai/comprehensive-analysis")
+@app.post("/api/ai/comprehensive-analysis", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def comprehensive_analysis(request: Dict[str, Any]):
-    await asyncio.sleep(1)  # Simulate processing time
-    return get_mock_comprehensive_analysis()
+    return await run_comprehensive_analysis(request)
 
-@app.post("/api/ai/smart-budget")
+@app.post("/api/ai/smart-budget", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def smart_budget(request: Dict[str, Any]):
-    await asyncio.sleep(1)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.generate_smart_budget(request)
+    await simulate_ai_call()
     return get_mock_budget_optimization()
 
-@app.post("/api/ai/investment-strategy")
+@app.post("/api/ai/investment-strategy", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def investment_strategy(request: Dict[str, Any]):
-    await asyncio.sleep(1)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.generate_investment_strategy(request)
+    await simulate_ai_call()
     return get_mock_investment_strategy()
 
-@app.post("/api/ai/competitive-insights")
+@app.post("/api/ai/competitive-insights", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def competitive_insights(request: Dict[str, Any]):
-    await asyncio.sleep(1)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.get_competitive_insights(request)
+    await simulate_ai_call()
     return get_mock_competitive_insights()
 
-@app.post("/api/ai/portfolio-optimization")
+@app.post("/api/ai/full-plan", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
+async def full_plan(request: Dict[str, Any]):
+    """Analysis, budget, investment and competitive sections from one AI call"""
+    return await run_full_plan(request)
+
+@app.post("/api/ai/portfolio-optimization", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def portfolio_optimization(request: Dict[str, Any]):
-    await asyncio.sleep(1)
-    return {
-        "optimization": "Your portfolio shows good diversification. Consider rebalancing: reduce tech stocks by 5%, increase international exposure by 8%. Add 3% REITs for stability.",
-        "rebalancing_score": 88,
-        "suggested_changes": [
-            "Reduce AAPL position by 2%",
-            "Add VTIAX for international exposure", 
-            "Consider VNQ for REIT exposure"
-        ]
-    }
+    return await run_portfolio_optimization(request)
+
+@app.post("/api/ai/spending-analysis", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
+async def spending_analysis(request: Dict[str, Any], http_request: Request):
+    """Trends and insights over posted transactions ({"spending_data": [...]} or {"transactions": [...]}),
+    or over the caller's imported transactions when none are posted"""
+    transactions = request.get("spending_data", request.get("transactions"))
+    subscriptions = None
+    if not transactions:
+        user_key = authenticated_user_key(http_request)
+        transactions = await asyncio.to_thread(transaction_store.spending, user_key)
+        subscriptions = await asyncio.to_thread(subscription_detector.detect, user_key)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.analyze_spending_patterns(transactions, subscriptions)
+    frame = await asyncio.to_thread(to_frame, transactions)
+    summary = await asyncio.to_thread(summarize_spending, frame)
+    if subscriptions is None:
+        subscriptions = await asyncio.to_thread(subscription_detector.detect_frame, frame)
+    await simulate_ai_call()
+    return get_mock_spending_analysis(summary, category_totals(frame), subscriptions)
+
+@app.post("/api/transactions/import")
+async def import_bank_export(
+    request: Request,
+    format: Optional[str] = None,
+    filename: Optional[str] = None,
+    debits_positive: bool = False,
+    dayfirst: bool = False,
+    user_key: str = Depends(authenticated_user_key),
+):
+    """Import a CSV, OFX or QIF bank export sent as the raw request body.
 
-@app.post("/api/ai/recommendations")
+    The body is streamed to a temporary file and parsed in batches, so memory
+    stays flat however large the export; rows already imported are skipped.
+    """
+    with tempfile.TemporaryFile() as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            stats = await asyncio.to_thread(
+                import_transactions, upload, user_key,
+                export_format=format, filename=filename, debits_positive=debits_positive, dayfirst=dayfirst,
+            )
+        except ImportFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if stats["imported"]:
+        await asyncio.to_thread(cashflow_forecaster.invalidate, user_key)
+    return stats
+
+@app.get("/api/transactions/summary")
+async def transactions_summary(user_key: str = Depends(authenticated_user_key)):
+    """Spending summary over the caller's imported transactions"""
+    frame = await asyncio.to_thread(transaction_store.spending, user_key)
+    return await asyncio.to_thread(summarize_spending, frame)
+
+@app.delete("/api/transactions")
+async def clear_transactions(user_key: str = Depends(authenticated_user_key)):
+    """Delete the caller's imported transactions"""
+    await asyncio.to_thread(transaction_store.clear, user_key)
+    subscription_detector.forget(user_key)
+    await asyncio.to_thread(anomaly_detector.forget, user_key)
+    await asyncio.to_thread(cashflow_forecaster.forget, user_key)
+    return {"status": "success", "message": "Transactions deleted"}
+
+@app.get("/api/transactions/subscriptions")
+async def transaction_subscriptions(as_of: Optional[str] = None, user_key: str = Depends(authenticated_user_key)):
+    """Recurring charges in the caller's imported transactions, with the next expected charge of each.
+
+    Activity is judged as of `as_of` (YYYY-MM-DD), else the latest transaction date.
+    """
+    try:
+        return await asyncio.to_thread(subscription_detector.detect, user_key, as_of)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="as_of must be a date (YYYY-MM-DD)")
+
+@app.get("/api/transactions/alerts")
+async def transaction_alerts(recent_days: int = ANOMALY_RECENT_DAYS, user_key: str = Depends(authenticated_user_key)):
+    """Unusual charges flagged as the caller's transactions were imported, newest first,
+    within `recent_days` of their latest transaction"""
+    if recent_days < 0:
+        raise HTTPException(status_code=400, detail="recent_days must not be negative")
+    alerts = await asyncio.to_thread(anomaly_detector.alerts, user_key, recent_days)
+    return {"alerts": alerts}
+
+@app.get("/api/forecast/cash-flow")
+async def cash_flow_forecast(
+    balance: float = 0.0, as_of: Optional[str] = None, user_key: str = Depends(authenticated_user_key)
+):
+    """Projected daily balances for the next 12 months, starting from `balance`, with confidence bands.
+
+    Projected from the caller's imported transactions (recurring income, subscriptions and seasonal
+    category spending) and served from the nightly cache; without transactions, from the monthly
+    income and expenses in the user context.
+    """
+    try:
+        forecast = await asyncio.to_thread(cashflow_forecaster.forecast, user_key, as_of, balance)
+        if forecast is None:
+            context = user_contexts.get('default') or {}
+            if context.get('monthly_income') is None and context.get('monthly_expenses') is None:
+                raise HTTPException(status_code=404, detail="No transactions or monthly income and expenses to forecast from")
+            forecast = await asyncio.to_thread(
+                cashflow_forecaster.forecast_profile,
+                context.get('monthly_income') or 0, context.get('monthly_expenses') or 0, as_of, balance,
+            )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="as_of must be a date (YYYY-MM-DD)")
+    return forecast
+
+@app.post("/api/transactions/categorize")
+async def categorize_merchants(request: Dict[str, Any], http_request: Request):
+    """Categories for raw merchant descriptions, applying the caller's overrides when signed in"""
+    descriptions = request.get("descriptions") or []
+    if not isinstance(descriptions, list):
+        raise HTTPException(status_code=400, detail="descriptions must be a list")
+    categories = await asyncio.to_thread(
+        merchant_categorizer.categorize_many, descriptions, token_subject(http_request)
+    )
+    return {"categories": [category or DEFAULT_CATEGORY for category in categories]}
+
+@app.get("/api/transactions/category-overrides")
+async def get_category_overrides(user_key: str = Depends(authenticated_user_key)):
+    overrides = await asyncio.to_thread(merchant_categorizer.overrides, user_key)
+    return {"overrides": overrides}
+
+@app.put("/api/transactions/category-overrides")
+async def set_category_overrides(request: Dict[str, Any], user_key: str = Depends(authenticated_user_key)):
+    """Add or replace merchant keyword -> category overrides for the caller"""
+    overrides = request.get("overrides")
+    if not isinstance(overrides, dict):
+        raise HTTPException(status_code=400, detail="overrides must map merchant keywords to categories")
+    try:
+        updated = await asyncio.to_thread(merchant_categorizer.set_overrides, user_key, overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"overrides": updated}
+
+@app.delete("/api/transactions/category-overrides/{keyword}")
+async def delete_category_override(keyword: str, user_key: str = Depends(authenticated_user_key)):
+    removed = await asyncio.to_thread(merchant_categorizer.remove_override, user_key, keyword)
+    if not removed:
+        raise HTTPException(status_code=404, detail="No override for that keyword")
+    return {"status": "success", "message": "Override removed"}
+
+@app.post("/api/ai/recommendations", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def smart_recommendations(request: Dict[str, Any]):
-    await asyncio.sleep(1)
+    await simulate_ai_call()
     return {
         "recommendations": "Based on your profile: 1) Switch to Ally Bank for 4.5% savings rate (+$180/year), 2) Use Chase Sapphire for travel rewards, 3) Consider I-bonds for inflation protection, 4) Automate investments to avoid timing mistakes.",
         "priority_score": 92,
@@ -300,19 +650,33 @@ async def smart_recommendations(request: Dict[str, Any]):
         ]
     }
 
-@app.post("/api/ai/travel-plan")
+@app.post("/api/ai/travel-plan", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def travel_plan(request: TravelRequest):
-    await asyncio.sleep(1)
-    return get_mock_travel_plan(request)
+    return await run_travel_plan(request.dict())
 
-@app.post("/api/ai/goal-strategy") 
+@app.post("/api/ai/goal-strategy", dependencies=[ai_priority(PRIORITY_PAGE_LOAD)])
 async def goal_strategy(request: GoalRequest):
-    await asyncio.sleep(1)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        return await pecunia_ai.generate_goal_strategy(request.dict())
+    await simulate_ai_call()
     return get_mock_goal_strategy(request)
 
-@app.post("/api/ai/chat")
-async def ai_chat(query: FinancialQuery):
-    await asyncio.sleep(1)
+@app.delete("/api/ai/chat/history")
+async def clear_chat_history(user_key: str = Depends(authenticated_user_key)):
+    """Forget the caller's conversation memory"""
+    conversation_store.clear(user_key)
+    return {"status": "success", "message": "Conversation history cleared"}
+
+@app.post("/api/ai/chat", dependencies=[ai_priority(PRIORITY_INTERACTIVE)])
+async def ai_chat(query: FinancialQuery, request: Request):
+    # Memory and spending alerts need a signed-in caller; anonymous chats are stateless
+    user_key = token_subject(request)
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        result = await pecunia_ai.chat_with_ai(query.query, user_contexts.get('default'), user_key)
+        return {**result, "context": query.context}
+    await simulate_ai_call()
     
     # Simple response based on query content
     query_lower = query.query.lower()
@@ -325,6 +689,12 @@ async def ai_chat(query: FinancialQuery):
         response = "Build an emergency fund of 3-6 months expenses first. Use a high-yield savings account that earns 4-5% APY. This should be your financial foundation."
     elif "debt" in query_lower:
         response = "Focus on high-interest debt first (credit cards). Consider the avalanche method: minimum payments on all debts, extra money on highest interest rate debt."
+    elif "spend" in query_lower or "unusual" in query_lower:
+        alerts = await asyncio.to_thread(anomaly_detector.alerts, user_key, limit=3) if user_key else []
+        if alerts:
+            response = "A few recent charges stand out: " + "; ".join(alert["message"] for alert in alerts) + ". Check they were expected."
+        else:
+            response = "Nothing unusual in your recent spending. Keep reviewing your largest categories each month to stay on budget."
     else:
         response = "I'm here to help with your financial questions! I can assist with budgeting, investing, saving strategies, debt management, and goal planning. What specific area would you like guidance on?"
     
@@ -334,6 +704,84 @@ async def ai_chat(query: FinancialQuery):
         "context": query.context
     }
 
+# ================================
+# AI JOB ENDPOINTS
+# ================================
+
+# Seconds between keep-alive comments on a job event stream
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+
+def job_owner(job_id: str, request: Request) -> str:
+    """Owner of a job: the token subject, else the job itself for an anonymous submission.
+
+    Anonymous jobs get a random id, so holding the id is what grants access to the result;
+    the client address is never used, since callers behind one NAT share it.
+    """
+    return token_subject(request) or f"anonymous:{job_id}"
+
+def get_owned_job(job_id: str, request: Request):
+    job = job_manager.get(job_id)
+    if job is None or job.owner != job_owner(job_id, request):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@app.post(
+    "/api/ai/jobs/{kind}",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[ai_priority(PRIORITY_BACKGROUND)]
+)
+async def submit_ai_job(kind: str, payload: Dict[str, Any], request: Request):
+    """Queue a long-running analysis and return its job id immediately"""
+    if kind not in job_manager.handlers:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job kind: {kind}")
+    if kind == "travel-plan":
+        payload = TravelRequest(**payload).dict()
+    # Signed-in work is deduplicated per user; anonymous work cannot be told apart, so each submission is new
+    job_id = None if token_subject(request) else str(uuid.uuid4())
+    try:
+        job = await job_manager.submit(
+            kind,
+            payload,
+            owner=job_owner(job_id, request),
+            idempotency_key=request.headers.get("idempotency-key"),
+            job_id=job_id
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_url": f"/api/ai/jobs/{job.id}",
+        "events_url": f"/api/ai/jobs/{job.id}/events"
+    }
+
+@app.get("/api/ai/jobs/{job_id}")
+async def get_ai_job(job_id: str, request: Request, wait: float = 0):
+    """Job status and result; `wait` long-polls up to 30s for a state change"""
+    job = get_owned_job(job_id, request)
+    if wait > 0:
+        await job_manager.wait(job, min(wait, 30))
+    return job.to_dict()
+
+@app.get("/api/ai/jobs/{job_id}/events")
+async def stream_ai_job(job_id: str, request: Request):
+    """Server-sent events with every state change until the job finishes"""
+    job = get_owned_job(job_id, request)
+
+    async def events():
+        last_status = None
+        while True:
+            if job.status != last_status:
+                last_status = job.status
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict(), default=str)}\n\n"
+                if job.status in TERMINAL_STATES:
+                    return
+            if not await job_manager.wait(job, JOB_EVENTS_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # Health check endpoints
 @app.get("/")
 async def root():
@@ -341,7 +789,39 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    if drain_controller.draining:
+        # 503 tells the load balancer to stop routing new traffic here
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "draining",
+                "drain": drain_controller.status(),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        )
+    result = {"status": "healthy", "drain": drain_controller.status(), "timestamp": datetime.utcnow()}
+    if AI_MODE == "live":
+        from ai_service import pecunia_ai
+        result["ai"] = pecunia_ai.health()
+    return result
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """In-process metrics, including AI queue wait time per priority class"""
+    result = {
+        "scheduler": ai_scheduler.stats(),
+        "jobs": job_manager.stats(),
+        **metrics.snapshot(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if AI_MODE == 'live':
+        from ai_service import pecunia_ai
+        result["ai"] = pecunia_ai.health()
+        if pecunia_ai.initialized:
+            result["rate_limits"] = await asyncio.to_thread(pecunia_ai.governor.stats)
+            if pecunia_ai.cache is not None:
+                result["response_cache"] = await asyncio.to_thread(pecunia_ai.cache.stats)
+    return result
 
 # Error handlers
 # ================================
@@ -379,6 +859,15 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content={"detail": exc.detail}
     )
 
+@app.exception_handler(AIUnavailableError)
+async def ai_unavailable_handler(request: Request, exc: AIUnavailableError):
+    logger.warning(f"AI unavailable: {str(exc)}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "AI service temporarily unavailable"},
+        headers={"Retry-After": "30"}
+    )
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unexpected error: {str(exc)}")
@@ -389,5 +878,6 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # PECUNIA_RUNTIME_PROFILE=performance selects uvloop/httptools and a concurrency cap
+    import runtime_config
+    runtime_config.run()
\ No newline at end of file
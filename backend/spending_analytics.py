@@ -0,0 +1,203 @@
+"""
+Vectorized spending analytics over columnar transactions.
+
+Transactions are held as a pandas DataFrame with one column per field
+(date, amount, category, merchant), with category and merchant stored as
+categoricals. Every aggregate is a group-by over those columns, computed as
+a bincount over the categorical codes (and month numbers), so years of
+history cost a few array passes instead of a Python loop per transaction.
+
+`summarize` reduces any number of transactions to a bounded summary:
+category totals and trends, monthly totals, top merchants, the categories
+that moved most last month, and the largest purchases. That summary, not
+the transaction list, is what PecuniaAI puts in the prompt.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from merchant_categorizer import merchant_categorizer
+
+# Months of history the summary reports month by month
+SPENDING_SUMMARY_MONTHS = int(os.environ.get('SPENDING_SUMMARY_MONTHS', 12))
+# Months averaged for trends and as the baseline for top movers
+SPENDING_TREND_WINDOW = int(os.environ.get('SPENDING_TREND_WINDOW', 3))
+SPENDING_SUMMARY_TOP = int(os.environ.get('SPENDING_SUMMARY_TOP', 8))
+TOP_MOVERS = 5
+LARGEST_TRANSACTIONS = 5
+
+DEFAULT_CATEGORY = "Other"
+UNKNOWN_MERCHANT = "Unknown"
+
+
+def empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[s]"),
+        "amount": pd.Series(dtype=np.float64),
+        "category": pd.Series(dtype="category"),
+        "merchant": pd.Series(dtype="category"),
+    })
+
+
+def to_frame(transactions: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> pd.DataFrame:
+    """Columnar transactions from request-shaped dicts ({date, amount, category, merchant or description}).
+
+    Transactions without a category are categorized from their merchant.
+    """
+    if isinstance(transactions, pd.DataFrame):
+        return transactions
+    raw = pd.DataFrame.from_records(transactions if isinstance(transactions, list) else list(transactions))
+    if raw.empty:
+        return empty_frame()
+
+    def column(name: str) -> pd.Series:
+        return raw[name] if name in raw else pd.Series(np.nan, index=raw.index, dtype=object)
+
+    merchant = column("merchant")
+    if "description" in raw:
+        merchant = merchant.fillna(raw["description"])
+    category = column("category").astype(object)
+    uncategorized = category.isna().to_numpy()
+    if uncategorized.any():
+        category[uncategorized] = merchant_categorizer.categorize_many(merchant[uncategorized].to_numpy(dtype=object))
+    return pd.DataFrame({
+        # Offsets ("Z" from toISOString, "+02:00") are converted to UTC and dropped, so naive and aware dates mix
+        "date": pd.to_datetime(column("date"), errors="coerce", format="ISO8601", utc=True)
+                  .dt.tz_convert(None).astype("datetime64[s]"),
+        "amount": pd.to_numeric(column("amount"), errors="coerce").fillna(0.0).astype(np.float64),
+        "category": category.fillna(DEFAULT_CATEGORY).astype(str).astype("category"),
+        "merchant": merchant.fillna(UNKNOWN_MERCHANT).astype(str).astype("category"),
+    })
+
+
+def _codes(frame: pd.DataFrame, column: str) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes and labels of a categorical column"""
+    values = frame[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    return values.cat.codes.to_numpy(), values.cat.categories
+
+
+def group_totals(frame: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Sum and count of amounts per value of a categorical column, largest sum first"""
+    codes, labels = _codes(frame, column)
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(labels))
+    sums = np.bincount(codes[valid], weights=frame["amount"].to_numpy()[valid], minlength=len(labels))
+    totals = pd.DataFrame({"sum": sums, "count": counts}, index=labels)
+    return totals[counts > 0].sort_values("sum", ascending=False, kind="stable")
+
+
+def category_totals(frame: pd.DataFrame) -> Dict[str, float]:
+    """Total amount per category, largest first"""
+    totals = group_totals(frame, "category")["sum"]
+    return {str(category): round(float(total), 2) for category, total in totals.items()}
+
+
+def monthly_by_category(frame: pd.DataFrame) -> pd.DataFrame:
+    """Month x category totals over every calendar month in the data, gaps filled with 0"""
+    dates = frame["date"].to_numpy()
+    dated = ~np.isnat(dates)
+    if not dated.any():
+        return pd.DataFrame(dtype=np.float64)
+    codes, labels = _codes(frame, "category")
+    dated &= codes >= 0
+    months = dates[dated].astype("datetime64[M]").astype(np.int64)
+    first, last = months.min(), months.max()
+    # One flat bin per (month, category), summed in a single pass
+    bins = (months - first) * len(labels) + codes[dated]
+    sums = np.bincount(bins, weights=frame["amount"].to_numpy()[dated], minlength=(last - first + 1) * len(labels))
+    counts = np.bincount(codes[dated], minlength=len(labels))
+    calendar = pd.DatetimeIndex(np.arange(first, last + 1).astype("datetime64[M]").astype("datetime64[s]"))
+    table = pd.DataFrame(sums.reshape(-1, len(labels)), index=calendar, columns=labels)
+    return table.loc[:, counts > 0]
+
+
+def top_movers(table: pd.DataFrame, window: int = SPENDING_TREND_WINDOW, top: int = SPENDING_SUMMARY_TOP) -> List[Dict[str, Any]]:
+    """Categories whose latest month moved most against the average of the `window` months before it"""
+    if len(table) < 2:
+        return []
+    latest = table.iloc[-1]
+    baseline = table.iloc[-1 - window:-1].mean()
+    change = latest - baseline
+    order = change.abs().sort_values(ascending=False).index[:top]
+    return [
+        {
+            "category": str(category),
+            "latest_month": round(float(latest[category]), 2),
+            "baseline": round(float(baseline[category]), 2),
+            "change": round(float(change[category]), 2),
+            "change_pct": round(float(change[category] / baseline[category] * 100), 1) if baseline[category] else None,
+        }
+        for category in order if change[category]
+    ]
+
+
+def summarize_spending(
+    transactions: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+    months: int = SPENDING_SUMMARY_MONTHS,
+    window: int = SPENDING_TREND_WINDOW,
+    top: int = SPENDING_SUMMARY_TOP,
+) -> Dict[str, Any]:
+    """Bounded summary of any number of transactions, sized for a prompt"""
+    frame = to_frame(transactions)
+    total = float(frame["amount"].sum())
+    table = monthly_by_category(frame)
+    month_count = max(1, len(table))
+    summary: Dict[str, Any] = {
+        "transactions": int(len(frame)),
+        "total_spending": round(total, 2),
+        "monthly_average": round(total / month_count, 2),
+    }
+    if len(table):
+        labels = table.index.strftime("%Y-%m")
+        summary["period"] = {"start": labels[0], "end": labels[-1], "months": len(table)}
+
+    by_category = group_totals(frame, "category")
+    # Trend: latest `window` months against the `window` before, per category
+    rolling = table.rolling(window, min_periods=1).mean() if len(table) else table
+    recent = rolling.iloc[-1] if len(rolling) else None
+    earlier = rolling.iloc[-1 - window] if len(rolling) > window else None
+    categories = {}
+    for category, row in by_category.head(top).iterrows():
+        entry = {
+            "total": round(float(row["sum"]), 2),
+            "share": round(float(row["sum"] / total * 100), 1) if total else 0.0,
+            "count": int(row["count"]),
+            "monthly_average": round(float(row["sum"]) / month_count, 2),
+        }
+        if earlier is not None and category in earlier.index and earlier[category]:
+            entry["trend_pct"] = round(float((recent[category] / earlier[category] - 1) * 100), 1)
+        categories[str(category)] = entry
+    if len(by_category) > top:
+        rest = by_category.iloc[top:]
+        categories["(other categories)"] = {
+            "total": round(float(rest["sum"].sum()), 2),
+            "share": round(float(rest["sum"].sum() / total * 100), 1) if total else 0.0,
+            "count": int(rest["count"].sum()),
+        }
+    summary["categories"] = categories
+
+    monthly = table.sum(axis=1).iloc[-months:]
+    summary["monthly_totals"] = {month.strftime("%Y-%m"): round(float(amount), 2) for month, amount in monthly.items()}
+    summary["top_movers"] = top_movers(table, window, top=TOP_MOVERS)
+
+    merchants = group_totals(frame, "merchant").head(top)
+    summary["top_merchants"] = [
+        {"merchant": str(merchant), "total": round(float(row["sum"]), 2), "count": int(row["count"])}
+        for merchant, row in merchants.iterrows()
+    ]
+    largest = frame.nlargest(LARGEST_TRANSACTIONS, "amount")
+    summary["largest"] = [
+        {
+            "date": None if pd.isna(row.date) else str(row.date.date()),
+            "amount": round(float(row.amount), 2),
+            "category": str(row.category),
+            "merchant": str(row.merchant),
+        }
+        for row in largest.itertuples(index=False)
+    ]
+    return summary
@@ -0,0 +1,307 @@
+"""
+Recurring-charge and subscription detection over transaction history.
+
+Outflows are grouped into series by normalized merchant name (as
+merchant_categorizer normalizes it) and amount band. Bands are
+logarithmic, SUBSCRIPTION_AMOUNT_BAND wide, so a $15.49 plan and its taxes
+stay together while a $4 coffee and a $60 grocery run at the same merchant
+do not. Each series keeps its count, first and last charge, and a
+histogram of the days between consecutive charges, binned by period
+(weekly through yearly, each with a tolerance). A series is recurring when
+enough of its intervals fall in one period's bin. Its next charge is
+expected one period after the last, by calendar month for monthly and
+longer periods. It is active while that date, plus a grace period, has not
+passed.
+
+Detection is incremental. Per-user state records how many of the user's
+stored rows it has consumed, so each call processes only the rows appended
+since. A series only needs its end dates and histogram to take new charges
+at either end. Only series that took new charges are rescored, and every
+update is a few array passes over the new rows, so the work is O(new
+rows). The full history is rescanned only when the state is cold, the
+store was cleared, or an import interleaves dates inside a known series.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from merchant_categorizer import merchant_categorizer
+from metrics import metrics
+from transaction_store import TransactionStore, transaction_store
+from ttl_store import TTLStore
+
+# Width of an amount band, as a fraction of the amount
+SUBSCRIPTION_AMOUNT_BAND = float(os.environ.get('SUBSCRIPTION_AMOUNT_BAND', 0.1))
+# Share of a series' intervals that must match one period
+SUBSCRIPTION_MIN_REGULARITY = float(os.environ.get('SUBSCRIPTION_MIN_REGULARITY', 0.7))
+# Days past the expected charge, beyond the period's tolerance, before a subscription counts as ended
+SUBSCRIPTION_GRACE_DAYS = int(os.environ.get('SUBSCRIPTION_GRACE_DAYS', 5))
+SUBSCRIPTION_CACHED_USERS = int(os.environ.get('SUBSCRIPTION_CACHED_USERS', 256))
+SUBSCRIPTION_STATE_TTL_SECONDS = float(os.environ.get('SUBSCRIPTION_STATE_TTL_SECONDS', 3600))
+
+# name: (typical days, tolerance days, calendar months or 0, fewest charges)
+PERIODS = {
+    "weekly": (7, 1, 0, 4),
+    "biweekly": (14, 2, 0, 3),
+    "monthly": (30.44, 3, 1, 3),
+    "quarterly": (91.31, 6, 3, 3),
+    "yearly": (365.25, 10, 12, 3),
+}
+DAYS_PER_MONTH = 30.44
+PERIOD_UNITS = {"weekly": "week", "biweekly": "2 weeks", "monthly": "month", "quarterly": "quarter", "yearly": "year"}
+
+
+# Per-period views of PERIODS, in its order
+PERIOD_NAMES = tuple(PERIODS)
+_PERIOD_DAYS = np.array([PERIODS[name][0] for name in PERIOD_NAMES])
+_PERIOD_TOLERANCE = np.array([PERIODS[name][1] for name in PERIOD_NAMES])
+_PERIOD_FEWEST = np.array([PERIODS[name][3] for name in PERIOD_NAMES])
+
+
+class SubscriptionState:
+    """A user's series as parallel arrays, and how far into their stored rows detection has read.
+
+    Each series' inter-arrival histogram is binned by period: `hits[i, p]`
+    counts intervals within period p's tolerance and `gap_sum[i, p]` sums
+    them; `intervals[i]` counts all intervals, so the rest fall outside
+    every period.
+    """
+
+    __slots__ = ("index", "first", "last", "count", "amount_sum", "last_amount", "merchant", "category",
+                 "intervals", "hits", "gap_sum", "period", "touched", "rows", "checkpoint", "newest_day",
+                 "interleaved")
+
+    def __init__(self):
+        self.index: Dict[tuple, int] = {}
+        self.first = np.empty(0, dtype=np.int64)
+        self.last = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.amount_sum = np.empty(0)
+        self.last_amount = np.empty(0)
+        self.merchant = np.empty(0, dtype=object)
+        self.category = np.empty(0, dtype=object)
+        self.intervals = np.empty(0, dtype=np.int64)
+        self.hits = np.empty((0, len(PERIODS)), dtype=np.int64)
+        self.gap_sum = np.empty((0, len(PERIODS)))
+        # Index into PERIOD_NAMES of each series' period, -1 if not recurring; rescored only when touched
+        self.period = np.empty(0, dtype=np.int8)
+        self.touched = np.empty(0, dtype=np.int64)
+        self.rows = 0
+        # (date, amount) of the last consumed row, to notice a cleared and refilled store
+        self.checkpoint: Optional[tuple] = None
+        self.newest_day: Optional[int] = None
+        self.interleaved = False
+
+    def grow(self, added: int):
+        """Room for `added` new series at the end of every array"""
+        for name in ("first", "last", "count", "amount_sum", "last_amount", "merchant", "category",
+                     "intervals", "hits", "gap_sum", "period"):
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate((values, np.zeros((added,) + values.shape[1:], dtype=values.dtype))))
+        self.period[-added:] = -1
+
+    def continues(self, frame: pd.DataFrame) -> bool:
+        """Whether `frame` is the history this state consumed, possibly with rows appended"""
+        if len(frame) < self.rows:
+            return False
+        return self.rows == 0 or _row_signature(frame, self.rows - 1) == self.checkpoint
+
+
+def _row_signature(frame: pd.DataFrame, row: int) -> tuple:
+    return (frame["date"].iat[row], float(frame["amount"].iat[row]))
+
+
+def _bands(amounts: np.ndarray, width: float = SUBSCRIPTION_AMOUNT_BAND) -> np.ndarray:
+    return np.floor(np.log(amounts) / np.log1p(width)).astype(np.int64)
+
+
+def _add_months(day: int, months: int) -> int:
+    date = pd.Timestamp(day, unit="D") + pd.DateOffset(months=months)
+    return int(date.value // 86_400_000_000_000)
+
+
+def _day_label(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+class SubscriptionDetector:
+    """Incremental recurring-charge detection per user over the transaction store"""
+
+    def __init__(self, store: TransactionStore = transaction_store):
+        self.store = store
+        self._states = TTLStore(max_entries=SUBSCRIPTION_CACHED_USERS, ttl_seconds=SUBSCRIPTION_STATE_TTL_SECONDS)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, user_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _observe(self, state: SubscriptionState, frame: pd.DataFrame):
+        """Fold new rows into the state's series"""
+        if not len(frame):
+            return
+        state.rows += len(frame)
+        state.checkpoint = _row_signature(frame, len(frame) - 1)
+        dates = frame["date"].to_numpy()
+        amounts = frame["amount"].to_numpy()
+        charges = (amounts > 0) & ~np.isnat(dates)
+        if not charges.any():
+            return
+        days = dates[charges].astype("datetime64[D]").astype(np.int64)
+        amounts = amounts[charges]
+        merchants = frame["merchant"].to_numpy(dtype=object)[charges]
+        categories = frame["category"].to_numpy(dtype=object)[charges]
+        names, name_labels = pd.factorize(merchant_categorizer.merchant_names(merchants), use_na_sentinel=False)
+        bands = _bands(amounts)
+        newest = int(days.max())
+        state.newest_day = newest if state.newest_day is None else max(state.newest_day, newest)
+
+        # Charges of one series next to each other, oldest first
+        order = np.lexsort((days, bands, names))
+        days, amounts, names, bands = days[order], amounts[order], names[order], bands[order]
+        merchants, categories = merchants[order], categories[order]
+        starts = np.flatnonzero(np.r_[True, (names[1:] != names[:-1]) | (bands[1:] != bands[:-1])])
+        ends = np.r_[starts[1:], len(days)] - 1
+
+        # Series index of each group, new series appended at the end
+        keys = zip(name_labels[names[starts]].tolist(), bands[starts].tolist())
+        known = len(state.index)
+        series = np.fromiter((state.index.setdefault(key, len(state.index)) for key in keys), np.int64, len(starts))
+        existing = series < known
+        if len(state.index) > known:
+            state.grow(len(state.index) - known)
+        first, last = days[starts], days[ends]
+
+        # Intervals inside each group, plus the one joining it to charges already seen
+        within = np.ones(len(days), dtype=bool)
+        within[starts] = False
+        row_series = np.repeat(series, ends - starts + 1)
+        gaps = np.diff(days, prepend=0)[within]
+        gap_series = row_series[within]
+        old = series[existing]
+        after = first[existing] >= state.last[old]
+        before = last[existing] <= state.first[old]
+        if not (after | before).all():
+            # New charges fall inside a known span; the gaps around them are unknown
+            state.interleaved = True
+            return
+        joins = np.where(after, first[existing] - state.last[old], state.first[old] - last[existing])
+        gaps = np.concatenate((gaps, joins))
+        gap_series = np.concatenate((gap_series, old))
+
+        size = len(state.index)
+        state.intervals += np.bincount(gap_series, minlength=size)
+        rows, periods = np.nonzero(np.abs(gaps[:, None] - _PERIOD_DAYS) <= _PERIOD_TOLERANCE)
+        # One flat bin per (series, period)
+        bins = gap_series[rows] * len(PERIODS) + periods
+        state.hits += np.bincount(bins, minlength=size * len(PERIODS)).reshape(size, -1)
+        state.gap_sum += np.bincount(bins, weights=gaps[rows], minlength=size * len(PERIODS)).reshape(size, -1)
+
+        fresh = series[~existing]
+        state.first[fresh] = first[~existing]
+        state.last[fresh] = last[~existing]
+        state.first[old] = np.minimum(state.first[old], first[existing])
+        newer = np.r_[np.ones(len(fresh), dtype=bool), after]
+        latest = np.r_[fresh, old][newer]
+        latest_rows = np.r_[ends[~existing], ends[existing]][newer]
+        state.last[latest] = days[latest_rows]
+        state.last_amount[latest] = amounts[latest_rows]
+        state.merchant[latest] = merchants[latest_rows]
+        state.category[latest] = categories[latest_rows]
+        state.count[series] += ends - starts + 1
+        state.amount_sum[series] += np.add.reduceat(amounts, starts)
+        state.touched = np.union1d(state.touched, series)
+        metrics.inc("subscription_detector_rows_total", int(charges.sum()))
+
+    def _rescore(self, state: SubscriptionState):
+        """Best period of each touched series: the one most of its intervals match, if enough do"""
+        touched = state.touched
+        if not len(touched):
+            return
+        total = np.maximum(state.intervals[touched], 1)[:, None]
+        share = state.hits[touched] / total
+        eligible = (share >= SUBSCRIPTION_MIN_REGULARITY) & (state.count[touched][:, None] >= _PERIOD_FEWEST)
+        share = np.where(eligible, share, -1)
+        best = share.argmax(axis=1)
+        state.period[touched] = np.where(eligible.any(axis=1), best, -1)
+        state.touched = np.empty(0, dtype=np.int64)
+
+    def _report(self, state: SubscriptionState, as_of: Optional[str] = None) -> Dict[str, Any]:
+        today = int(np.datetime64(as_of, "D").astype(np.int64)) if as_of else state.newest_day
+        self._rescore(state)
+        subscriptions: List[Dict[str, Any]] = []
+        for i in np.flatnonzero(state.period >= 0).tolist():
+            p = int(state.period[i])
+            name = PERIOD_NAMES[p]
+            _, tolerance, months, _ = PERIODS[name]
+            interval = float(state.gap_sum[i, p] / state.hits[i, p])
+            last_day, amount, count = int(state.last[i]), float(state.last_amount[i]), int(state.count[i])
+            expected = _add_months(last_day, months) if months else last_day + round(interval)
+            subscriptions.append({
+                "merchant": str(state.merchant[i]),
+                "category": str(state.category[i]),
+                "period": name,
+                "amount": round(amount, 2),
+                "average_amount": round(float(state.amount_sum[i]) / count, 2),
+                "monthly_cost": round(amount * DAYS_PER_MONTH / interval, 2),
+                "occurrences": count,
+                "first_charge": _day_label(state.first[i]),
+                "last_charge": _day_label(last_day),
+                "next_expected": _day_label(expected),
+                "regularity": round(float(state.hits[i, p] / state.intervals[i]), 2),
+                "active": today is not None and today <= expected + tolerance + SUBSCRIPTION_GRACE_DAYS,
+            })
+        subscriptions.sort(key=lambda entry: (not entry["active"], -entry["monthly_cost"]))
+        active = [entry for entry in subscriptions if entry["active"]]
+        monthly_total = sum(entry["monthly_cost"] for entry in active)
+        return {
+            "as_of": _day_label(today) if today is not None else None,
+            "active_count": len(active),
+            "monthly_total": round(monthly_total, 2),
+            "annual_total": round(monthly_total * 12, 2),
+            "subscriptions": subscriptions,
+        }
+
+    def detect_frame(self, frame: pd.DataFrame, as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Recurring charges in a columnar history (date, amount, category, merchant), in one pass"""
+        state = SubscriptionState()
+        self._observe(state, frame)
+        return self._report(state, as_of)
+
+    def detect(self, user_id: str, as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Recurring charges in a user's stored transactions, reading only rows added since the last call"""
+        with self._lock(user_id):
+            frame = self.store.frame(user_id)
+            state = self._states.get(user_id)
+            if state is None or not state.continues(frame):
+                state = SubscriptionState()
+            self._observe(state, frame.iloc[state.rows:])
+            if state.interleaved:
+                state = SubscriptionState()
+                self._observe(state, frame)
+                metrics.inc("subscription_detector_rescans_total")
+            self._states.set(user_id, state)
+            return self._report(state, as_of)
+
+    def forget(self, user_id: str):
+        self._states.pop(user_id)
+
+
+def subscription_recommendation(subscriptions: Optional[Dict[str, Any]]) -> str:
+    """One recommendation naming the user's largest active subscriptions"""
+    active = [entry for entry in (subscriptions or {}).get("subscriptions", []) if entry["active"]]
+    if not active:
+        return "Review subscription services for unused items"
+    named = ", ".join(f"{entry['merchant']} ${entry['amount']:,.2f}/{PERIOD_UNITS[entry['period']]}" for entry in active[:3])
+    counted = f"{len(active)} active subscriptions cost" if len(active) > 1 else "1 active subscription costs"
+    return (f"{counted} ${subscriptions['monthly_total']:,.0f} a month "
+            f"({named}); cancel any you no longer use")
+
+
+# Shared detector over the transaction store
+subscription_detector = SubscriptionDetector()
@@ -0,0 +1,373 @@
+"""
+Streaming import of bank exports (CSV, OFX, QIF) into the transaction store.
+
+Parsers are generators over the decoded text stream and yield one raw
+record (date, amount, description, ...) at a time. Records are grouped into
+batches of TRANSACTION_IMPORT_BATCH_ROWS, and each batch is normalized in
+vectorized passes:
+- dates in any supported format become datetime64
+- amounts with currency symbols, thousands separators or parentheses become
+  floats, with outflows positive
+- descriptions become merchant names
+- rows without a category are categorized from their merchant
+  (merchant_categorizer.py, including the importing user's overrides)
+
+Each batch is then deduplicated and appended to the store as one chunk,
+and its new rows are scored for unusual spending (anomaly_detector.py).
+Memory depends on the batch size, not on the export's size.
+
+A row's fingerprint is a hash of the bank's transaction id when the format
+has one (OFX FITID, CSV id columns). Otherwise it hashes date, amount in
+cents, description and the row's occurrence number among identical rows, so
+two genuine identical coffees on one day both import, and re-importing an
+overlapping export adds nothing. Occurrence counts are kept only for dates
+within TRANSACTION_DEDUP_WINDOW_DAYS of the current batch's dates, which
+bounds them for exports in date order, oldest or newest first.
+
+Imports for one user run one at a time, so two concurrent uploads of the
+same export cannot both add its rows.
+"""
+
+import csv
+import io
+import os
+import re
+import time
+from itertools import islice
+from operator import itemgetter
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from anomaly_detector import AnomalyDetector, anomaly_detector
+from merchant_categorizer import merchant_categorizer
+from metrics import metrics
+from spending_analytics import DEFAULT_CATEGORY, UNKNOWN_MERCHANT
+from transaction_store import FingerprintIndex, TransactionStore, transaction_store
+
+TRANSACTION_IMPORT_BATCH_ROWS = int(os.environ.get('TRANSACTION_IMPORT_BATCH_ROWS', 50000))
+TRANSACTION_DEDUP_WINDOW_DAYS = int(os.environ.get('TRANSACTION_DEDUP_WINDOW_DAYS', 7))
+
+FORMATS = ("csv", "ofx", "qif")
+READ_BLOCK_CHARS = 1 << 16
+# Rows scanned for a CSV header before giving up
+CSV_HEADER_SCAN_ROWS = 20
+
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "trans. date", "booking date", "value date"),
+    "amount": ("amount", "transaction amount", "amount (usd)", "value"),
+    "debit": ("debit", "debit amount", "withdrawal", "withdrawals", "money out", "paid out"),
+    "credit": ("credit", "credit amount", "deposit", "deposits", "money in", "paid in"),
+    "description": ("description", "payee", "merchant", "name", "details", "narrative",
+                    "original description", "transaction description", "memo"),
+    "category": ("category",),
+    "id": ("transaction id", "id", "reference", "fitid"),
+}
+OFX_FIELDS = {"DTPOSTED": "date", "TRNAMT": "amount", "NAME": "description", "MEMO": "memo", "FITID": "id"}
+QIF_FIELDS = {"D": "date", "T": "amount", "U": "amount", "P": "description", "M": "memo", "L": "category"}
+RECORD_FIELDS = ("date", "amount", "debit", "credit", "description", "memo", "category", "id")
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+_NOT_NUMERIC = r"[^0-9.\-]"
+_WHITESPACE = r"\s+"
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(head: bytes, filename: Optional[str] = None) -> str:
+    """Export format from the file name's extension, else from its first bytes"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in FORMATS:
+        return extension
+    text = head.lstrip(b"\xef\xbb\xbf \r\n\t").upper()
+    if text.startswith(b"OFXHEADER") or b"<OFX>" in text:
+        return "ofx"
+    if text.startswith(b"!TYPE") or text.startswith(b"!ACCOUNT") or text.startswith(b"!OPTION"):
+        return "qif"
+    return "csv"
+
+
+def parse_csv(text: io.TextIOBase) -> Iterator[Dict[str, str]]:
+    """Records from a CSV export whose header names a date and an amount (or debit/credit) column"""
+    reader = csv.reader(text)
+    columns: Dict[str, int] = {}
+    for row in islice(reader, CSV_HEADER_SCAN_ROWS):
+        names = [cell.strip().lower() for cell in row]
+        found = {field: names.index(name) for field, options in CSV_COLUMNS.items()
+                 for name in reversed(options) if name in names}
+        if "date" in found and ("amount" in found or "debit" in found or "credit" in found):
+            columns = found
+            break
+    if not columns:
+        raise ImportFormatError("CSV export has no header with a date and an amount column")
+    fields, positions = tuple(columns), tuple(columns.values())
+    pick = itemgetter(*positions) if len(positions) > 1 else lambda row: (row[positions[0]],)
+    width = max(positions) + 1
+    for row in reader:
+        if len(row) >= width:
+            yield dict(zip(fields, pick(row)))
+        elif row:
+            yield {field: row[i] for field, i in columns.items() if i < len(row)}
+
+
+def parse_ofx(text: io.TextIOBase) -> Iterator[Dict[str, str]]:
+    """Records from the STMTTRN elements of an OFX export, SGML (v1) or XML (v2)"""
+    record: Optional[Dict[str, str]] = None
+    buffer = ""
+    while True:
+        block = text.read(READ_BLOCK_CHARS)
+        buffer += block
+        # Keep a possibly incomplete trailing tag for the next block
+        cut = buffer.rfind("<") if block else len(buffer)
+        body, buffer = buffer[:cut], buffer[cut:]
+        for closing, tag, value in _OFX_TAG.findall(body):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and record is not None:
+                    yield record
+                record = None if closing else {}
+            elif record is not None and not closing and tag in OFX_FIELDS:
+                record[OFX_FIELDS[tag]] = value.strip()
+        if not block:
+            return
+
+
+def parse_qif(text: io.TextIOBase) -> Iterator[Dict[str, str]]:
+    """Records from a QIF export: one field per line, "^" ends a transaction"""
+    record: Dict[str, str] = {}
+    for line in text:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == "^":
+            if record:
+                yield record
+            record = {}
+        elif code in QIF_FIELDS and QIF_FIELDS[code] not in record:
+            record[QIF_FIELDS[code]] = value
+    if record:
+        yield record
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx, "qif": parse_qif}
+
+
+def _per_value(values: pd.Series, parse) -> pd.Series:
+    """Apply a column parser once per distinct value; exports repeat dates, payees and categories"""
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    parsed = parse(pd.Series(uniques, dtype=object))
+    # Missing values (code -1) take the extra slot past the end, which reindexing leaves missing
+    parsed = parsed.reindex(np.arange(len(uniques) + 1))
+    return parsed.take(np.where(codes < 0, len(uniques), codes)).set_axis(values.index)
+
+
+def _parse_amounts(values: pd.Series) -> pd.Series:
+    """Floats from bank amount strings: "$1,234.50", "(45.00)" and "45.00-" are handled"""
+    text = values.to_numpy(dtype=object)
+    numbers = pd.to_numeric(pd.Series(text, index=values.index), errors="coerce").astype(np.float64)
+    # Only values that are not plain numbers go through the string cleanup
+    odd = numbers.isna().to_numpy() & pd.notna(text)
+    if odd.any():
+        cleaned = pd.Series(text[odd], dtype=object).str.strip()
+        negative = (cleaned.str.startswith("(") | cleaned.str.endswith("-")).fillna(False).to_numpy(dtype=bool)
+        parsed = pd.to_numeric(cleaned.str.replace(_NOT_NUMERIC, "", regex=True).str.rstrip("-"), errors="coerce")
+        parsed = parsed.to_numpy(dtype=np.float64)
+        numbers[odd] = np.where(negative, -np.abs(parsed), parsed)
+    return numbers
+
+
+def _strip(values: pd.Series) -> pd.Series:
+    text = values.astype(str).str.strip()
+    return text.mask(text == "")
+
+
+def _text(values: pd.Series) -> pd.Series:
+    """Stripped strings with blanks as missing"""
+    return _per_value(values, _strip)
+
+
+def _merchant_names(values: pd.Series) -> pd.Series:
+    return _strip(values).str.replace(_WHITESPACE, " ", regex=True)
+
+
+def _dates(text: pd.Series, dayfirst: bool) -> pd.Series:
+    text = text.astype(str).str.strip()
+    # QIF writes the year after an apostrophe, sometimes space-padded
+    text = text.str.replace(r"'\s*(\d)$", r"/0\1", regex=True).str.replace("'", "/", regex=False)
+    # Offsets ("Z", "+02:00") are converted to UTC and dropped, so they mix with naive dates
+    dates = pd.to_datetime(text, errors="coerce", format="ISO8601", utc=True).dt.tz_convert(None)
+    slash = ("%d/%m/%Y", "%d/%m/%y") if dayfirst else ("%m/%d/%Y", "%m/%d/%y")
+    for date_format in slash + ("%d.%m.%Y", "%Y%m%d"):
+        missing = dates.isna()
+        if not missing.any():
+            break
+        candidates = text[missing]
+        if date_format == "%Y%m%d":
+            candidates = candidates.str.slice(0, 8)
+        dates = dates.fillna(pd.to_datetime(candidates, errors="coerce", format=date_format))
+    return dates.astype("datetime64[s]")
+
+
+def _parse_dates(values: pd.Series, dayfirst: bool = False) -> pd.Series:
+    """Dates in ISO, US or day-first, two-digit-year, OFX (YYYYMMDD...) and QIF (1/15'24) forms"""
+    return _per_value(values, lambda text: _dates(text, dayfirst))
+
+
+class OccurrenceCounter:
+    """How many times each (date, amount, description) row has been seen, for dates near the current batch"""
+
+    def __init__(self, window_days: int = TRANSACTION_DEDUP_WINDOW_DAYS):
+        self.window_days = window_days
+        # day -> {key: rows seen}; a key hashes its day, so each key lives under one day
+        self._seen: Dict[int, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._seen.values())
+
+    def number(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Occurrence number (0, 1, ...) of each row's key, counting earlier batches"""
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        occurrence = pd.Series(inverse).groupby(inverse, sort=False).cumcount().to_numpy()
+        unique_days = days[first].tolist()
+        unique = unique.tolist()
+        seen = self._seen
+        # Only this batch's keys are looked up, so the cost does not grow with what was seen before
+        prior = np.fromiter((seen.get(day, {}).get(key, 0) for key, day in zip(unique, unique_days)),
+                            dtype=np.int64, count=len(unique))
+        occurrence = occurrence + prior[inverse]
+        totals = (prior + np.bincount(inverse, minlength=len(unique))).tolist()
+        for key, day, total in zip(unique, unique_days, totals):
+            seen.setdefault(day, {})[key] = total
+        # Keep only dates within the window of this batch, whichever way the export is ordered
+        low, high = int(days.min()) - self.window_days, int(days.max()) + self.window_days
+        for day in [day for day in seen if day < low or day > high]:
+            del seen[day]
+        return occurrence
+
+
+def _hash(columns: Dict[str, Any]) -> np.ndarray:
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy(copy=True)
+
+
+def normalize_batch(
+    records: List[Dict[str, str]],
+    counter: OccurrenceCounter,
+    debits_positive: bool = False,
+    dayfirst: bool = False,
+    user_id: Optional[str] = None,
+) -> Tuple[pd.DataFrame, np.ndarray, int]:
+    """Store-ready columns, fingerprints and the number of rejected records for one batch"""
+    raw = pd.DataFrame.from_records(records, columns=RECORD_FIELDS)
+    # Bank sign convention (outflows negative) unless the export writes debits positive
+    amount = _parse_amounts(raw["amount"])
+    split = amount.isna() & (raw["debit"].notna() | raw["credit"].notna())
+    if split.any():
+        debit = _parse_amounts(raw.loc[split, "debit"]).abs().fillna(0)
+        credit = _parse_amounts(raw.loc[split, "credit"]).abs().fillna(0)
+        amount[split] = debit - credit if debits_positive else credit - debit
+    dates = _parse_dates(raw["date"], dayfirst)
+    valid = (dates.notna() & amount.notna()).to_numpy()
+    raw, amount, dates = raw[valid], amount[valid], dates[valid]
+
+    description = _per_value(raw["description"], _merchant_names)
+    if description.isna().any():
+        description = description.fillna(_per_value(raw["memo"], _merchant_names))
+    description = description.fillna(UNKNOWN_MERCHANT)
+    # Rows the bank left uncategorized are categorized from the merchant
+    category = _text(raw["category"])
+    uncategorized = category.isna().to_numpy()
+    if uncategorized.any():
+        category = category.astype(object)
+        category[uncategorized] = merchant_categorizer.categorize_many(
+            description[uncategorized].to_numpy(dtype=object), user_id
+        )
+    frame = pd.DataFrame({
+        "date": dates.to_numpy(),
+        # Stored as spending: outflows positive, income and refunds negative
+        "amount": (amount if debits_positive else -amount).to_numpy(),
+        "category": category.fillna(DEFAULT_CATEGORY).astype("category").to_numpy(),
+        "merchant": description.astype("category").to_numpy(),
+    })
+
+    days = dates.to_numpy().view(np.int64) // 86400
+    cents = np.round(frame["amount"].to_numpy() * 100).astype(np.int64)
+    keys = _hash({"day": days, "cents": cents, "description": _per_value(description, lambda text: text.str.lower()).to_numpy()})
+    fingerprints = _hash({"key": keys, "occurrence": counter.number(keys, days)})
+    bank_ids = raw["id"].notna().to_numpy()
+    if bank_ids.any():
+        fingerprints[bank_ids] = _hash({"id": "id:" + raw["id"][bank_ids].astype(str).to_numpy()})
+    return frame, fingerprints, int((~valid).sum())
+
+
+def _batches(records: Iterator[Dict[str, str]], size: int) -> Iterator[List[Dict[str, str]]]:
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_transactions(
+    stream: BinaryIO,
+    user_id: str,
+    export_format: Optional[str] = None,
+    filename: Optional[str] = None,
+    debits_positive: bool = False,
+    dayfirst: bool = False,
+    store: TransactionStore = transaction_store,
+    batch_rows: int = TRANSACTION_IMPORT_BATCH_ROWS,
+    detector: Optional[AnomalyDetector] = anomaly_detector,
+) -> Dict[str, Any]:
+    """Parse, normalize, deduplicate and store a binary export stream; returns import stats"""
+    started = time.perf_counter()
+    buffered = stream if hasattr(stream, "peek") else io.BufferedReader(stream)
+    export_format = export_format or detect_format(buffered.peek(512)[:512], filename)
+    if export_format not in PARSERS:
+        raise ImportFormatError(f"Unsupported export format: {export_format}")
+    text = io.TextIOWrapper(buffered, encoding="utf-8-sig", errors="replace", newline="")
+
+    counter = OccurrenceCounter()
+    rows = imported = duplicates = rejected = alerts = 0
+    # The index must not go stale while another import of this user's rows appends
+    with store.import_lock(user_id):
+        index: FingerprintIndex = store.fingerprint_index(user_id)
+        for batch in _batches(PARSERS[export_format](text), batch_rows):
+            rows += len(batch)
+            frame, fingerprints, batch_rejected = normalize_batch(batch, counter, debits_positive, dayfirst, user_id)
+            rejected += batch_rejected
+            # New rows: not stored before, and the first of any repeats within the batch
+            _, first = np.unique(fingerprints, return_index=True)
+            fresh = np.zeros(len(fingerprints), dtype=bool)
+            fresh[first] = True
+            fresh &= ~index.contains(fingerprints)
+            duplicates += int(len(fingerprints) - fresh.sum())
+            if fresh.any():
+                added = frame[fresh].reset_index(drop=True)
+                store.append(user_id, added, fingerprints[fresh])
+                index.add(fingerprints[fresh])
+                imported += len(added)
+                if detector is not None:
+                    alerts += len(detector.observe(user_id, added))
+
+    seconds = time.perf_counter() - started
+    rows_per_second = rows / seconds if seconds > 0 else 0.0
+    metrics.inc("transaction_import_rows_total", imported, format=export_format, result="imported")
+    metrics.inc("transaction_import_rows_total", duplicates, format=export_format, result="duplicate")
+    metrics.inc("transaction_import_rows_total", rejected, format=export_format, result="rejected")
+    metrics.set_gauge("transaction_import_rows_per_second", rows_per_second, format=export_format)
+    return {
+        "format": export_format,
+        "rows_read": rows,
+        "imported": imported,
+        "duplicates": duplicates,
+        "rejected": rejected,
+        "alerts": alerts,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_per_second),
+    }
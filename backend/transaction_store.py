@@ -0,0 +1,205 @@
+"""
+Per-user columnar transaction store.
+
+Each user's transactions are a directory of append-only chunk files, one
+per write batch. A chunk holds one array per column: date (seconds since
+the epoch), amount, category and merchant (as codes into the chunk's own
+label arrays), and a 64-bit fingerprint per row for deduplication. Reading a
+user's transactions concatenates the chunks into the DataFrame that
+spending_analytics works on. Once a user has more than
+TRANSACTION_STORE_MAX_CHUNKS chunks, they are merged into one on the next
+read.
+
+Imports deduplicate against a FingerprintIndex. It holds a few sorted
+uint64 runs and merges runs of similar size as batches arrive, so checking
+and inserting a batch costs O(batch x log rows). The index holds 8 bytes per
+stored transaction, however the rows arrive.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import metrics
+from spending_analytics import empty_frame
+from ttl_store import TTLStore
+
+STATE_DIR = Path(os.environ.get('PECUNIA_STATE_DIR', Path(__file__).parent / 'var'))
+TRANSACTIONS_DIR = os.environ.get('TRANSACTIONS_DIR', str(STATE_DIR / 'transactions'))
+TRANSACTION_STORE_MAX_CHUNKS = int(os.environ.get('TRANSACTION_STORE_MAX_CHUNKS', 32))
+# Users whose transactions stay loaded between reads
+TRANSACTION_STORE_CACHED_USERS = int(os.environ.get('TRANSACTION_STORE_CACHED_USERS', 64))
+TRANSACTION_STORE_CACHE_TTL_SECONDS = float(os.environ.get('TRANSACTION_STORE_CACHE_TTL_SECONDS', 600))
+
+
+class FingerprintIndex:
+    """Set of uint64 fingerprints as sorted runs, merged like a log-structured tree"""
+
+    def __init__(self, fingerprints: Optional[np.ndarray] = None):
+        self._runs: List[np.ndarray] = []
+        if fingerprints is not None and len(fingerprints):
+            self._runs.append(np.unique(fingerprints))
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(fingerprints), dtype=bool)
+        for run in self._runs:
+            positions = np.minimum(np.searchsorted(run, fingerprints), len(run) - 1)
+            found |= run[positions] == fingerprints
+        return found
+
+    def add(self, fingerprints: np.ndarray):
+        """Insert fingerprints known not to be present"""
+        run = np.sort(fingerprints)
+        # Merge while the newest run is at least half the size of the one before it
+        while self._runs and len(self._runs[-1]) <= 2 * len(run):
+            run = np.sort(np.concatenate((self._runs.pop(), run)), kind="mergesort")
+        self._runs.append(run)
+
+
+def _user_dir_name(user_id: str) -> str:
+    return hashlib.sha256(user_id.encode()).hexdigest()[:32]
+
+
+class TransactionStore:
+    """Append-only columnar chunks per user, read back as one DataFrame"""
+
+    def __init__(self, root: str = TRANSACTIONS_DIR, max_chunks: int = TRANSACTION_STORE_MAX_CHUNKS):
+        self.root = Path(root)
+        self.max_chunks = max_chunks
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._import_locks: Dict[str, threading.Lock] = {}
+        self._frames = TTLStore(max_entries=TRANSACTION_STORE_CACHED_USERS, ttl_seconds=TRANSACTION_STORE_CACHE_TTL_SECONDS)
+
+    def _lock(self, user_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def import_lock(self, user_id: str) -> threading.Lock:
+        """Held for a whole import, so concurrent imports for one user dedup against each other"""
+        with self._locks_guard:
+            return self._import_locks.setdefault(user_id, threading.Lock())
+
+    def _dir(self, user_id: str) -> Path:
+        return self.root / _user_dir_name(user_id)
+
+    def _chunks(self, user_id: str) -> List[Path]:
+        directory = self._dir(user_id)
+        return sorted(directory.glob("chunk-*.npz")) if directory.exists() else []
+
+    def append(self, user_id: str, frame: pd.DataFrame, fingerprints: np.ndarray):
+        """Write one batch of transactions (date, amount, category, merchant) as a new chunk"""
+        if not len(frame):
+            return
+        with self._lock(user_id):
+            directory = self._dir(user_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            chunks = self._chunks(user_id)
+            sequence = int(chunks[-1].stem.split("-")[1]) + 1 if chunks else 0
+            self._write_chunk(directory / f"chunk-{sequence:08d}.npz", frame, fingerprints)
+            self._frames.pop(user_id)
+        metrics.inc("transactions_stored_total", len(frame))
+
+    @staticmethod
+    def _write_chunk(path: Path, frame: pd.DataFrame, fingerprints: np.ndarray):
+        category = frame["category"].astype("category")
+        merchant = frame["merchant"].astype("category")
+        dates = frame["date"].to_numpy().astype("datetime64[s]").view(np.int64)
+        partial = path.with_suffix(".tmp")
+        with open(partial, "wb") as f:
+            np.savez(
+                f,
+                date=dates,
+                amount=frame["amount"].to_numpy(dtype=np.float64),
+                category=category.cat.codes.to_numpy(),
+                category_labels=category.cat.categories.to_numpy(dtype=str),
+                merchant=merchant.cat.codes.to_numpy(),
+                merchant_labels=merchant.cat.categories.to_numpy(dtype=str),
+                fingerprint=np.asarray(fingerprints, dtype=np.uint64),
+            )
+        # Readers only ever see complete chunks
+        os.replace(partial, path)
+
+    @staticmethod
+    def _read_chunk(path: Path) -> Tuple[pd.DataFrame, np.ndarray]:
+        with np.load(path, allow_pickle=False) as chunk:
+            frame = pd.DataFrame({
+                # NaT is stored as int64 min, which is what the view reads back as NaT
+                "date": chunk["date"].view("datetime64[s]"),
+                "amount": chunk["amount"],
+                "category": pd.Categorical.from_codes(chunk["category"], chunk["category_labels"]),
+                "merchant": pd.Categorical.from_codes(chunk["merchant"], chunk["merchant_labels"]),
+            })
+            return frame, chunk["fingerprint"]
+
+    def _load(self, user_id: str) -> Tuple[pd.DataFrame, np.ndarray]:
+        chunks = self._chunks(user_id)
+        if not chunks:
+            return empty_frame(), np.empty(0, dtype=np.uint64)
+        parts = [self._read_chunk(path) for path in chunks]
+        frames = [frame for frame, _ in parts]
+        frame = frames[0] if len(frames) == 1 else pd.DataFrame({
+            "date": np.concatenate([f["date"].to_numpy() for f in frames]),
+            "amount": np.concatenate([f["amount"].to_numpy() for f in frames]),
+            "category": pd.api.types.union_categoricals([f["category"] for f in frames]),
+            "merchant": pd.api.types.union_categoricals([f["merchant"] for f in frames]),
+        })
+        fingerprints = np.concatenate([fp for _, fp in parts])
+        if len(chunks) > self.max_chunks:
+            self._compact(user_id, chunks, frame, fingerprints)
+        return frame, fingerprints
+
+    def _compact(self, user_id: str, chunks: List[Path], frame: pd.DataFrame, fingerprints: np.ndarray):
+        """Replace many chunks with one, numbered like the last so later chunks sort after it"""
+        sequence = int(chunks[-1].stem.split("-")[1])
+        merged = self._dir(user_id) / f"chunk-{sequence:08d}-merged.npz"
+        self._write_chunk(merged, frame, fingerprints)
+        for path in chunks:
+            path.unlink()
+        metrics.inc("transaction_store_compactions_total")
+
+    def frame(self, user_id: str) -> pd.DataFrame:
+        """All of a user's transactions as columns"""
+        cached = self._frames.get(user_id)
+        if cached is not None:
+            return cached
+        with self._lock(user_id):
+            frame, _ = self._load(user_id)
+            self._frames.set(user_id, frame)
+        return frame
+
+    def spending(self, user_id: str) -> pd.DataFrame:
+        """A user's outflows; income, refunds and transfers in are stored as negative amounts"""
+        frame = self.frame(user_id)
+        return frame[frame["amount"].to_numpy() > 0].reset_index(drop=True)
+
+    def fingerprint_index(self, user_id: str) -> FingerprintIndex:
+        """Dedup index over everything already stored for the user"""
+        with self._lock(user_id):
+            runs = []
+            for path in self._chunks(user_id):
+                with np.load(path, allow_pickle=False) as chunk:
+                    runs.append(chunk["fingerprint"])
+        fingerprints = np.concatenate(runs) if runs else np.empty(0, dtype=np.uint64)
+        return FingerprintIndex(fingerprints)
+
+    def count(self, user_id: str) -> int:
+        return len(self.frame(user_id))
+
+    def clear(self, user_id: str):
+        with self._lock(user_id):
+            shutil.rmtree(self._dir(user_id), ignore_errors=True)
+            self._frames.pop(user_id)
+
+
+# Shared store; chunks live under TRANSACTIONS_DIR
+transaction_store = TransactionStore()
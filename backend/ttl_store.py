@@ -0,0 +1,100 @@
+"""
+Bounded in-memory key/value store with per-entry expiry and LRU eviction.
+
+Entries are bounded by count and, when given a `sizeof` function, by their
+total size as well.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+
+class TTLStore:
+    """Dict-like store that drops entries after `ttl_seconds` and evicts the
+    least recently used entry once `max_entries` is reached, or once the
+    entries' `sizeof` total exceeds `max_bytes`"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key: Hashable) -> Any:
+        _, value, size = self._data.pop(key)
+        self._bytes -= size
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it recently used"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value, _ = item
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Insert or replace an entry, evicting the oldest when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1
+            ):
+                self._drop(next(iter(self._data)))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value"""
+        with self._lock:
+            return self._drop(key) if key in self._data else default
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry, returning how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                self._drop(key)
+            return len(expired)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Snapshot of live entries, least recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            return iter([(key, value) for key, (expires_at, value, _) in self._data.items() if expires_at > now])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        """Total `sizeof` of the entries held"""
+        return self._bytes
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
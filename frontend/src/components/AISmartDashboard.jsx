@@ -159,6 +159,17 @@ const AISmartDashboard = () => {
       {/* Smart Alerts */}
       {smartInsights?.alerts && (
         <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+          {smartInsights.alerts.spending_alerts?.map((alert, index) => (
+            <Alert key={`spending-${index}`} className="border-l-4 border-l-red-400">
+              <AlertTriangle className="h-4 w-4" />
+              <AlertDescription>
+                <strong>{alert.message}</strong>
+                <br />
+                <span className="text-sm text-gray-600">{alert.action}</span>
+              </AlertDescription>
+            </Alert>
+          ))}
+
           {smartInsights.alerts.budget_alerts?.map((alert, index) => (
             <Alert key={index} className="border-l-4 border-l-yellow-400">
               <AlertTriangle className="h-4 w-4" />
@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef } from 'react';
 import { useToast } from '../hooks/use-toast';
 
 const AuthContext = createContext();
@@ -19,6 +19,9 @@ export const AuthProvider = ({ children }) => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [onboardingComplete, setOnboardingComplete] = useState(false);
   const { toast } = useToast();
+  // Idempotency key per registration payload, kept until it succeeds so a retry
+  // after a failed fetch replays the original result instead of re-registering
+  const registrationKeys = useRef(new Map());
 
   // Check if user is authenticated on app load
   useEffect(() => {
@@ -60,20 +63,31 @@ export const AuthProvider = ({ children }) => {
   }, []);
 
   const register = async (userData) => {
+    const body = JSON.stringify(userData);
+    if (!registrationKeys.current.has(body)) {
+      registrationKeys.current.set(
+        body,
+        window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+      );
+    }
+
     try {
       const response = await fetch(`${BACKEND_URL}/api/auth/register`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Idempotency-Key': registrationKeys.current.get(body),
         },
-        body: JSON.stringify(userData),
+        body,
       });
 
       const data = await response.json();
 
       if (!response.ok) {
+        registrationKeys.current.delete(body);
         throw new Error(data.detail || 'Registration failed');
       }
+      registrationKeys.current.delete(body);
 
       // Store token and update state
       localStorage.setItem('pecunia_token', data.access_token);
@@ -60,6 +60,7 @@ const Dashboard = () => {
   const [loadingInsights, setLoadingInsights] = useState(false);
   const [smartMode, setSmartMode] = useState(false);
   const [showScoreBreakdown, setShowScoreBreakdown] = useState(false);
+  const [cashFlowForecast, setCashFlowForecast] = useState(null);
 
   // Load AI insights on component mount
   useEffect(() => {
@@ -82,6 +83,13 @@ const Dashboard = () => {
         liabilities: dashboard.liabilities.reduce((acc, item) => ({ ...acc, [item.name]: item.value }), {})
       });
 
+      // Checking balance projected over the next 12 months
+      const checking = dashboard.accounts.find(account => account.name === 'Checking');
+      const forecast = await aiService.getCashFlowForecast(checking ? checking.balance : 0);
+      if (forecast?.monthly?.length) {
+        setCashFlowForecast(forecast);
+      }
+
       // Get AI-powered dashboard insights
       const insights = await aiService.getDashboardInsights(dashboard);
       // Note: We're using the existing aiInsights from useAI context
@@ -523,6 +531,21 @@ const Dashboard = () => {
                         <span className="font-bold text-green-600">+$2,750</span>
                       </div>
                     </div>
+                    {cashFlowForecast && (
+                      <div className="pt-3 border-t border-gray-200 dark:border-gray-700 space-y-1">
+                        <div className="flex items-center justify-between">
+                          <span className="text-sm text-gray-600 dark:text-gray-400">Checking in 12 months</span>
+                          <span className="font-semibold text-gray-900 dark:text-white">
+                            ${Math.round(cashFlowForecast.monthly[cashFlowForecast.monthly.length - 1].balance).toLocaleString()}
+                          </span>
+                        </div>
+                        <p className={`text-xs ${cashFlowForecast.first_shortfall ? 'text-red-500' : 'text-gray-500 dark:text-gray-400'}`}>
+                          {cashFlowForecast.first_shortfall
+                            ? `Projected to go negative on ${cashFlowForecast.first_shortfall}`
+                            : `Lowest projected balance $${Math.round(cashFlowForecast.lowest_balance.balance).toLocaleString()} on ${cashFlowForecast.lowest_balance.date}`}
+                        </p>
+                      </div>
+                    )}
                     <Button 
                       size="sm" 
                       variant="outline" 
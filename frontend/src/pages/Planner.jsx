@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
@@ -45,6 +45,7 @@ import {
 import { mockData } from '../data/mockData';
 import { useToast } from '../hooks/use-toast';
 import { useAI } from '../contexts/AIContext';
+import aiService from '../services/aiService';
 
 const Planner = () => {
   const [selectedPlan, setSelectedPlan] = useState(null);
@@ -58,9 +59,24 @@ const Planner = () => {
   const [savedPlans, setSavedPlans] = useState([]);
   const [aiGeneratedPlans, setAiGeneratedPlans] = useState([]);
   const [generatingPlan, setGeneratingPlan] = useState(false);
+  const [cashFlowForecast, setCashFlowForecast] = useState(null);
   
   // AI integration
   const { createTravelPlan, userProfile } = useAI();
+
+  // Projected checking balance, so plans can be weighed against the leanest of the next 3 months
+  useEffect(() => {
+    const checking = mockData.dashboard.accounts.find(account => account.name === 'Checking');
+    aiService.getCashFlowForecast(checking ? checking.balance : 0).then(forecast => {
+      if (forecast?.monthly?.length) {
+        setCashFlowForecast(forecast);
+      }
+    });
+  }, []);
+
+  const leanestMonth = cashFlowForecast
+    ? cashFlowForecast.monthly.slice(0, 3).reduce((low, month) => (month.balance < low.balance ? month : low))
+    : null;
   
   // New plan state
   const [newPlan, setNewPlan] = useState({
@@ -869,6 +885,12 @@ const Planner = () => {
               <CalendarIcon size={16} />
               <span>Next 3 months</span>
             </div>
+            {leanestMonth && (
+              <div className="flex items-center gap-2">
+                <TrendingUp size={16} />
+                <span>Projected low: ${Math.round(leanestMonth.balance).toLocaleString()} ({leanestMonth.month})</span>
+              </div>
+            )}
             <div className="flex items-center gap-2">
               <Star size={16} />
               <span>Matches your vibe</span>
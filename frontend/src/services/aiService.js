@@ -9,6 +9,19 @@ class PecuniaAIService {
   constructor() {
     this.baseUrl = API_BASE_URL;
     this.userContext = this.loadUserContext();
+    // Idempotency keys of POSTs that have not succeeded yet, by request signature
+    this.pendingIdempotencyKeys = new Map();
+  }
+
+  getIdempotencyKey(signature) {
+    // Reuse the key until the request succeeds so a retry replays the original result
+    if (!this.pendingIdempotencyKeys.has(signature)) {
+      const key = window.crypto?.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      this.pendingIdempotencyKeys.set(signature, key);
+    }
+    return this.pendingIdempotencyKeys.get(signature);
   }
 
   loadUserContext() {
@@ -43,16 +56,29 @@ class PecuniaAIService {
       },
     };
 
+    // Stored transactions, alerts, forecasts and chat memory are keyed on the signed-in user
+    const token = localStorage.getItem('pecunia_token');
+    if (token) {
+      options.headers['Authorization'] = `Bearer ${token}`;
+    }
+
     if (data) {
       options.body = JSON.stringify(data);
     }
 
+    const signature = `${method} ${endpoint} ${options.body || ''}`;
+    if (method === 'POST') {
+      options.headers['Idempotency-Key'] = this.getIdempotencyKey(signature);
+    }
+
     try {
       const response = await fetch(url, options);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
-      return await response.json();
+      const result = await response.json();
+      this.pendingIdempotencyKeys.delete(signature);
+      return result;
     } catch (error) {
       console.error(`AI Service Error (${endpoint}):`, error);
       return this.getFallbackResponse(endpoint);
@@ -62,36 +88,48 @@ class PecuniaAIService {
   // ==============================================
   // COMPREHENSIVE FINANCIAL ANALYSIS
   // ==============================================
+  buildAnalysisRequest(customData = {}) {
+    return { ...this.userContext, ...customData };
+  }
+
   async getComprehensiveAnalysis(customData = {}) {
-    const requestData = { ...this.userContext, ...customData };
+    const requestData = this.buildAnalysisRequest(customData);
     return await this.makeRequest('/api/ai/comprehensive-analysis', requestData, 'POST');
   }
 
   // ==============================================
   // SMART BUDGET GENERATION
   // ==============================================
-  async generateSmartBudget(customData = {}) {
-    const requestData = {
+  buildBudgetRequest(customData = {}) {
+    return {
       monthly_income: this.userContext.monthly_income,
       expenses: this.userContext.expenses,
       goals: this.userContext.goals,
       location: this.userContext.location,
       ...customData
     };
+  }
+
+  async generateSmartBudget(customData = {}) {
+    const requestData = this.buildBudgetRequest(customData);
     return await this.makeRequest('/api/ai/smart-budget', requestData, 'POST');
   }
 
   // ==============================================
   // INVESTMENT STRATEGY
   // ==============================================
-  async generateInvestmentStrategy(customData = {}) {
-    const requestData = {
+  buildInvestmentRequest(customData = {}) {
+    return {
       investable_amount: this.userContext.monthly_income * 0.2, // 20% of income
       risk_tolerance: this.userContext.risk_tolerance,
       age: this.userContext.age,
       timeline: '10+ years',
       ...customData
     };
+  }
+
+  async generateInvestmentStrategy(customData = {}) {
+    const requestData = this.buildInvestmentRequest(customData);
     return await this.makeRequest('/api/ai/investment-strategy', requestData, 'POST');
   }
 
@@ -129,8 +167,8 @@ class PecuniaAIService {
   // ==============================================
   // COMPETITIVE INSIGHTS
   // ==============================================
-  async getCompetitiveInsights(customData = {}) {
-    const requestData = {
+  buildCompetitiveRequest(customData = {}) {
+    return {
       age: this.userContext.age,
       income: this.userContext.monthly_income * 12,
       net_worth: this.calculateNetWorth(),
@@ -138,6 +176,10 @@ class PecuniaAIService {
       location: this.userContext.location,
       ...customData
     };
+  }
+
+  async getCompetitiveInsights(customData = {}) {
+    const requestData = this.buildCompetitiveRequest(customData);
     return await this.makeRequest('/api/ai/competitive-insights', requestData, 'POST');
   }
 
@@ -243,18 +285,35 @@ class PecuniaAIService {
   // ==============================================
   // AUTOMATED FINANCIAL PLANNING
   // ==============================================
-  async createAutomatedPlan(planType = 'comprehensive') {
-    const [
-      analysis,
-      budget,
-      investments,
-      competitive
-    ] = await Promise.all([
+  async getFullPlan() {
+    // One AI call for all four sections; the profile is sent and paid for once
+    const plan = await this.makeRequest('/api/ai/full-plan', {
+      analysis: this.buildAnalysisRequest(),
+      budget: this.buildBudgetRequest(),
+      investment: this.buildInvestmentRequest(),
+      competitive: this.buildCompetitiveRequest()
+    }, 'POST');
+    if (plan.analysis && plan.budget && plan.investment && plan.competitive) {
+      return plan;
+    }
+
+    // Older backends or a failed combined call: one request per section
+    const [analysis, budget, investment, competitive] = await Promise.all([
       this.getComprehensiveAnalysis(),
       this.generateSmartBudget(),
       this.generateInvestmentStrategy(),
       this.getCompetitiveInsights()
     ]);
+    return { analysis, budget, investment, competitive, combined: false };
+  }
+
+  async createAutomatedPlan(planType = 'comprehensive') {
+    const {
+      analysis,
+      budget,
+      investment: investments,
+      competitive
+    } = await this.getFullPlan();
 
     return {
       plan_type: planType,
@@ -373,9 +432,15 @@ class PecuniaAIService {
     return await this.chatWithAI(message, pageData);
   }
 
+  async getCashFlowForecast(startingBalance = 0) {
+    return await this.makeRequest(`/api/forecast/cash-flow?balance=${encodeURIComponent(startingBalance)}`);
+  }
+
   async getSmartAlerts() {
     const analysis = await this.getComprehensiveAnalysis();
+    const spending = await this.makeRequest('/api/transactions/alerts');
     return {
+      spending_alerts: this.generateSpendingAlerts(spending),
       budget_alerts: this.generateBudgetAlerts(analysis),
       investment_alerts: this.generateInvestmentAlerts(analysis),
       goal_alerts: this.generateGoalAlerts(analysis),
@@ -383,6 +448,15 @@ class PecuniaAIService {
     };
   }
 
+  generateSpendingAlerts(spending) {
+    return (spending?.alerts || []).map(alert => ({
+      type: 'warning',
+      message: alert.message,
+      action: `Check this ${alert.category} charge was expected`,
+      priority: alert.score >= 5 ? 'high' : 'medium'
+    }));
+  }
+
   generateBudgetAlerts(analysis) {
     return [
       {
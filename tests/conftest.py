@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Backend modules are imported top-level, as server.py does; their state goes to a scratch directory
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("PECUNIA_STATE_DIR", tempfile.mkdtemp(prefix="pecunia-tests-"))
+os.environ.setdefault("MOCK_AI_LATENCY_SECONDS", "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One app lifespan for the whole run: shutting down leaves the drain controller draining"""
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
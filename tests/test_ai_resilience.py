@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from ai_resilience import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, CircuitOpenError, hedged
+
+
+def test_cancelling_the_caller_before_the_hedge_cancels_the_call():
+    started = []
+
+    async def call():
+        started.append(asyncio.current_task())
+        await asyncio.sleep(10)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hedged(call, hedge_after=5), 0.05)
+        await asyncio.sleep(0)
+        return [task.cancelled() for task in started]
+
+    assert asyncio.run(run()) == [True]
+
+
+def test_the_hedge_wins_when_the_first_call_stalls():
+    calls = []
+
+    async def call():
+        calls.append(len(calls))
+        await asyncio.sleep(10 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    assert asyncio.run(hedged(call, hedge_after=0.02)) == 2
+
+
+def test_the_breaker_opens_probes_once_and_closes_on_success():
+    breaker = CircuitBreaker("test", consecutive_failures=3, window=20, failure_ratio=0.5, reset_seconds=30)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.opened_at -= breaker.reset_seconds
+    breaker.before_call()
+    assert breaker.state == BREAKER_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED and not breaker.is_open()
+
+
+def test_a_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test", consecutive_failures=1, reset_seconds=30)
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_seconds
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN and breaker.is_open()
+
+
+def test_a_sustained_failure_ratio_opens_the_breaker():
+    breaker = CircuitBreaker("test", consecutive_failures=100, window=10, failure_ratio=0.5)
+    for _ in range(2):
+        breaker.record_success()
+        breaker.record_failure()
+    assert not breaker.is_open()
+    breaker.record_failure()
+    assert breaker.is_open()
+
+
+def test_waiting_out_the_deadline_in_the_queue_does_not_open_the_breaker(monkeypatch):
+    import ai_service
+    from ai_resilience import AIUnavailableError
+    from ai_scheduler import AIScheduler, PRIORITY_INTERACTIVE, get_request_context
+
+    ai = ai_service.PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    ai.cache = None
+    scheduler = AIScheduler(max_concurrency=1)
+    monkeypatch.setattr(ai_service, "ai_scheduler", scheduler)
+    monkeypatch.setitem(ai_service.AI_CALL_DEADLINE_SECONDS, get_request_context()[0], 0.02)
+    completions = []
+
+    async def create_completion(*args):
+        completions.append(args)
+        return "unreachable"
+
+    ai._create_completion = create_completion
+
+    async def run():
+        await scheduler.acquire(PRIORITY_INTERACTIVE, "holder")
+        for _ in range(ai.breaker.consecutive_failures_threshold + 1):
+            with pytest.raises(AIUnavailableError):
+                await ai._get_ai_response("hello")
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert completions == [] and not ai.breaker.is_open() and ai.breaker.consecutive_failures == 0
+    assert stats["active"] == 1 and sum(stats["waiting"].values()) == 0
+
+
+@pytest.mark.parametrize("answer, calls", [
+    (None, 1),
+    ('{"analysis": "Build a buffer.", "budget": "Spend less on dining."}', 3),
+])
+def test_the_full_plan_only_re_asks_for_sections_a_good_answer_missed(answer, calls):
+    import ai_service
+    from ai_resilience import AIUnavailableError
+
+    ai = ai_service.PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    prompts = []
+
+    async def get_ai_response(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        if answer is None:
+            raise AIUnavailableError("upstream down")
+        return answer
+
+    ai._get_ai_response = get_ai_response
+    profile = {"age": 30, "monthly_income": 5000}
+    plan = asyncio.run(ai.generate_full_plan({section: profile for section in ai_service.FULL_PLAN_SECTIONS}))
+    assert len(prompts) == calls and not plan["combined"]
+    assert set(plan) == {*ai_service.FULL_PLAN_SECTIONS, "combined"}
+    if answer is None:
+        assert plan["analysis"] == ai._fallback_financial_analysis(profile)
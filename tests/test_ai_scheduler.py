@@ -0,0 +1,92 @@
+import asyncio
+
+from ai_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_PAGE_LOAD, AIScheduler
+
+
+async def serve(scheduler, requests):
+    """Queue `requests` (priority, user) behind one held slot, then release it; returns grant order"""
+    await scheduler.acquire(PRIORITY_INTERACTIVE, "holder")
+    order = []
+
+    async def call(index, priority, user_id):
+        async with scheduler.slot(priority, user_id):
+            order.append(index)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(call(i, priority, user)) for i, (priority, user) in enumerate(requests)]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_classes_are_served_first():
+    requests = [(PRIORITY_BACKGROUND, "a"), (PRIORITY_PAGE_LOAD, "a"), (PRIORITY_INTERACTIVE, "a")]
+    assert asyncio.run(serve(AIScheduler(max_concurrency=1), requests)) == [2, 1, 0]
+
+
+def test_users_in_a_class_take_turns():
+    requests = [(PRIORITY_PAGE_LOAD, "burst")] * 4 + [(PRIORITY_PAGE_LOAD, "other")] * 2
+    order = asyncio.run(serve(AIScheduler(max_concurrency=1), requests))
+    assert order[:4] == [0, 4, 1, 5]
+
+
+def test_long_waiters_are_promoted_past_higher_classes():
+    scheduler = AIScheduler(max_concurrency=1, starvation_thresholds={PRIORITY_BACKGROUND: 0.0})
+    requests = [(PRIORITY_INTERACTIVE, "a"), (PRIORITY_BACKGROUND, "b")]
+    assert asyncio.run(serve(scheduler, requests)) == [1, 0]
+
+
+def test_cancelled_waiters_give_up_their_place():
+    async def run():
+        scheduler = AIScheduler(max_concurrency=1)
+        await scheduler.acquire(PRIORITY_INTERACTIVE, "holder")
+        waiter = asyncio.create_task(scheduler.acquire(PRIORITY_PAGE_LOAD, "a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        stats = scheduler.stats()
+        scheduler.release()
+        return stats, scheduler.stats()
+
+    queued, released = asyncio.run(run())
+    assert queued["waiting"][PRIORITY_PAGE_LOAD] == 0
+    assert released["active"] == 0
+
+
+def test_served_waiters_are_not_kept_queued():
+    scheduler = AIScheduler(max_concurrency=2)
+
+    async def burst():
+        async def call():
+            async with scheduler.slot(PRIORITY_INTERACTIVE, "chat"):
+                await asyncio.sleep(0)
+
+        for _ in range(20):
+            await asyncio.gather(*(call() for _ in range(100)))
+
+    asyncio.run(burst())
+    assert scheduler.stats() == {"active": 0, "max_concurrency": 2, "waiting": dict.fromkeys(scheduler._waiting, 0)}
+    assert {priority: len(fifo) for priority, fifo in scheduler._fifos.items()} == dict.fromkeys(scheduler._fifos, 0)
+
+
+def test_acquire_gives_up_after_its_timeout():
+    from ai_scheduler import QueueTimeoutError
+
+    async def run():
+        scheduler = AIScheduler(max_concurrency=1)
+        await scheduler.acquire(PRIORITY_INTERACTIVE, "holder")
+        try:
+            await scheduler.acquire(PRIORITY_PAGE_LOAD, "a", timeout=0.01)
+        except QueueTimeoutError:
+            timed_out = True
+        queued = scheduler.stats()
+        after = asyncio.create_task(scheduler.acquire(PRIORITY_PAGE_LOAD, "b"))
+        await asyncio.sleep(0)
+        scheduler.release()
+        await after
+        return timed_out, queued, scheduler.stats()
+
+    timed_out, queued, granted = asyncio.run(run())
+    assert timed_out and queued["waiting"][PRIORITY_PAGE_LOAD] == 0
+    assert granted["active"] == 1
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from anomaly_detector import ANOMALY_WARMUP, AnomalyDetector
+
+
+def batch(start, amounts, category="Groceries", merchant="WHOLE FOODS"):
+    dates = np.datetime64(start) + np.arange(len(amounts)).astype("timedelta64[D]")
+    return pd.DataFrame({"date": dates.astype("datetime64[s]"), "amount": np.asarray(amounts, dtype=float),
+                         "category": category, "merchant": merchant})
+
+
+def habit(count, typical=60.0, seed=1):
+    return np.round(typical * np.random.default_rng(seed).lognormal(0, 0.2, count), 2)
+
+
+def test_an_outsized_charge_alerts_against_its_category(tmp_path):
+    detector = AnomalyDetector(path=str(tmp_path / "anomaly.sqlite"))
+    assert detector.observe("alice", batch("2026-08-01", habit(30))) == []
+    alerts = detector.observe("alice", batch("2026-08-31", [58.0, 640.0, -2500.0]))
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert (alert["date"], alert["category"], alert["merchant"], alert["amount"]) == (
+        "2026-09-01", "Groceries", "WHOLE FOODS", 640.0)
+    assert 50 < alert["typical_amount"] < 70 and alert["score"] > 3.5
+    assert "Groceries" in alert["message"]
+
+
+def test_no_alerts_during_warmup_or_under_the_minimum_amount(tmp_path):
+    detector = AnomalyDetector(path=str(tmp_path / "anomaly.sqlite"))
+    assert detector.observe("alice", batch("2026-08-01", [5.0] * (ANOMALY_WARMUP - 1) + [400.0])) == []
+    detector.observe("bob", batch("2026-08-01", [4.5] * 30, category="Dining", merchant="BLUE BOTTLE"))
+    assert detector.observe("bob", batch("2026-09-01", [18.0], category="Dining", merchant="BLUE BOTTLE")) == []
+
+
+def test_alerts_and_statistics_survive_a_restart(tmp_path):
+    path = str(tmp_path / "anomaly.sqlite")
+    detector = AnomalyDetector(path=path)
+    detector.observe("alice", batch("2026-08-01", habit(30)))
+    detector.observe("alice", batch("2026-09-05", [700.0]))
+    detector.flush()
+
+    reopened = AnomalyDetector(path=path)
+    assert [alert["amount"] for alert in reopened.alerts("alice")] == [700.0]
+    assert len(reopened.observe("alice", batch("2026-09-06", [720.0]))) == 1
+    assert reopened.alerts("bob") == []
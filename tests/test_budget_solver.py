@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from budget_solver import BudgetSolver, solve_allocation
+
+
+def random_problems(rng, users=300, width=6):
+    current = np.round(rng.uniform(0, 2000, (users, width)), 2)
+    floors = current * rng.choice([0.0, 0.25, 0.5, 0.9, 1.0], (users, width))
+    caps = np.maximum(rng.uniform(0, 2500, (users, width)), floors)
+    flexibility = current * rng.choice([0.1, 0.3, 0.7, 1.0], (users, width))
+    # Padding columns, as allocate_many leaves them
+    empty = rng.random((users, width)) < 0.15
+    current, floors, caps, flexibility = (np.where(empty, 0.0, a) for a in (current, floors, caps, flexibility))
+    budgets = rng.uniform(0.2, 1.2, users) * current.sum(axis=1)
+    return current, floors, caps, flexibility, budgets
+
+
+def bisect_allocation(current, floors, caps, flexibility, budget):
+    """The same optimality condition solved by bisection on the multiplier, one user at a time"""
+    def spend(mu):
+        return np.clip(current - mu * flexibility, floors, caps)
+    if spend(0.0).sum() <= budget:
+        return spend(0.0)
+    if floors.sum() > budget:
+        return floors
+    low, high = 0.0, 1.0
+    while spend(high).sum() > budget:
+        high *= 2
+    for _ in range(200):
+        mid = (low + high) / 2
+        low, high = (mid, high) if spend(mid).sum() > budget else (low, mid)
+    return spend(high)
+
+
+def objective(x, current, flexibility):
+    movable = flexibility > 0
+    return (((x - current) ** 2)[movable] / flexibility[movable]).sum()
+
+
+def test_allocations_match_bisection_and_beat_random_feasible_budgets():
+    rng = np.random.default_rng(11)
+    current, floors, caps, flexibility, budgets = random_problems(rng)
+    allocation, feasible = solve_allocation(current, floors, caps, flexibility, budgets)
+    for row in range(len(current)):
+        args = current[row], floors[row], caps[row], flexibility[row]
+        expected = bisect_allocation(*args, budgets[row])
+        np.testing.assert_allclose(allocation[row], expected, atol=1e-6)
+        assert feasible[row] == (floors[row].sum() <= budgets[row] + 1e-9)
+        if not feasible[row]:
+            continue
+        assert allocation[row].sum() <= budgets[row] + 1e-6
+        assert np.all(allocation[row] >= floors[row] - 1e-9) and np.all(allocation[row] <= caps[row] + 1e-9)
+        # No point of the feasible box does better
+        samples = rng.uniform(floors[row], caps[row], (200, len(floors[row])))
+        samples = samples[samples.sum(axis=1) <= budgets[row]]
+        best = objective(allocation[row], current[row], flexibility[row])
+        assert all(best <= objective(x, current[row], flexibility[row]) + 1e-6 for x in samples)
+
+
+def test_budget_cuts_discretionary_spending_before_rent():
+    result = BudgetSolver(savings_rate_target=20).allocate({
+        "monthly_income": 4000,
+        "expenses": {"Rent": 1200, "Dining Out": 600, "Entertainment": 400, "Groceries": 480, "Gas": 600,
+                     "Utilities": 300, "Emergency fund": 200},
+    })
+    categories = result["categories"]
+    assert "Emergency fund" not in categories and result["already_saving"] == 200
+    assert result["total_allocated"] == pytest.approx(3200)
+    assert result["target_met"] and result["savings_rate"] == 20.0
+    assert categories["Rent"]["change"] == 0
+    cut = {name: -entry["change"] / entry["current"] for name, entry in categories.items()}
+    assert cut["Entertainment"] > cut["Dining Out"] > cut["Groceries"] > cut["Utilities"] > 0
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cashflow_forecast import history_features
+
+
+def day(text):
+    return int(np.datetime64(text, "D").astype(np.int64))
+
+
+def paychecks(paydays, amount, start="2025-01-01", end="2026-09-30"):
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+    day_of_month = (days - days.astype("datetime64[M]").astype("datetime64[D]")).astype(int) + 1
+    dates = days[np.isin(day_of_month, paydays)]
+    return pd.DataFrame({"date": dates.astype("datetime64[s]"), "amount": -float(amount),
+                         "category": "Income", "merchant": "ACME PAYROLL"})
+
+
+@pytest.mark.parametrize("paydays, amount, monthly", [((1,), 6000, 6000), ((1, 15), 2500, 5000), ((28,), 3000, 3000)])
+@pytest.mark.parametrize("as_of", ["2026-09-30", "2026-09-14", "2026-09-01", "2026-08-31", "2026-03-10"])
+def test_fixed_paydays_give_the_full_monthly_income(paydays, amount, monthly, as_of):
+    features = history_features(paychecks(paydays, amount), None, day(as_of))
+    assert features.income.sum() == pytest.approx(monthly)
+    assert np.flatnonzero(features.income).tolist() == [d - 1 for d in paydays]
+
+
+def test_less_than_a_month_of_history_is_taken_pro_rata():
+    features = history_features(paychecks((1, 15), 2500, start="2026-09-10"), None, day("2026-09-30"))
+    assert features.income.sum() == pytest.approx(2500)
+
+
+def household(spending_per_day):
+    """Semi-monthly pay, rent on the 1st, a monthly subscription and daily groceries around `spending_per_day`"""
+    days = pd.date_range("2025-10-01", "2026-09-30", freq="D")
+    rows = [(day, -2500.0, "Income", "ACME PAYROLL") for day in days if day.day in (1, 15)]
+    rows += [(day, 1800.0, "Housing", "OAK PROPERTY MGMT") for day in days if day.day == 1]
+    rows += [(day, 15.49, "Subscriptions", "NETFLIX.COM") for day in days if day.day == 12]
+    noise = np.random.default_rng(9).uniform(0.5, 1.5, len(days))
+    rows += [(day, round(spending_per_day * scale, 2), "Groceries", "WHOLE FOODS") for day, scale in zip(days, noise)]
+    frame = pd.DataFrame(rows, columns=["date", "amount", "category", "merchant"]).sort_values("date", kind="stable")
+    return pd.DataFrame({
+        "date": frame["date"].to_numpy().astype("datetime64[s]"),
+        "amount": frame["amount"].to_numpy(dtype=float),
+        "category": pd.Categorical(frame["category"]),
+        "merchant": pd.Categorical(frame["merchant"]),
+    })
+
+
+@pytest.fixture
+def forecaster(tmp_path):
+    from cashflow_forecast import CashFlowForecaster
+    from subscription_detector import SubscriptionDetector
+    from transaction_store import TransactionStore
+
+    store = TransactionStore(root=str(tmp_path / "store"))
+    return CashFlowForecaster(store, SubscriptionDetector(store), str(tmp_path / "forecasts.sqlite"))
+
+
+def test_forecast_projects_pay_rent_subscriptions_and_spending(forecaster):
+    frame = household(50.0)
+    forecaster.store.append("alice", frame, np.arange(len(frame), dtype=np.uint64))
+    forecast = forecaster.forecast("alice", "2026-09-30", balance=1000)
+
+    assert (forecast["source"], forecast["starting_balance"], len(forecast["daily"]["dates"])) == ("history", 1000, 365)
+    assert forecast["daily"]["dates"][0] == "2026-10-01"
+    october = forecast["monthly"][0]
+    assert october["month"] == "2026-10" and october["income"] == pytest.approx(5000)
+    # Rent and groceries are variable spending at their recent level; Netflix is charged on its own day
+    assert october["spending"] == pytest.approx(1800 + 50 * 31 + 15.49, rel=0.05)
+    assert forecast["daily"]["outflow"][11] - forecast["daily"]["outflow"][10] == pytest.approx(15.49, abs=0.5)
+    assert october["lower_95"] < october["lower_80"] < october["balance"] < october["upper_80"] < october["upper_95"]
+    assert forecast["first_shortfall"] is None
+    # Served from the cache with another starting balance
+    again = forecaster.forecast("alice", "2026-09-30", balance=0)
+    assert again["monthly"][0]["balance"] == pytest.approx(october["balance"] - 1000)
+
+
+def test_forecast_dates_the_first_shortfall(forecaster):
+    frame = household(150.0)
+    forecaster.store.append("bob", frame, np.arange(len(frame), dtype=np.uint64))
+    forecast = forecaster.forecast("bob", "2026-09-30", balance=2000)
+    balances = forecast["daily"]["balance"]
+    first = forecast["daily"]["dates"].index(forecast["first_shortfall"])
+    assert balances[first] < 0 and min(balances[:first], default=0) >= 0
+    assert forecast["lowest_balance"]["balance"] == min(balances)
+    assert forecaster.forecast("nobody", "2026-09-30") is None
@@ -0,0 +1,28 @@
+import asyncio
+
+from ai_service import PecuniaAI
+from conversation_store import conversation_store
+from prompt_builder import METHOD_INPUT_BUDGETS, count_tokens
+
+
+def test_long_messages_are_cut_to_fit_the_chat_budget():
+    ai = PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    prompts = []
+
+    async def respond(prompt):
+        prompts.append(prompt)
+        return "Noted."
+
+    ai._get_ai_response = respond
+    for _ in range(8):
+        conversation_store.record("long-talker", "Tell me about budgeting " * 60, "Start with the 50/30/20 rule. " * 40)
+    result = asyncio.run(ai.chat_with_ai("word " * 20000, {"monthly_income": 5000}, "long-talker"))
+
+    assert result["response"] == "Noted."
+    assert count_tokens(prompts[0]) <= METHOD_INPUT_BUDGETS["chat_with_ai"]
+    assert "User Message: word" in prompts[0]
+
+
+def test_oversized_chat_queries_are_rejected(client):
+    assert client.post("/api/ai/chat", json={"query": "x" * 4001}).status_code == 422
+    assert client.post("/api/ai/chat", json={"query": ""}).status_code == 422
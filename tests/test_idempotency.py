@@ -0,0 +1,85 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from idempotency import IdempotencyMiddleware
+from ttl_store import TTLStore
+
+
+def make_client(**options):
+    app = FastAPI()
+    calls = {"count": 0, "status": 200}
+
+    @app.post("/work")
+    async def work(request: Request):
+        calls["count"] += 1
+        body = await request.body()
+        return JSONResponse({"call": calls["count"], "size": len(body)}, status_code=calls["status"])
+
+    @app.post("/api/transactions/import")
+    async def streamed(request: Request):
+        calls["count"] += 1
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"call": calls["count"], "size": size}
+
+    app.add_middleware(IdempotencyMiddleware, **options)
+    return TestClient(app), calls
+
+
+def test_retry_replays_the_stored_response():
+    client, calls = make_client()
+    first = client.post("/work", json={"a": 1}, headers={"Idempotency-Key": "k1"})
+    second = client.post("/work", json={"a": 1}, headers={"Idempotency-Key": "k1"})
+    assert second.json() == first.json() == {"call": 1, "size": 7}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert calls["count"] == 1
+
+
+def test_reused_key_with_a_different_body_conflicts():
+    client, calls = make_client()
+    client.post("/work", json={"a": 1}, headers={"Idempotency-Key": "k1"})
+    conflict = client.post("/work", json={"a": 2}, headers={"Idempotency-Key": "k1"})
+    assert conflict.status_code == 422
+    assert calls["count"] == 1
+
+
+def test_keys_are_scoped_to_the_caller():
+    client, calls = make_client()
+    client.post("/work", json={}, headers={"Idempotency-Key": "k1", "Authorization": "Bearer a"})
+    client.post("/work", json={}, headers={"Idempotency-Key": "k1", "Authorization": "Bearer b"})
+    assert calls["count"] == 2
+
+
+def test_load_rejections_are_not_replayed():
+    client, calls = make_client()
+    calls["status"] = 429
+    assert client.post("/work", json={}, headers={"Idempotency-Key": "k1"}).status_code == 429
+    calls["status"] = 200
+    retry = client.post("/work", json={}, headers={"Idempotency-Key": "k1"})
+    assert retry.status_code == 200
+    assert "idempotent-replayed" not in retry.headers
+    assert calls["count"] == 2
+
+
+def test_large_and_streamed_requests_pass_through():
+    client, calls = make_client(max_request_bytes=1000)
+    chunks = [b"x" * 600] * 3
+    for _ in range(2):
+        response = client.post("/work", content=iter(chunks), headers={"Idempotency-Key": "big"})
+        assert response.json()["size"] == 1800
+    for _ in range(2):
+        client.post("/api/transactions/import", content=b"Date,Amount\n", headers={"Idempotency-Key": "imp"})
+    assert calls["count"] == 4
+
+
+def test_stored_responses_are_capped_by_total_size():
+    store = TTLStore(max_entries=100, ttl_seconds=60, max_bytes=250, sizeof=len)
+    for key in "abc":
+        store.set(key, b"x" * 100)
+    assert "a" not in store
+    assert store.get("b") is not None and store.get("c") is not None
+    assert store.size_bytes == 200
+    store.pop("b")
+    assert store.size_bytes == 100
@@ -0,0 +1,39 @@
+import pytest
+
+from merchant_categorizer import MerchantCategorizer, normalize_merchant
+
+
+@pytest.fixture
+def categorizer(tmp_path):
+    return MerchantCategorizer(overrides_path=str(tmp_path / "overrides.sqlite"))
+
+
+@pytest.mark.parametrize("description, name", [
+    ("SQ *BLUE BOTTLE COFFEE #1032 OAKLAND", "blue bottle coffee oakland"),
+    ("TST* Joe's Pizza #12", "joes pizza"),
+    ("STOP & SHOP #0412", "stop shop"),
+    ("H&M 0123 NEW YORK", "h m new york"),
+    ("AT&T*BILL PAYMENT", "at t bill payment"),
+])
+def test_normalize_merchant(description, name):
+    assert normalize_merchant(description) == name
+
+
+@pytest.mark.parametrize("description, category", [
+    ("STOP & SHOP #0412", "Groceries"),
+    ("H&M 0123 NEW YORK", "Shopping"),
+    ("BARNES & NOBLE #2231", "Shopping"),
+    ("AT&T*BILL PAYMENT", "Utilities"),
+    ("UBER EATS PENDING", "Food & Dining"),
+    ("ATTORNEY GENERAL", None),
+    ("SHELLFISH SHACK", None),
+    ("MCDONALD'S F1234", "Food & Dining"),
+])
+def test_shared_rules(categorizer, description, category):
+    assert categorizer.categorize(description) == category
+
+
+def test_user_overrides_win(categorizer):
+    categorizer.set_overrides("alice", {"H&M": "Clothing"})
+    assert categorizer.categorize("H&M 0123 NEW YORK", "alice") == "Clothing"
+    assert categorizer.categorize("H&M 0123 NEW YORK", "bob") == "Shopping"
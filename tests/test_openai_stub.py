@@ -0,0 +1,22 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import openai_stub
+from openai_stub import StubConfig
+
+
+@pytest.mark.parametrize("latency", ["fixed", "uniform:0.1", "gamma:1", "fixed:soon", 5])
+def test_invalid_settings_leave_the_config_unchanged(latency):
+    config = StubConfig(latency="fixed:0.05", error_rate=0.1)
+    with pytest.raises(ValueError):
+        config.update({"latency": latency, "error_rate": 0.9})
+    assert (config.latency, config.error_rate) == ("fixed:0.05", 0.1)
+    assert config.sample_latency() == 0.05
+
+
+def test_config_route_rejects_a_bad_spec_and_keeps_serving(monkeypatch):
+    monkeypatch.setattr(openai_stub, "config", StubConfig(latency="fixed:0"))
+    client = TestClient(openai_stub.app)
+    assert client.post("/stub/config", json={"latency": "fixed"}).status_code == 400
+    completion = client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]})
+    assert completion.status_code == 200
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from ai_service import PecuniaAI
+from portfolio_optimizer import TARGET_VOLATILITY, PortfolioOptimizer
+
+
+@pytest.fixture(scope="module")
+def optimizer():
+    return PortfolioOptimizer()
+
+
+@pytest.mark.parametrize("holdings", [{"VTI": 8000, "AAPL": 2000}, {"VTI": 5000, "BND": 5000}, {"VTI": 1000},
+                                      {"VTI": 4000, "TSLA": 1000, "VXUS": 500}])
+@pytest.mark.parametrize("risk", ["low", "medium", "high"])
+def test_the_target_portfolio_has_the_target_volatility_stocks_included(optimizer, holdings, risk):
+    model = optimizer.optimize(holdings, risk_tolerance=risk)
+    assert model["target_reachable"]
+    assert model["target"]["volatility"] == pytest.approx(TARGET_VOLATILITY[risk], abs=1e-3)
+    assert sum(model["target"]["weights"].values()) == pytest.approx(1, abs=2e-3)
+    stock = sum(value for ticker, value in holdings.items() if ticker in ("AAPL", "TSLA")) / sum(holdings.values())
+    assert model["target"]["weights"].get("STOCK", 0) == pytest.approx(stock, abs=1e-4)
+
+
+def test_targets_below_what_the_stocks_allow_are_flagged(optimizer):
+    model = optimizer.optimize({"VTI": 5000, "AAPL": 5000}, risk_tolerance="low")
+    assert not model["target_reachable"]
+    plans = optimizer.rebalance_many(np.array([optimizer.holdings_vector({"VTI": 5000, "AAPL": 5000})[0]] * 2),
+                                     np.array([0.07, 0.16]))
+    assert plans["reachable"].tolist() == [False, True]
+    vols = optimizer.stats(plans["weights"])["volatility"]
+    assert vols[0] == pytest.approx(model["target"]["volatility"], abs=1e-4) and vols[1] == pytest.approx(0.16, abs=1e-3)
+
+    assessment = PecuniaAI._assess_portfolio_risk(None, model)
+    assert "cannot be reached" in assessment["recommendations"][0]
+
+
+def test_flat_requests_do_not_count_settings_as_holdings():
+    model = PecuniaAI._optimize_holdings(None, {"VTI": 6000, "BND": 4000, "target_volatility": 0.09})
+    assert model["unmapped_holdings"] == [] and model["total_value"] == 10000
+    assert model["target_volatility"] == 0.09
@@ -0,0 +1,65 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from ai_scheduler import PRIORITY_INTERACTIVE, PRIORITY_PAGE_LOAD
+from rate_governor import RateGovernor, RateLimitShedError
+
+
+def test_calls_past_the_budget_are_shed_by_priority():
+    governor = RateGovernor(rpm_limit=60, tpm_limit=1000)
+
+    async def run():
+        await governor.acquire(900, PRIORITY_PAGE_LOAD)
+        # Refilling 800 tokens takes ~48s, beyond an interactive call's wait
+        with pytest.raises(RateLimitShedError):
+            await governor.acquire(900, PRIORITY_INTERACTIVE)
+        await governor.settle(900, 100)
+        await governor.acquire(900, PRIORITY_INTERACTIVE)
+
+    asyncio.run(run())
+
+
+def test_shared_state_waits_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "rate.sqlite")
+    governor = RateGovernor(rpm_limit=600, tpm_limit=100000, state_path=path)
+    locked, release = threading.Event(), threading.Event()
+
+    def other_worker():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        locked.set()
+        release.wait(5)
+        conn.execute("COMMIT")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        acquire = asyncio.create_task(governor.acquire(100, PRIORITY_PAGE_LOAD))
+        await asyncio.sleep(0.3)
+        release.set()
+        await acquire
+        await governor.observe_headers({"x-ratelimit-remaining-requests": "10"})
+        task.cancel()
+        return ticks
+
+    holder = threading.Thread(target=other_worker)
+    holder.start()
+    locked.wait(5)
+    started = time.monotonic()
+    ticks = asyncio.run(run())
+    holder.join()
+    assert time.monotonic() - started >= 0.3
+    # The loop kept running while acquire waited on the other worker's lock
+    assert ticks >= 10
+    assert governor.stats()["requests"]["remaining"] <= 10
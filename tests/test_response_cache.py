@@ -0,0 +1,53 @@
+import asyncio
+import os
+import threading
+
+from ai_service import PecuniaAI
+from response_cache import ResponseCache
+
+
+class RecordingCache(ResponseCache):
+    def __init__(self, path):
+        super().__init__(path=path)
+        self.threads = []
+
+    def get(self, key, method="unknown"):
+        self.threads.append(threading.current_thread())
+        return super().get(key, method)
+
+
+def test_completions_are_cached_without_blocking_the_event_loop(tmp_path):
+    ai = PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    ai.cache = RecordingCache(str(tmp_path / "cache.sqlite"))
+    upstream = []
+
+    async def create_completion(messages, timeout, model):
+        upstream.append(model)
+        return "Keep three to six months of expenses."
+
+    ai._create_completion = create_completion
+
+    async def ask():
+        return [await ai._get_ai_response("How big should my emergency fund be?") for _ in range(2)]
+
+    assert asyncio.run(ask()) == ["Keep three to six months of expenses."] * 2
+    assert len(upstream) == 1
+    assert ai.cache.threads and threading.main_thread() not in ai.cache.threads
+
+
+def test_cache_evicts_least_recently_used_past_its_size_bound(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), max_bytes=6000)
+    for i in range(10):
+        cache.set(f"key-{i}", os.urandom(2000).hex())
+    assert cache.stats()["bytes"] <= 6000
+    assert cache.get("key-9") is not None
+    assert cache.get("key-0") is None
+
+
+def test_replacing_an_entry_does_not_grow_the_size_total(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), max_bytes=6000)
+    cache.set("key-0", os.urandom(1000).hex())
+    for _ in range(10):
+        cache.set("key-1", os.urandom(1000).hex())
+    assert cache._total_bytes == cache.stats()["bytes"]
+    assert cache.get("key-0") is not None
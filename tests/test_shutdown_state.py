@@ -0,0 +1,41 @@
+import asyncio
+
+from conversation_store import ConversationStore
+from job_service import JOB_FAILED, JOB_SUCCEEDED, TERMINAL_STATES, JobManager
+
+
+def test_job_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.json")
+
+    async def run():
+        manager = JobManager(workers=1, state_path=path)
+        manager.register_handler("double", lambda payload: asyncio.sleep(0, {"value": payload["x"] * 2}))
+        manager.register_handler("stuck", lambda payload: asyncio.sleep(60))
+        done = await manager.submit("double", {"x": 21}, owner="alice")
+        while done.status not in TERMINAL_STATES:
+            await manager.wait(done, 5)
+        stuck = await manager.submit("stuck", {}, owner="alice")
+        await manager.stop()
+        manager.save()
+        return done.id, stuck.id
+
+    done_id, stuck_id = asyncio.run(run())
+    restarted = JobManager(state_path=path)
+    restarted.load()
+    done, stuck = restarted.get(done_id), restarted.get(stuck_id)
+    assert (done.status, done.result, done.owner) == (JOB_SUCCEEDED, {"value": 42}, "alice")
+    assert stuck.status == JOB_FAILED
+    assert not (tmp_path / "jobs.json").exists()
+
+
+def test_conversations_survive_a_restart(tmp_path):
+    path = str(tmp_path / "chat.json")
+    store = ConversationStore(recent_turns=2, path=path)
+    store.record("alice", "How do I start investing?", "Begin with a broad index fund.")
+    store.record("alice", "And bonds?", "Hold some for stability.")
+    store.save()
+
+    restarted = ConversationStore(recent_turns=2, path=path)
+    restarted.load()
+    assert restarted.history("alice") == store.history("alice")
+    assert restarted.history("alice")["summary"]
@@ -0,0 +1,55 @@
+import inspect
+
+import ai_service
+import server
+from ai_service import PecuniaAI
+from spending_analytics import to_frame
+
+TRANSACTIONS = [
+    {"date": "2026-08-03", "amount": 54.20, "category": "Groceries", "merchant": "WHOLE FOODS"},
+    {"date": "2026-09-03", "amount": 15.49, "category": "Subscriptions", "merchant": "NETFLIX.COM"},
+]
+
+
+def test_fallbacks_accept_the_arguments_of_their_methods():
+    for name, method in inspect.getmembers(PecuniaAI, inspect.iscoroutinefunction):
+        wrapped = getattr(method, "__wrapped__", None)
+        if wrapped is None:
+            continue
+        fallback = inspect.getsource(method).split('with_fallback("')[1].split('"')[0]
+        assert (list(inspect.signature(getattr(PecuniaAI, fallback)).parameters)
+                == list(inspect.signature(wrapped).parameters)), name
+
+
+def test_spending_analysis_falls_back_while_the_breaker_is_open(client, monkeypatch):
+    ai = PecuniaAI(base_url="http://127.0.0.1:9/v1")
+    for _ in range(ai.breaker.consecutive_failures_threshold):
+        ai.breaker.record_failure()
+    assert ai.breaker.is_open()
+    monkeypatch.setattr(server, "AI_MODE", "live")
+    monkeypatch.setattr(ai_service, "pecunia_ai", ai)
+
+    response = client.post("/api/ai/spending-analysis", json={"transactions": TRANSACTIONS})
+    assert response.status_code == 200
+    assert "temporarily unavailable" in response.json()["analysis"]
+
+
+MIXED_DATES = [
+    {"date": "2024-02-05T10:00:00.000Z", "amount": 42.10, "category": "Groceries", "merchant": "WHOLE FOODS"},
+    {"date": "2024-02-06T01:30:00+02:00", "amount": 12.00, "category": "Dining", "merchant": "CHIPOTLE"},
+    {"date": "2024-02-07", "amount": 60.00, "category": "Groceries", "merchant": "WHOLE FOODS"},
+    {"date": "not a date", "amount": 5.00, "category": "Dining", "merchant": "BLUE BOTTLE"},
+]
+
+
+def test_offset_and_naive_dates_are_read_as_utc():
+    dates = to_frame(MIXED_DATES)["date"]
+    assert str(dates.dtype) == "datetime64[s]"
+    assert dates.astype(str).tolist()[:3] == ["2024-02-05 10:00:00", "2024-02-05 23:30:00", "2024-02-07 00:00:00"]
+    assert dates.isna().tolist() == [False, False, False, True]
+
+
+def test_spending_analysis_accepts_browser_timestamps(client):
+    response = client.post("/api/ai/spending-analysis", json={"transactions": MIXED_DATES})
+    assert response.status_code == 200
+    assert response.json()["total_spending"] == 119.10
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from subscription_detector import SubscriptionDetector
+from transaction_store import TransactionStore
+
+
+def history(rows):
+    """Stored-transaction frame from (date, amount, category, merchant) rows, in date order"""
+    frame = pd.DataFrame(rows, columns=["date", "amount", "category", "merchant"]).sort_values("date", kind="stable")
+    return pd.DataFrame({
+        "date": pd.to_datetime(frame["date"]).to_numpy().astype("datetime64[s]"),
+        "amount": frame["amount"].to_numpy(dtype=float),
+        "category": pd.Categorical(frame["category"]),
+        "merchant": pd.Categorical(frame["merchant"]),
+    })
+
+
+def charges():
+    months = pd.date_range("2025-10-01", "2026-09-01", freq="MS")
+    rows = [(str((month + pd.Timedelta(days=11)).date()), 15.49, "Subscriptions", "NETFLIX.COM") for month in months]
+    # Cancelled in March
+    rows += [(str((month + pd.Timedelta(days=2)).date()), 11.99, "Subscriptions", "SPOTIFY USA")
+             for month in months[:6]]
+    rows += [(str(day.date()), 9.0, "Health", "CITY GYM") for day in pd.date_range("2026-06-01", "2026-09-28", freq="7D")]
+    rng = np.random.default_rng(5)
+    days = pd.date_range("2025-10-01", "2026-09-28", freq="D")
+    rows += [(str(day.date()), float(rng.uniform(3, 70)), "Dining", "CHIPOTLE") for day in days[rng.random(len(days)) < 0.2]]
+    return history(rows)
+
+
+def test_recurring_charges_are_found_with_period_cost_and_next_date():
+    report = SubscriptionDetector().detect_frame(charges(), as_of="2026-09-30")
+    found = {entry["merchant"]: entry for entry in report["subscriptions"]}
+    assert set(found) == {"NETFLIX.COM", "SPOTIFY USA", "CITY GYM"}
+
+    netflix = found["NETFLIX.COM"]
+    assert (netflix["period"], netflix["amount"], netflix["occurrences"]) == ("monthly", 15.49, 12)
+    assert (netflix["next_expected"], netflix["active"]) == ("2026-10-12", True)
+    assert found["CITY GYM"]["period"] == "weekly" and found["CITY GYM"]["active"]
+    assert found["CITY GYM"]["monthly_cost"] == round(9.0 * 30.44 / 7, 2)
+    assert not found["SPOTIFY USA"]["active"]
+
+    assert report["active_count"] == 2
+    assert report["monthly_total"] == round(netflix["monthly_cost"] + found["CITY GYM"]["monthly_cost"], 2)
+    assert [entry["active"] for entry in report["subscriptions"]] == [True, True, False]
+
+
+def test_incremental_detection_matches_a_full_scan(tmp_path):
+    frame = charges()
+    store = TransactionStore(root=str(tmp_path / "store"))
+    detector = SubscriptionDetector(store)
+    cut = len(frame) * 2 // 3
+    store.append("alice", frame.iloc[:cut].reset_index(drop=True), np.arange(cut, dtype=np.uint64))
+    detector.detect("alice", as_of="2026-09-30")
+    store.append("alice", frame.iloc[cut:].reset_index(drop=True), np.arange(cut, len(frame), dtype=np.uint64))
+    assert detector.detect("alice", as_of="2026-09-30") == detector.detect_frame(frame, as_of="2026-09-30")
@@ -0,0 +1,91 @@
+import io
+import threading
+
+import numpy as np
+import pytest
+
+from anomaly_detector import AnomalyDetector
+from transaction_import import OccurrenceCounter, import_transactions
+from transaction_store import TransactionStore
+
+CSV = (
+    "Date,Description,Amount\n"
+    "2026-09-01,STARBUCKS #2211,-4.85\n"
+    "2026-09-01,STARBUCKS #2211,-4.85\n"
+    "09/02/2026,WHOLE FOODS MARKET,\"-1,084.20\"\n"
+    "2026-09-03,PAYROLL ACME INC,2500.00\n"
+    "not a date,SHELL OIL,-40\n"
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransactionStore(root=str(tmp_path / "store"))
+
+
+def run_import(store, tmp_path, text, **options):
+    detector = AnomalyDetector(path=str(tmp_path / "anomaly.sqlite"))
+    return import_transactions(io.BytesIO(text.encode()), "alice", export_format="csv",
+                               store=store, detector=detector, **options)
+
+
+def test_identical_rows_import_once_each_and_reimports_add_nothing(store, tmp_path):
+    stats = run_import(store, tmp_path, CSV)
+    assert (stats["imported"], stats["duplicates"], stats["rejected"]) == (4, 0, 1)
+    frame = store.frame("alice")
+    assert frame["amount"].tolist() == [4.85, 4.85, 1084.20, -2500.0]
+    assert str(frame["date"].iloc[2].date()) == "2026-09-02"
+
+    again = run_import(store, tmp_path, CSV, batch_rows=2)
+    assert (again["imported"], again["duplicates"]) == (0, 4)
+    # An overlapping export with one more coffee adds just that one
+    more = run_import(store, tmp_path, CSV.replace("4.85\n09/02", "4.85\n2026-09-01,STARBUCKS #2211,-4.85\n09/02"))
+    assert more["imported"] == 1
+    assert store.count("alice") == 5
+
+
+def test_occurrence_counts_stay_bounded_for_newest_first_exports():
+    counter = OccurrenceCounter(window_days=7)
+    rng = np.random.default_rng(3)
+    for batch in range(30):
+        first_day = 20000 - batch * 10
+        days = np.sort(rng.integers(first_day, first_day + 10, 200))[::-1]
+        counter.number(rng.integers(0, 2 ** 63, 200).astype(np.uint64), days)
+    # The current batch's ten days plus a week on either side, not everything seen
+    assert len(counter) <= 200 * 3
+
+
+def test_occurrences_continue_across_batches():
+    counter = OccurrenceCounter()
+    keys = np.array([7, 7, 8], dtype=np.uint64)
+    days = np.array([100, 100, 100])
+    assert counter.number(keys, days).tolist() == [0, 1, 0]
+    assert counter.number(keys[:1], days[:1]).tolist() == [2]
+
+
+def test_concurrent_imports_of_one_export_store_it_once(store, tmp_path):
+    rows = "".join(f"2026-08-{day:02d},MERCHANT {i},-{i}.25\n" for day in range(1, 29) for i in range(50))
+    text = "Date,Description,Amount\n" + rows
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(run_import(store, tmp_path, text, batch_rows=100)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result["imported"] for result in results) == 28 * 50
+    assert store.count("alice") == 28 * 50
+
+
+def test_offset_dates_import_as_utc_and_bad_dates_are_rejected(store, tmp_path):
+    text = (
+        "Date,Description,Amount\n"
+        "2026-09-01T10:00:00.000Z,STARBUCKS #2211,-4.85\n"
+        "2026-09-02T01:30:00+02:00,WHOLE FOODS MARKET,-84.20\n"
+        "2026-09-03,PAYROLL ACME INC,2500.00\n"
+        "2026-09-31T10:00:00Z,SHELL OIL,-40\n"
+    )
+    stats = run_import(store, tmp_path, text)
+    assert (stats["imported"], stats["rejected"]) == (3, 1)
+    dates = store.frame("alice")["date"].astype(str).tolist()
+    assert dates == ["2026-09-01 10:00:00", "2026-09-01 23:30:00", "2026-09-03 00:00:00"]
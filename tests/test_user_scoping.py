@@ -0,0 +1,62 @@
+import pytest
+
+from auth_service import create_access_token
+
+EXPORT = b"Date,Description,Amount\n2026-09-01,WHOLE FOODS MARKET,-84.20\n2026-09-02,SHELL OIL 5744,-41.00\n"
+
+
+def bearer(email):
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+@pytest.mark.parametrize("method, path", [
+    ("post", "/api/transactions/import"),
+    ("get", "/api/transactions/summary"),
+    ("delete", "/api/transactions"),
+    ("get", "/api/transactions/subscriptions"),
+    ("get", "/api/transactions/alerts"),
+    ("get", "/api/forecast/cash-flow"),
+    ("get", "/api/transactions/category-overrides"),
+    ("delete", "/api/transactions/category-overrides/netflix"),
+    ("delete", "/api/ai/chat/history"),
+])
+def test_per_user_state_requires_a_signed_in_caller(client, method, path):
+    response = getattr(client, method)(path)
+    assert response.status_code == 401
+
+
+def test_imports_are_scoped_to_the_token_subject(client):
+    alice, bob = bearer("alice@example.com"), bearer("bob@example.com")
+    imported = client.post("/api/transactions/import?format=csv", content=EXPORT, headers=alice)
+    assert imported.status_code == 200
+    assert imported.json()["imported"] == 2
+
+    assert client.get("/api/transactions/summary", headers=alice).json()["transactions"] == 2
+    # Same client address, different user: nothing shared
+    assert client.get("/api/transactions/summary", headers=bob).json()["transactions"] == 0
+    assert client.delete("/api/transactions", headers=alice).status_code == 200
+
+
+def test_anonymous_chat_is_answered_without_memory(client):
+    response = client.post("/api/ai/chat", json={"query": "any unusual spending?"})
+    assert response.status_code == 200
+    assert "Nothing unusual" in response.json()["response"]
+
+
+def test_jobs_are_owned_by_the_token_subject_or_their_random_id(client):
+    alice, bob = bearer("alice@example.com"), bearer("bob@example.com")
+    payload = {"holdings": {"VTI": 6000, "BND": 4000}}
+
+    first = client.post("/api/ai/jobs/portfolio-rebalance", json=payload, headers=alice).json()
+    again = client.post("/api/ai/jobs/portfolio-rebalance", json=payload, headers=alice).json()
+    assert again["job_id"] == first["job_id"]
+    assert client.get(first["status_url"], headers=alice).status_code == 200
+    assert client.get(first["status_url"], headers=bob).status_code == 404
+    # Same client address without a token: not alice's job
+    assert client.get(first["status_url"]).status_code == 404
+
+    # Anonymous callers behind one address never share a job, even for identical work
+    anonymous = [client.post("/api/ai/jobs/portfolio-rebalance", json=payload).json() for _ in range(2)]
+    assert anonymous[0]["job_id"] != anonymous[1]["job_id"] != first["job_id"]
+    assert client.get(anonymous[0]["status_url"]).status_code == 200
+    assert client.get(anonymous[0]["status_url"], headers=alice).status_code == 404